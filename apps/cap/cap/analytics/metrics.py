@@ -10,13 +10,174 @@ SPDX-FileContributor: Raasid (AI Companion)
 CAP module: metrics.py
 """
 import frappe
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from frappe.utils import convert_utc_to_system_timezone
+from cap.observability.metrics import SKETCH_KEY_PREFIX, sketch_hour
+from cap.observability.sketch import DDSketch
 # CAP Analytics Metrics Module
 
+CLAIM_SUFFIX = ":claimed"
+LEASE_SUFFIX = ":lease"
+
+# Longer than a run takes, so only lists abandoned by a dead run are taken over
+CLAIM_LEASE_SECONDS = 3600
+
 
 def calculate_hourly_metrics():
     """Calculate hourly analytics metrics"""
     try:
-        # Placeholder for metrics calculation
-        pass
+        persist_metric_sketches()
     except Exception as e:
         frappe.log_error(f"Metrics calculation error: {str(e)}", "CAP Analytics")
+
+
+def persist_metric_sketches() -> int:
+    """Merge the workers' sketches of completed hours into Metric Sketch records.
+    
+    Each hourly Redis list is claimed by renaming it (RENAMENX) to a key
+    unique to this run before it is read, so concurrent runs never merge the
+    same samples twice. A claim holds a lease; lists left behind by a run
+    that died are taken over once its lease has expired. Samples flushed
+    after an hour was persisted are merged into the existing record on the
+    next run.
+    
+    Returns:
+        Number of Metric Sketch records written
+    """
+    client = frappe.cache()
+    site = frappe.local.site
+    current_hour = sketch_hour(time.time())
+    prefix = f"{SKETCH_KEY_PREFIX}{site}:"
+    run_id = uuid.uuid4().hex
+    
+    merged: Dict[tuple, DDSketch] = {}
+    claimed_keys = []
+    
+    for raw_key in client.scan_iter(match=f"{prefix}*", count=100):
+        key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+        if key.endswith(LEASE_SUFFIX):
+            continue
+        hour = key[len(prefix):].split(CLAIM_SUFFIX)[0]
+        if hour >= current_hour:
+            continue
+        
+        # Leave claims alone while the run that holds them may still be reading
+        if CLAIM_SUFFIX in key and client.execute_command("EXISTS", key + LEASE_SUFFIX):
+            continue
+        
+        claimed = _claim(client, key, f"{prefix}{hour}{CLAIM_SUFFIX}:{run_id}")
+        if not claimed:
+            continue
+        
+        for entry in client.execute_command("LRANGE", claimed, 0, -1):
+            name, tags, data = json.loads(entry)
+            series = (hour, name, json.dumps(tags, sort_keys=True))
+            sketch = DDSketch.from_dict(data)
+            if series in merged:
+                merged[series].merge(sketch)
+            else:
+                merged[series] = sketch
+        claimed_keys.append(claimed)
+    
+    for (hour, name, tags), sketch in merged.items():
+        _save_sketch(name, tags, _period_start(hour), sketch)
+    
+    if claimed_keys:
+        frappe.db.commit()
+        client.execute_command("DEL", *claimed_keys, *(key + LEASE_SUFFIX for key in claimed_keys))
+    
+    return len(merged)
+
+
+def _claim(client, key: str, claimed: str) -> Optional[str]:
+    """Move an hourly list to this run's claim key.
+    
+    Args:
+        client: Redis client
+        key: Hourly list, or an expired claim of another run
+        claimed: Claim key unique to this run
+    
+    Returns:
+        The claim key, or None if another run claimed the list first
+    """
+    # The lease is taken before the rename so the claim is never visible without one
+    client.execute_command("SET", claimed + LEASE_SUFFIX, 1, "EX", CLAIM_LEASE_SECONDS)
+    try:
+        renamed = client.execute_command("RENAMENX", key, claimed)
+    except Exception:
+        # The source key is gone: claimed by a concurrent run
+        renamed = False
+    
+    if not renamed:
+        client.execute_command("DEL", claimed + LEASE_SUFFIX)
+        return None
+    return claimed
+
+
+def get_latency_quantiles(metric_name: str, from_datetime, to_datetime,
+                          tags: Optional[Dict] = None) -> Dict:
+    """Merge hourly sketches to get quantiles over an arbitrary period.
+    
+    Args:
+        metric_name: Full metric name (e.g., 'cap.tenant.create.duration')
+        from_datetime: Start of the period (inclusive)
+        to_datetime: End of the period (exclusive)
+        tags: Only merge series with exactly these tags
+    
+    Returns:
+        Dictionary with count, mean, p50, p90, p99 and max
+    """
+    filters = {
+        "metric_name": metric_name,
+        "period_start": ["between", [from_datetime, to_datetime]]
+    }
+    if tags is not None:
+        filters["tags"] = json.dumps(tags, sort_keys=True)
+    
+    merged = DDSketch()
+    for row in frappe.get_all("Metric Sketch", filters=filters, fields=["sketch", "period_start"]):
+        if row.period_start < to_datetime:
+            merged.merge(DDSketch.from_dict(json.loads(row.sketch)))
+    
+    return {
+        "count": merged.count,
+        "mean": merged.mean,
+        "p50": merged.quantile(0.5),
+        "p90": merged.quantile(0.9),
+        "p99": merged.quantile(0.99),
+        "max": merged.max if merged.count else None
+    }
+
+
+def _save_sketch(name: str, tags: str, period_start: datetime, sketch: DDSketch) -> None:
+    """Insert a Metric Sketch, or merge into the existing one for the same series and hour."""
+    existing = frappe.db.get_value(
+        "Metric Sketch",
+        {"metric_name": name, "tags": tags, "period_start": period_start},
+        "name"
+    )
+    
+    if existing:
+        doc = frappe.get_doc("Metric Sketch", existing)
+        stored = doc.get_sketch()
+        stored.merge(sketch)
+        sketch = stored
+    else:
+        doc = frappe.new_doc("Metric Sketch")
+        doc.metric_name = name
+        doc.tags = tags
+        doc.period = "Hour"
+        doc.period_start = period_start
+    
+    doc.set_sketch(sketch)
+    doc.save(ignore_permissions=True)
+
+
+def _period_start(hour: str) -> datetime:
+    """Convert a UTC YYYYMMDDHH bucket to a naive datetime in the system timezone."""
+    utc = datetime.strptime(hour, "%Y%m%d%H").replace(tzinfo=timezone.utc)
+    return convert_utc_to_system_timezone(utc).replace(tzinfo=None)
@@ -9,19 +9,18 @@ SPDX-FileContributor: Raasid (AI Companion)
 
 CAP module: __init__.py
 """
-    from cap.cache import CacheManager
-from cap.cache.cache_manager import CacheManager
-from cap.cache.cache_decorators import cached, invalidate_cache
+from cap.cache.cache_manager import CacheManager, MISSING, get_cache_manager
+from cap.cache.cache_decorators import cached, cached_call, get_stampede_stats, invalidate_cache
 """Caching Layer
 
 Provides flexible caching with Frappe cache and optional Redis support.
 
 Usage:
     
-    cache = CacheManager()
+    cache = get_cache_manager()
     cache.set('key', 'value', ttl=300)
     value = cache.get('key')
 """
 
 
-__all__ = ['CacheManager', 'cached', 'invalidate_cache']
+__all__ = ['CacheManager', 'MISSING', 'get_cache_manager', 'cached', 'cached_call', 'get_stampede_stats', 'invalidate_cache']
@@ -9,11 +9,15 @@ SPDX-FileContributor: Raasid (AI Companion)
 
 CAP module: cache_decorators.py
 """
+import frappe
 import functools
 import hashlib
 import json
-from typing import Callable, Any, Optional
-from cap.cache.cache_manager import CacheManager
+import math
+import random
+import time
+from typing import Callable, Any, List, Optional
+from cap.cache.cache_manager import CacheManager, MISSING, get_cache_manager
 """Cache Decorators
 
 Decorators for easy method caching.
@@ -21,38 +25,92 @@ Decorators for easy method caching.
 
 
 
-def cached(ttl: int = 300, key_prefix: Optional[str] = None, cache_manager: Optional[CacheManager] = None):
+# Counters for stampede protection, per process
+_stampede_stats = {
+    "lock_acquired": 0,
+    "lock_contended": 0,
+    "stale_served": 0,
+    "early_refreshes": 0,
+    "wait_timeouts": 0
+}
+
+# Marks values stored with freshness metadata by cached_call
+_ENVELOPE_MARKER = "__cap_cached__"
+
+# Argument types hashed from their repr() without JSON encoding
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+# Namespace for keys built outside a tenant context or with tenant_scoped=False
+GLOBAL_NAMESPACE = "-"
+
+
+def cached(ttl: int = 300, key_prefix: Optional[str] = None, cache_manager: Optional[CacheManager] = None,
+           single_flight: bool = False, stale_ttl: int = 0, early_refresh_beta: float = 0.0,
+           lock_timeout: float = 10.0, wait_timeout: float = 5.0, negative_ttl: Optional[int] = None,
+           key: Optional[Callable[..., Any]] = None, tenant_scoped: bool = True):
     """Decorator to cache function results.
     
     Args:
         ttl: Time to live in seconds (default: 5 minutes)
         key_prefix: Optional cache key prefix
         cache_manager: Optional custom cache manager
+        single_flight: Let only one worker recompute an expired key; the
+            others wait for its result or serve the stale value
+        stale_ttl: Seconds an expired value is kept to be served while it
+            is being recomputed (used with single_flight)
+        early_refresh_beta: Enables XFetch probabilistic early refresh when
+            greater than 0; 1.0 is the usual setting, higher refreshes earlier
+        lock_timeout: Seconds before a recomputation lock expires
+        wait_timeout: Seconds a worker waits for another worker's result
+        negative_ttl: Time to live for None results (default: the cache
+            manager's negative TTL)
+        key: Optional callable receiving the function arguments and
+            returning the part of the key that identifies the call
+            (e.g., ``key=lambda self, tenant: tenant``)
+        tenant_scoped: Namespace keys by the current tenant
+            (frappe.local.tenant_id); disable for data shared by all tenants
         
     Usage:
         @cached(ttl=600, key_prefix='user')
         def get_user(user_id):
             return expensive_operation(user_id)
+        
+        @cached(ttl=300, single_flight=True, stale_ttl=60, early_refresh_beta=1.0)
+        def get_tenant_stats(tenant):
+            return expensive_fan_out(tenant)
     """
     def decorator(func: Callable) -> Callable:
+        func_name = f"{func.__module__}.{func.__qualname__}"
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             # Initialize cache manager
-            cache = cache_manager or CacheManager()
+            cache = cache_manager or get_cache_manager()
             
             # Generate cache key
-            cache_key = _generate_cache_key(func, args, kwargs, key_prefix)
+            cache_key = _build_cache_key(func_name, args, kwargs, key_prefix, key, tenant_scoped)
+            
+            if single_flight or early_refresh_beta > 0:
+                return cached_call(
+                    cache, cache_key, lambda: func(*args, **kwargs), ttl=ttl,
+                    single_flight=single_flight, stale_ttl=stale_ttl,
+                    early_refresh_beta=early_refresh_beta,
+                    lock_timeout=lock_timeout, wait_timeout=wait_timeout
+                )
             
-            # Try to get from cache
-            cached_value = cache.get(cache_key)
-            if cached_value is not None:
+            # Try to get from cache; falsy and None results are hits too
+            cached_value = cache.get(cache_key, MISSING)
+            if cached_value is not MISSING:
                 return cached_value
             
             # Execute function
             result = func(*args, **kwargs)
             
             # Store in cache
-            cache.set(cache_key, result, ttl=ttl)
+            if result is None:
+                cache.set(cache_key, result, ttl=ttl, negative_ttl=negative_ttl)
+            else:
+                cache.set(cache_key, result, ttl=ttl)
             
             return result
         
@@ -60,6 +118,96 @@ def cached(ttl: int = 300, key_prefix: Optional[str] = None, cache_manager: Opti
     return decorator
 
 
+def cached_call(cache: CacheManager, key: str, compute: Callable[[], Any], ttl: int = 300,
+                tags: Optional[List[str]] = None, single_flight: bool = True, stale_ttl: int = 0,
+                early_refresh_beta: float = 0.0, lock_timeout: float = 10.0,
+                wait_timeout: float = 5.0) -> Any:
+    """Get a cached value, recomputing it with stampede protection.
+    
+    Values are stored with their logical expiry and recompute time. With
+    single_flight, one worker holds a short Redis lock while recomputing;
+    the others serve the stale value if there is one, or wait for the
+    result. With early_refresh_beta, a hit may trigger recomputation before
+    expiry with a probability that grows as expiry approaches (XFetch).
+    
+    Args:
+        cache: Cache manager
+        key: Cache key
+        compute: Callable producing the value
+        ttl: Logical time to live in seconds
+        tags: Optional invalidation tags
+        single_flight: Serialize recomputation across workers
+        stale_ttl: Seconds an expired value remains servable
+        early_refresh_beta: XFetch beta; 0 disables early refresh
+        lock_timeout: Seconds before a recomputation lock expires
+        wait_timeout: Seconds to wait for another worker's result
+        
+    Returns:
+        Cached or freshly computed value
+    """
+    envelope = _unwrap(cache.get(key))
+    now = time.time()
+    
+    if envelope is not None:
+        fresh = now < envelope["exp"]
+        if fresh and not _should_refresh_early(envelope, now, early_refresh_beta):
+            return envelope["v"]
+        
+        if fresh:
+            _stampede_stats["early_refreshes"] += 1
+        
+        if not single_flight:
+            return _compute_and_store(cache, key, compute, ttl, stale_ttl, tags)
+        
+        token = cache.acquire_lock(key, int(lock_timeout * 1000))
+        if token is None:
+            # Someone else is recomputing; the current value is good enough
+            _stampede_stats["lock_contended"] += 1
+            if not fresh:
+                _stampede_stats["stale_served"] += 1
+            return envelope["v"]
+        
+        _stampede_stats["lock_acquired"] += 1
+        try:
+            return _compute_and_store(cache, key, compute, ttl, stale_ttl, tags)
+        finally:
+            cache.release_lock(key, token)
+    
+    if not single_flight:
+        return _compute_and_store(cache, key, compute, ttl, stale_ttl, tags)
+    
+    token = cache.acquire_lock(key, int(lock_timeout * 1000))
+    if token is not None:
+        _stampede_stats["lock_acquired"] += 1
+        try:
+            return _compute_and_store(cache, key, compute, ttl, stale_ttl, tags)
+        finally:
+            cache.release_lock(key, token)
+    
+    # Nothing to serve: wait for the lock holder to publish its result
+    _stampede_stats["lock_contended"] += 1
+    deadline = time.monotonic() + wait_timeout
+    delay = 0.01
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
+        envelope = _unwrap(cache.get(key))
+        if envelope is not None:
+            return envelope["v"]
+    
+    _stampede_stats["wait_timeouts"] += 1
+    return _compute_and_store(cache, key, compute, ttl, stale_ttl, tags)
+
+
+def get_stampede_stats() -> dict:
+    """Get stampede protection counters for this process.
+    
+    Returns:
+        Dictionary with lock, stale-serve and early-refresh counters
+    """
+    return dict(_stampede_stats)
+
+
 def invalidate_cache(key_pattern: str, cache_manager: Optional[CacheManager] = None):
     """Decorator to invalidate cache after function execution.
     
@@ -80,7 +228,7 @@ def invalidate_cache(key_pattern: str, cache_manager: Optional[CacheManager] = N
             result = func(*args, **kwargs)
             
             # Invalidate cache
-            cache = cache_manager or CacheManager()
+            cache = cache_manager or get_cache_manager()
             cache.delete_pattern(key_pattern)
             
             return result
@@ -89,31 +237,100 @@ def invalidate_cache(key_pattern: str, cache_manager: Optional[CacheManager] = N
     return decorator
 
 
-def _generate_cache_key(func: Callable, args: tuple, kwargs: dict, prefix: Optional[str] = None) -> str:
+def _generate_cache_key(func: Callable, args: tuple, kwargs: dict, prefix: Optional[str] = None,
+                        key_func: Optional[Callable[..., Any]] = None, tenant_scoped: bool = True) -> str:
     """Generate cache key from function and arguments.
     
+    Keys have the form ``<prefix>:<tenant>:<module.function>:<digest>``, so
+    patterns such as ``<prefix>:*`` still match every tenant.
+    
     Args:
         func: Function object
         args: Positional arguments
         kwargs: Keyword arguments
         prefix: Optional prefix
+        key_func: Optional callable deriving the call identity from the
+            arguments instead of hashing all of them
+        tenant_scoped: Include the current tenant in the key
         
     Returns:
         Cache key string
     """
-    # Create key components
-    func_name = f"{func.__module__}.{func.__name__}"
+    func_name = f"{func.__module__}.{func.__qualname__}"
+    return _build_cache_key(func_name, args, kwargs, prefix, key_func, tenant_scoped)
+
+
+def _build_cache_key(func_name: str, args: tuple, kwargs: dict, prefix: Optional[str],
+                     key_func: Optional[Callable[..., Any]], tenant_scoped: bool) -> str:
+    """Build a cache key; see _generate_cache_key."""
+    namespace = _tenant_namespace() if tenant_scoped else GLOBAL_NAMESPACE
     
-    # Serialize arguments
-    args_str = json.dumps(args, sort_keys=True, default=str)
-    kwargs_str = json.dumps(kwargs, sort_keys=True, default=str)
+    if key_func is not None:
+        identity = key_func(*args, **kwargs)
+        if isinstance(identity, str):
+            return f"{prefix or 'cache'}:{namespace}:{func_name}:{identity}"
+        args, kwargs = (identity,), {}
     
-    # Create hash
-    content = f"{args_str}:{kwargs_str}"
-    content_hash = hashlib.md5(content.encode()).hexdigest()[:8]
+    # Scalars are encoded by repr(), which keeps 1, 1.0, True and '1' apart;
+    # anything else goes through JSON. 64-bit blake2b keeps collisions out
+    # of reach at our key volume.
+    if kwargs:
+        parts = [repr(arg) if type(arg) in _SCALAR_TYPES else _json_arg(arg) for arg in args]
+        for name in sorted(kwargs):
+            value = kwargs[name]
+            parts.append(f"{name}={value!r}" if type(value) in _SCALAR_TYPES else f"{name}={_json_arg(value)}")
+        content = "\x1f".join(parts)
+    elif all(type(arg) in _SCALAR_TYPES for arg in args):
+        content = "\x1f".join(map(repr, args))
+    else:
+        content = "\x1f".join(repr(arg) if type(arg) in _SCALAR_TYPES else _json_arg(arg) for arg in args)
     
-    # Build key
-    if prefix:
-        return f"{prefix}:{func_name}:{content_hash}"
+    digest = hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+    return f"{prefix or 'cache'}:{namespace}:{func_name}:{digest}"
+
+
+def _json_arg(value: Any) -> str:
+    """Encode a non-scalar argument deterministically, tagged to avoid clashing with repr()."""
+    return "j" + json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _tenant_namespace() -> str:
+    """Current tenant for key namespacing, or the global namespace."""
+    return getattr(frappe.local, "tenant_id", None) or GLOBAL_NAMESPACE
+
+
+def _unwrap(value: Any) -> Optional[dict]:
+    """Return the freshness envelope stored by cached_call, if any."""
+    if isinstance(value, dict) and value.get(_ENVELOPE_MARKER):
+        return value
+    return None
+
+
+def _should_refresh_early(envelope: dict, now: float, beta: float) -> bool:
+    """XFetch: refresh when now - delta * beta * ln(rand) passes expiry."""
+    if beta <= 0:
+        return False
+    delta = envelope.get("delta") or 0
+    return now - delta * beta * math.log(1.0 - random.random()) >= envelope["exp"]
+
+
+def _compute_and_store(cache: CacheManager, key: str, compute: Callable[[], Any], ttl: int,
+                       stale_ttl: int, tags: Optional[List[str]]) -> Any:
+    """Compute a value and store it with its freshness metadata."""
+    started = time.time()
+    value = compute()
+    finished = time.time()
+    
+    envelope = {
+        _ENVELOPE_MARKER: 1,
+        "v": value,
+        "exp": finished + ttl,
+        "delta": finished - started
+    }
+    
+    if tags:
+        cache.set(key, envelope, ttl=ttl + stale_ttl, tags=tags)
     else:
-        return f"cache:{func_name}:{content_hash}"
+        cache.set(key, envelope, ttl=ttl + stale_ttl)
+    
+    return value
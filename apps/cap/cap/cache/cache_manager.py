@@ -10,40 +10,285 @@ SPDX-FileContributor: Raasid (AI Companion)
 CAP module: cache_manager.py
 """
 import frappe
-from typing import Any, Optional, List
-import json
+from typing import Any, Optional, List, Union
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
 from datetime import timedelta
-            import redis
-            import redis
-            from frappe.utils.redis_wrapper import RedisWrapper
+from functools import partial
+from cap.cache.local_cache import LocalCache
+from cap.cache.invalidation import ensure_listener, publish_invalidation
+from cap.cache import serializers
 """Cache Manager
 
-Unified caching interface supporting Frappe cache and Redis.
+Unified caching interface supporting Frappe cache and Redis, fronted by a
+process-local (L1) tier.
 """
 
 
+# Tag member sets live under this prefix and outlive their longest member
+TAG_KEY_PREFIX = "cap:tag:"
+TAG_SET_TTL = 86400
+TAG_DELETE_BATCH = 500
+
+# Locks used for single-flight recomputation
+LOCK_KEY_PREFIX = "cap:lock:"
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Returned by get() for absent keys when passed as the default, so that a
+# cached None (a negative result) can be told apart from a miss
+MISSING = object()
+
+# Stored in place of None so negative results survive every backend
+_NONE_MARKER = {"__cap_none__": 1}
+DEFAULT_NEGATIVE_TTL = 60
+
+# Shared Redis connection pool, recreated after fork
+REDIS_HEALTH_CHECK_INTERVAL = 30
+REDIS_RETRY_INTERVAL = 10
+_redis_state = {"pid": None, "client": None, "healthy": None, "checked_at": 0.0}
+_redis_lock = threading.Lock()
+_redis_importable: Optional[bool] = None
+_cache_manager: Optional["CacheManager"] = None
+
+logger = logging.getLogger(__name__)
+
+# Process-wide L1 cache and per-tier hit/miss counters, shared by all managers
+_local_cache: Optional[LocalCache] = None
+_tier_stats = {
+    "local": {"hits": 0, "misses": 0},
+    "frappe": {"hits": 0, "misses": 0},
+    "redis": {"hits": 0, "misses": 0}
+}
+
+
+def get_local_cache() -> LocalCache:
+    """Get the process-wide local cache, creating it from site config.
+    
+    Returns:
+        LocalCache instance
+    """
+    global _local_cache
+    if _local_cache is None:
+        conf = getattr(frappe, "conf", None) or {}
+        _local_cache = LocalCache(
+            max_entries=int(conf.get("cap_l1_cache_max_entries") or 2048),
+            max_bytes=int(conf.get("cap_l1_cache_max_bytes") or 16 * 1024 * 1024),
+            default_ttl=int(conf.get("cap_l1_cache_ttl") or 30)
+        )
+    return _local_cache
+
+
+def get_cache_manager() -> "CacheManager":
+    """Get the process-wide cache manager.
+    
+    Returns:
+        Shared CacheManager instance
+    """
+    global _cache_manager
+    if _cache_manager is None:
+        _cache_manager = CacheManager()
+    return _cache_manager
+
+
+def get_redis_client(settings: Optional[dict] = None):
+    """Get the process-wide Redis client for the standalone Redis tier.
+    
+    Connections come from one pool per process, created on first use and
+    recreated after fork. Connections idle longer than
+    REDIS_HEALTH_CHECK_INTERVAL are checked before reuse. If Redis cannot
+    be reached, None is returned and the connection is retried at most
+    every REDIS_RETRY_INTERVAL seconds, so callers fall back to the Frappe
+    cache without paying a connect timeout on every call.
+    
+    Args:
+        settings: redis_settings() to connect with, read from site config
+            if omitted; pass them from threads without a site context
+    
+    Returns:
+        Redis client, or None if Redis is not usable
+    """
+    state = _redis_state
+    if state["pid"] == os.getpid() and state["healthy"]:
+        return state["client"]
+    
+    with _redis_lock:
+        if state["pid"] != os.getpid():
+            state.update(pid=os.getpid(), client=None, healthy=None, checked_at=0.0)
+        
+        if state["healthy"]:
+            return state["client"]
+        if state["healthy"] is False and time.monotonic() - state["checked_at"] < REDIS_RETRY_INTERVAL:
+            return None
+        
+        state["checked_at"] = time.monotonic()
+        try:
+            if state["client"] is None:
+                state["client"] = _create_redis_client(settings)
+            state["client"].ping()
+            state["healthy"] = True
+            return state["client"]
+        except Exception as e:
+            if state["healthy"] is not False:
+                try:
+                    frappe.log_error(f"Redis initialization failed: {str(e)}", "CacheManager")
+                except Exception:
+                    # No site context, e.g. in the invalidation listener thread
+                    logger.warning("Redis initialization failed: %s", e)
+            state["healthy"] = False
+            return None
+
+
+def mark_redis_unhealthy() -> None:
+    """Stop using Redis until the next retry interval after a connection error."""
+    with _redis_lock:
+        if _redis_state["pid"] == os.getpid():
+            _redis_state["healthy"] = False
+            _redis_state["checked_at"] = time.monotonic()
+
+
+def redis_settings(conf) -> dict:
+    """Connection pool settings of the standalone Redis tier from site config."""
+    return {
+        "host": conf.get('cap_redis_host') or 'localhost',
+        "port": int(conf.get('cap_redis_port') or 6379),
+        "db": int(conf.get('cap_redis_db') or 0),
+        "max_connections": int(conf.get('cap_redis_max_connections') or 50),
+        "socket_connect_timeout": float(conf.get('cap_redis_connect_timeout') or 0.5),
+        "socket_timeout": float(conf.get('cap_redis_socket_timeout') or 2.0)
+    }
+
+
+def _create_redis_client(settings: Optional[dict] = None):
+    """Build a Redis client on a new connection pool, from site config unless settings are given."""
+    import redis
+    
+    pool = redis.ConnectionPool(
+        **(settings or redis_settings(frappe.conf)),
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        retry_on_timeout=True
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def _subscriber_client(settings: Optional[dict], fallback: Any):
+    """Client the invalidation listener subscribes with; uses no request-bound state.
+    
+    Args:
+        settings: redis_settings() of the standalone tier, None when it isn't used
+        fallback: Frappe's cache client, resolved while a site context was bound
+    """
+    if settings is not None:
+        client = get_redis_client(settings)
+        if client is not None:
+            return client
+    return fallback
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """Check if an exception means the Redis server is unreachable."""
+    try:
+        import redis
+    except ImportError:
+        return False
+    return isinstance(error, (redis.ConnectionError, redis.TimeoutError))
+
+
+def _apply_invalidation(message: dict) -> None:
+    """Apply an invalidation message received from another worker."""
+    local = get_local_cache()
+    site = message.get("site") or ""
+    
+    keys = message.get("keys")
+    if keys:
+        local.delete_many(f"{site}|{key}" for key in keys)
+    
+    pattern = message.get("pattern")
+    if pattern:
+        local.delete_pattern(f"{site}|{pattern}")
+
+
+
+def _encode(value: Any) -> Any:
+    """Replace None with the negative-result marker before storing."""
+    return _NONE_MARKER if value is None else value
+
+
+def _decode(value: Any) -> Any:
+    """Turn a stored negative-result marker back into None."""
+    if isinstance(value, dict) and value.get("__cap_none__") == 1 and len(value) == 1:
+        return None
+    return value
+
 
 class CacheManager:
     """Unified cache manager.
     
     Automatically uses Redis if available, falls back to Frappe cache.
+    Values written to Redis are encoded by cap.cache.serializers (msgpack,
+    pickle or JSON per key prefix, compressed above a size threshold); the
+    Frappe cache keeps its own pickle encoding.
+    Reads are served from a process-local L1 tier first; writes and deletes
+    are broadcast to other workers so their L1 entries are dropped.
+    
+    Construction performs no I/O: the Redis client is shared per process
+    and connects on first use. Prefer get_cache_manager() over creating
+    instances.
     """
     
-    def __init__(self, use_redis: bool = True):
+    def __init__(self, use_redis: bool = True, use_local: bool = True):
         """Initialize cache manager.
         
         Args:
             use_redis: Try to use Redis if available (default: True)
+            use_local: Serve reads from the process-local L1 tier (default: True)
         """
         self.use_redis = use_redis and self._is_redis_available()
-        self.redis_client = None
+        self._redis_client = None
+        self.negative_ttl = int(frappe.conf.get('cap_cache_negative_ttl') or DEFAULT_NEGATIVE_TTL)
+        # Resolved here, in the calling thread: the invalidation listener
+        # runs without a site context, where frappe.conf can't be read
+        site_redis = frappe.conf.get('redis_cache') or frappe.conf.get('redis_server')
+        self._redis_settings = redis_settings(frappe.conf) if self.use_redis and not site_redis else None
+        
+        self.local = get_local_cache() if use_local else None
+        self._listener_factory = partial(_subscriber_client, self._redis_settings, frappe.cache())
+        if self.local is not None:
+            self._ensure_listener()
+    
+    @property
+    def redis_client(self):
+        """Redis client for the standalone Redis tier, or None.
         
-        if self.use_redis:
-            self._init_redis()
+        None when Redis is disabled, unreachable, or the site has Redis
+        configured (Frappe's own pooled cache is used then, which also
+        applies the site key prefix).
+        """
+        if self._redis_client is not None:
+            return self._redis_client
+        if self._redis_settings is None:
+            return None
+        return get_redis_client(self._redis_settings)
+    
+    @redis_client.setter
+    def redis_client(self, client) -> None:
+        self._redis_client = client
     
     def get(self, key: str, default: Any = None) -> Any:
         """Get value from cache.
         
+        Falsy values (0, [], False, "") are returned as hits. A cached
+        negative result is returned as None; pass default=MISSING to tell
+        it apart from an absent key.
+        
         Args:
             key: Cache key
             default: Default value if not found
@@ -51,43 +296,90 @@ class CacheManager:
         Returns:
             Cached value or default
         """
+        if self.local is not None:
+            self._ensure_listener()
+            found, value = self.local.get(self._local_key(key))
+            if found:
+                _tier_stats["local"]["hits"] += 1
+                return value
+            _tier_stats["local"]["misses"] += 1
+        
+        tier = self._backend_tier()
         try:
-            if self.use_redis and self.redis_client:
-                value = self.redis_client.get(key)
-                if value:
-                    return json.loads(value)
+            redis_client = self.redis_client
+            if redis_client is not None:
+                value = redis_client.get(key)
+                if value is not None:
+                    value = _decode(serializers.loads(value))
+                    _tier_stats[tier]["hits"] += 1
+                    self._set_local(key, value)
+                    return value
             else:
                 value = frappe.cache().get_value(key)
                 if value is not None:
+                    value = _decode(value)
+                    _tier_stats[tier]["hits"] += 1
+                    self._set_local(key, value)
                     return value
         except Exception as e:
+            self._check_connection(e)
             frappe.log_error(f"Cache get error: {str(e)}", "CacheManager")
         
+        _tier_stats[tier]["misses"] += 1
         return default
     
-    def set(self, key: str, value: Any, ttl: int = 300) -> bool:
+    def set(self, key: str, value: Any, ttl: int = 300, tags: Optional[List[str]] = None,
+            negative_ttl: Optional[int] = None) -> bool:
         """Set value in cache.
         
         Args:
             key: Cache key
-            value: Value to cache
+            value: Value to cache; None is stored as a negative result
             ttl: Time to live in seconds (default: 5 minutes)
+            tags: Optional invalidation tags (e.g., ['tenant:acme']); the key
+                is removed by a later invalidate_tags() on any of them
+            negative_ttl: Time to live used instead of ttl when value is None
+                (default: cap_cache_negative_ttl or 60 seconds)
             
         Returns:
             True if successful
         """
+        if value is None:
+            ttl = negative_ttl if negative_ttl is not None else self.negative_ttl
+        
         try:
-            if self.use_redis and self.redis_client:
-                serialized = json.dumps(value)
-                self.redis_client.setex(key, ttl, serialized)
-                return True
+            redis_client = self.redis_client
+            if redis_client is not None:
+                serialized = serializers.dumps(_encode(value), key=key)
+                redis_client.setex(key, ttl, serialized)
             else:
-                frappe.cache().set_value(key, value, expires_in_sec=ttl)
-                return True
+                frappe.cache().set_value(key, _encode(value), expires_in_sec=ttl)
+            
+            if tags:
+                self._register_tags(key, tags, ttl)
+            
+            self._set_local(key, value, ttl)
+            self._publish(keys=[key])
+            return True
         except Exception as e:
+            self._check_connection(e)
+            self._delete_local(key)
             frappe.log_error(f"Cache set error: {str(e)}", "CacheManager")
             return False
     
+    def set_negative(self, key: str, ttl: Optional[int] = None, tags: Optional[List[str]] = None) -> bool:
+        """Cache an explicit negative result (e.g., "tenant does not exist").
+        
+        Args:
+            key: Cache key
+            ttl: Time to live in seconds (default: cap_cache_negative_ttl)
+            tags: Optional invalidation tags
+            
+        Returns:
+            True if successful
+        """
+        return self.set(key, None, tags=tags, negative_ttl=ttl)
+    
     def delete(self, key: str) -> bool:
         """Delete key from cache.
         
@@ -97,39 +389,134 @@ class CacheManager:
         Returns:
             True if successful
         """
+        self._delete_local(key)
         try:
-            if self.use_redis and self.redis_client:
-                self.redis_client.delete(key)
+            redis_client = self.redis_client
+            if redis_client is not None:
+                redis_client.delete(key)
             else:
                 frappe.cache().delete_value(key)
+            self._publish(keys=[key])
             return True
         except Exception as e:
+            self._check_connection(e)
             frappe.log_error(f"Cache delete error: {str(e)}", "CacheManager")
             return False
     
-    def delete_pattern(self, pattern: str) -> int:
+    def delete_pattern(self, pattern: str, batch_size: int = 500) -> int:
         """Delete all keys matching pattern.
         
+        Uses incremental SCAN so the Redis server is never blocked; a pattern
+        without wildcards is deleted directly. Prefer invalidate_tags() for
+        namespaces that are invalidated often.
+        
         Args:
             pattern: Key pattern (e.g., 'user:*')
+            batch_size: Keys requested per SCAN step and deleted per command
             
         Returns:
             Number of keys deleted
         """
+        if not any(ch in pattern for ch in "*?["):
+            return 1 if self.delete(pattern) else 0
+        
         try:
-            if self.use_redis and self.redis_client:
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    return self.redis_client.delete(*keys)
-                return 0
-            else:
-                # Frappe cache doesn't support pattern deletion
-                # This is a limitation of the Frappe cache
-                frappe.cache().delete_value(pattern)
-                return 1
+            client, make_key = self._raw_client()
+            deleted = 0
+            batch = []
+            
+            for raw_key in client.scan_iter(match=make_key(pattern), count=batch_size):
+                batch.append(raw_key)
+                if len(batch) >= batch_size:
+                    deleted += self._delete_raw(client, batch)
+                    batch = []
+            
+            if batch:
+                deleted += self._delete_raw(client, batch)
+            
+            return deleted
         except Exception as e:
             frappe.log_error(f"Cache pattern delete error: {str(e)}", "CacheManager")
             return 0
+        finally:
+            # Only once Redis no longer holds the keys, or L1 would reload the old values during the SCAN
+            if self.local is not None:
+                self.local.delete_pattern(self._local_key(pattern))
+                self._publish(pattern=pattern)
+    
+    def invalidate_tags(self, *tags: str) -> int:
+        """Delete every key registered under the given tags.
+        
+        Cost is proportional to the number of keys in the tags, independent
+        of the total number of keys in Redis.
+        
+        Args:
+            *tags: Tag names (e.g., 'tenant:acme', 'user:jane@example.com')
+            
+        Returns:
+            Number of keys deleted
+        """
+        deleted = 0
+        try:
+            client, make_key = self._raw_client()
+            
+            for tag in tags:
+                tag_key = make_key(f"{TAG_KEY_PREFIX}{tag}")
+                members = [
+                    m.decode() if isinstance(m, bytes) else m
+                    for m in client.smembers(tag_key)
+                ]
+                
+                for i in range(0, len(members), TAG_DELETE_BATCH):
+                    chunk = members[i:i + TAG_DELETE_BATCH]
+                    deleted += self._delete_raw(client, [make_key(key) for key in chunk])
+                
+                client.delete(tag_key)
+                
+                if members and self.local is not None:
+                    self.local.delete_many(self._local_key(key) for key in members)
+                    self._publish(keys=members)
+        except Exception as e:
+            frappe.log_error(f"Cache tag invalidation error: {str(e)}", "CacheManager")
+        
+        return deleted
+    
+    def acquire_lock(self, name: str, timeout_ms: int = 10000) -> Optional[str]:
+        """Acquire a short-lived lock shared by all workers.
+        
+        Args:
+            name: Lock name
+            timeout_ms: Lock expiry in milliseconds, bounds how long a
+                crashed holder can block others
+            
+        Returns:
+            Lock token if acquired, None if another worker holds the lock
+        """
+        token = uuid.uuid4().hex
+        try:
+            client, make_key = self._raw_client()
+            if client.set(make_key(f"{LOCK_KEY_PREFIX}{name}"), token, nx=True, px=timeout_ms):
+                return token
+        except Exception as e:
+            frappe.log_error(f"Cache lock error: {str(e)}", "CacheManager")
+        return None
+    
+    def release_lock(self, name: str, token: str) -> bool:
+        """Release a lock if it is still held with the given token.
+        
+        Args:
+            name: Lock name
+            token: Token returned by acquire_lock
+            
+        Returns:
+            True if the lock was released
+        """
+        try:
+            client, make_key = self._raw_client()
+            return bool(client.eval(_RELEASE_LOCK_SCRIPT, 1, make_key(f"{LOCK_KEY_PREFIX}{name}"), token))
+        except Exception as e:
+            frappe.log_error(f"Cache unlock error: {str(e)}", "CacheManager")
+            return False
     
     def exists(self, key: str) -> bool:
         """Check if key exists.
@@ -141,11 +528,13 @@ class CacheManager:
             True if exists
         """
         try:
-            if self.use_redis and self.redis_client:
-                return self.redis_client.exists(key) > 0
+            redis_client = self.redis_client
+            if redis_client is not None:
+                return redis_client.exists(key) > 0
             else:
                 return frappe.cache().get_value(key) is not None
         except Exception as e:
+            self._check_connection(e)
             frappe.log_error(f"Cache exists error: {str(e)}", "CacheManager")
             return False
     
@@ -160,14 +549,19 @@ class CacheManager:
             New value
         """
         try:
-            if self.use_redis and self.redis_client:
-                return self.redis_client.incrby(key, amount)
+            redis_client = self.redis_client
+            if redis_client is not None:
+                self._delete_local(key)
+                value = redis_client.incrby(key, amount)
+                self._publish(keys=[key])
+                return value
             else:
-                current = self.get(key, 0)
+                current = self.get(key, 0) or 0
                 new_value = current + amount
                 self.set(key, new_value)
                 return new_value
         except Exception as e:
+            self._check_connection(e)
             frappe.log_error(f"Cache increment error: {str(e)}", "CacheManager")
             return 0
     
@@ -184,38 +578,132 @@ class CacheManager:
         return self.increment(key, -amount)
     
     def get_many(self, keys: List[str]) -> dict:
-        """Get multiple values.
+        """Get multiple values in a single round trip.
+        
+        Keys found in the local tier are served from memory; the rest are
+        fetched with one MGET.
         
         Args:
             keys: List of cache keys
             
         Returns:
-            Dictionary of key-value pairs
+            Dictionary of key-value pairs; absent keys are omitted and
+            negative results map to None
         """
         result = {}
+        remaining = []
+        if self.local is not None:
+            self._ensure_listener()
+        
         for key in keys:
-            value = self.get(key)
-            if value is not None:
+            if self.local is not None:
+                found, value = self.local.get(self._local_key(key))
+                if found:
+                    _tier_stats["local"]["hits"] += 1
+                    result[key] = value
+                    continue
+                _tier_stats["local"]["misses"] += 1
+            remaining.append(key)
+        
+        if not remaining:
+            return result
+        
+        tier = self._backend_tier()
+        try:
+            redis_client = self.redis_client
+            if redis_client is not None:
+                raw_values = redis_client.mget(remaining)
+                decode = serializers.loads
+            else:
+                cache = frappe.cache()
+                raw_values = cache.mget([cache.make_key(key) for key in remaining])
+                decode = pickle.loads
+            
+            for key, raw in zip(remaining, raw_values):
+                if raw is None:
+                    _tier_stats[tier]["misses"] += 1
+                    continue
+                value = _decode(decode(raw))
+                _tier_stats[tier]["hits"] += 1
                 result[key] = value
+                self._set_local(key, value)
+        except Exception as e:
+            self._check_connection(e)
+            frappe.log_error(f"Cache get_many error: {str(e)}", "CacheManager")
+        
         return result
     
-    def set_many(self, mapping: dict, ttl: int = 300) -> bool:
-        """Set multiple values.
+    def set_many(self, mapping: dict, ttl: int = 300, return_failed: bool = False,
+                 tags: Optional[List[str]] = None):
+        """Set multiple values in a single pipelined round trip.
         
         Args:
             mapping: Dictionary of key-value pairs
             ttl: Time to live in seconds
+            return_failed: Return the list of keys that could not be written
+                instead of a boolean
+            tags: Optional invalidation tags applied to every written key
             
         Returns:
-            True if successful
+            True if every key was written, or the list of failed keys when
+            return_failed is set
         """
+        failed = []
+        written = []
+        
         try:
+            redis_client = self.redis_client
+            if redis_client is not None:
+                pipe = redis_client.pipeline(transaction=False)
+                make_key = None
+                encode = lambda key, value: serializers.dumps(value, key=key)
+            else:
+                cache = frappe.cache()
+                pipe = cache.pipeline(transaction=False)
+                make_key = cache.make_key
+                encode = lambda key, value: pickle.dumps(value)
+            
+            queued = []
             for key, value in mapping.items():
-                self.set(key, value, ttl=ttl)
-            return True
+                try:
+                    payload = encode(key, _encode(value))
+                except Exception:
+                    failed.append(key)
+                    continue
+                entry_ttl = self.negative_ttl if value is None else ttl
+                pipe.setex(make_key(key) if make_key else key, entry_ttl, payload)
+                queued.append((key, value))
+            
+            results = pipe.execute(raise_on_error=False) if queued else []
+            for (key, value), outcome in zip(queued, results):
+                if isinstance(outcome, Exception):
+                    failed.append(key)
+                else:
+                    written.append(key)
+                    self._set_local(key, value, ttl)
+            
+            if make_key:
+                self._forget_request_cache([make_key(key) for key in written])
+            
+            if tags and written:
+                self._register_tags(written, tags, ttl)
         except Exception as e:
+            self._check_connection(e)
+            failed = [key for key in mapping if key not in written]
             frappe.log_error(f"Cache set_many error: {str(e)}", "CacheManager")
-            return False
+        
+        if failed:
+            for key in failed:
+                self._delete_local(key)
+            frappe.log_error(
+                f"Cache set_many failed for {len(failed)} of {len(mapping)} keys: {failed[:20]}",
+                "CacheManager"
+            )
+        
+        if written:
+            self._publish(keys=written)
+        
+        return failed if return_failed else not failed
     
     def flush(self) -> bool:
         """Clear all cache.
@@ -223,9 +711,14 @@ class CacheManager:
         Returns:
             True if successful
         """
+        if self.local is not None:
+            self.local.delete_pattern(self._local_key("*"))
+            self._publish(pattern="*")
+        
         try:
-            if self.use_redis and self.redis_client:
-                self.redis_client.flushdb()
+            redis_client = self.redis_client
+            if redis_client is not None:
+                redis_client.flushdb()
             else:
                 frappe.cache().flush_all()
             return True
@@ -233,37 +726,125 @@ class CacheManager:
             frappe.log_error(f"Cache flush error: {str(e)}", "CacheManager")
             return False
     
+    def get_stats(self) -> dict:
+        """Get hit/miss counters per cache tier for this process.
+        
+        Returns:
+            Dictionary keyed by tier ('local', 'frappe', 'redis')
+        """
+        stats = {tier: dict(counters) for tier, counters in _tier_stats.items()}
+        if self.local is not None:
+            stats["local"].update(self.local.stats())
+        return stats
+    
     # Private methods
     
-    def _is_redis_available(self) -> bool:
-        """Check if Redis is available."""
+    def _backend_tier(self) -> str:
+        """Name of the shared tier backing this manager."""
+        return "redis" if self.redis_client is not None else "frappe"
+    
+    def _check_connection(self, error: Exception) -> None:
+        """Back off from the standalone Redis tier after a connection error."""
+        if self._redis_client is None and _is_connection_error(error):
+            mark_redis_unhealthy()
+    
+    def _local_key(self, key: str) -> str:
+        """Namespace a key by site for the process-wide L1 tier."""
+        return f"{getattr(frappe.local, 'site', None) or ''}|{key}"
+    
+    def _set_local(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Store a value in the L1 tier if enabled."""
+        if self.local is not None:
+            self.local.set(self._local_key(key), value, ttl)
+    
+    def _delete_local(self, key: str) -> None:
+        """Drop a key from the L1 tier if enabled."""
+        if self.local is not None:
+            self.local.delete(self._local_key(key))
+    
+    def _ensure_listener(self) -> None:
+        """Start this process's invalidation listener if it isn't running.
+        
+        Checked on every L1 read as well as at construction: the shared
+        manager is built once, and a worker forked after that inherits it
+        without the parent's listener thread.
+        """
+        ensure_listener(self._listener_factory, _apply_invalidation)
+    
+    def _raw_client(self):
+        """Get the underlying Redis client and its key-building function.
+        
+        Returns:
+            Tuple of (client, make_key); make_key applies the Frappe site
+            prefix when running on the Frappe cache
+        """
+        redis_client = self.redis_client
+        if redis_client is not None:
+            return redis_client, lambda key: key
+        cache = frappe.cache()
+        return cache, cache.make_key
+    
+    def _register_tags(self, keys: Union[str, List[str]], tags: List[str], ttl: int) -> None:
+        """Add one or more keys to the member set of each tag."""
+        keys = [keys] if isinstance(keys, str) else keys
+        client, make_key = self._raw_client()
+        pipe = client.pipeline(transaction=False)
+        for tag in tags:
+            tag_key = make_key(f"{TAG_KEY_PREFIX}{tag}")
+            pipe.sadd(tag_key, *keys)
+            pipe.expire(tag_key, max(ttl, TAG_SET_TTL))
+        pipe.execute()
+    
+    def _delete_raw(self, client, raw_keys: List) -> int:
+        """Delete backend keys, preferring non-blocking UNLINK."""
+        if not raw_keys:
+            return 0
+        self._forget_request_cache(raw_keys)
         try:
-            return True
-        except ImportError:
-            return False
+            return client.unlink(*raw_keys)
+        except Exception:
+            return client.delete(*raw_keys)
     
-    def _init_redis(self):
-        """Initialize Redis client."""
+    def _forget_request_cache(self, raw_keys: List[bytes]) -> None:
+        """Drop keys from Frappe's per-request cache after a pipelined write.
+        
+        frappe.cache().set_value keeps a request-local copy; writes that
+        bypass it must clear that copy or later reads in the same request
+        would see the old value.
+        """
+        request_cache = getattr(frappe.local, 'cache', None)
+        if isinstance(request_cache, dict):
+            for raw_key in raw_keys:
+                request_cache.pop(raw_key, None)
+    
+    def _pubsub_client(self):
+        """Redis client used for invalidation pub/sub."""
+        redis_client = self.redis_client
+        if redis_client is not None:
+            return redis_client
+        return frappe.cache()
+    
+    def _publish(self, keys: Optional[List[str]] = None, pattern: Optional[str] = None) -> None:
+        """Broadcast an L1 invalidation to the other workers."""
+        if self.local is None:
+            return
         try:
-            
-            # Try to get Redis config from Frappe
-            redis_server = frappe.conf.get('redis_cache') or frappe.conf.get('redis_server')
-            
-            if redis_server:
-                # Use Frappe's Redis configuration
-                self.redis_client = frappe.cache().redis_cache
-            else:
-                # Fallback to default Redis
-                self.redis_client = redis.Redis(
-                    host='localhost',
-                    port=6379,
-                    db=0,
-                    decode_responses=True
-                )
-                
-                # Test connection
-                self.redis_client.ping()
+            publish_invalidation(
+                self._pubsub_client(),
+                getattr(frappe.local, 'site', None) or '',
+                keys=keys,
+                pattern=pattern
+            )
         except Exception as e:
-            frappe.log_error(f"Redis initialization failed: {str(e)}", "CacheManager")
-            self.use_redis = False
-            self.redis_client = None
+            frappe.log_error(f"Cache invalidation error: {str(e)}", "CacheManager")
+    
+    def _is_redis_available(self) -> bool:
+        """Check if the redis package is installed."""
+        global _redis_importable
+        if _redis_importable is None:
+            try:
+                import redis
+                _redis_importable = True
+            except ImportError:
+                _redis_importable = False
+        return _redis_importable
@@ -0,0 +1,156 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: invalidation.py
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Callable, List, Optional
+"""Cross-worker Cache Invalidation
+
+Broadcasts local (L1) cache invalidations over Redis pub/sub so that every
+gunicorn and RQ worker drops stale entries.
+"""
+
+
+CHANNEL = "cap:cache:invalidate"
+
+# Identifies messages published by this process so they are not applied twice
+_origin = uuid.uuid4().hex
+_origin_pid = os.getpid()
+_listener: Optional["InvalidationListener"] = None
+_listener_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def get_origin() -> str:
+    """Get the process-unique origin id used in invalidation messages."""
+    global _origin, _origin_pid
+    if _origin_pid != os.getpid():
+        _origin = uuid.uuid4().hex
+        _origin_pid = os.getpid()
+    return _origin
+
+
+def publish_invalidation(client: Any, site: str, keys: Optional[List[str]] = None,
+                         pattern: Optional[str] = None) -> bool:
+    """Publish an invalidation message.
+
+    Args:
+        client: Redis client used for publishing
+        site: Site the keys belong to
+        keys: Exact keys to invalidate
+        pattern: Glob pattern to invalidate
+
+    Returns:
+        True if the message was published
+    """
+    if client is None or (not keys and not pattern):
+        return False
+
+    message = {"origin": get_origin(), "site": site}
+    if keys:
+        message["keys"] = list(keys)
+    if pattern:
+        message["pattern"] = pattern
+
+    try:
+        client.publish(CHANNEL, json.dumps(message))
+        return True
+    except Exception as e:
+        logger.warning("Cache invalidation publish failed: %s", e)
+        return False
+
+
+def ensure_listener(client_factory: Callable[[], Any], apply: Callable[[dict], None]) -> None:
+    """Start the invalidation listener for this process if not running.
+
+    Args:
+        client_factory: Callable returning a Redis client to subscribe with
+        apply: Callable applying a decoded message to the local cache
+    """
+    global _listener
+    listener = _listener
+    if listener is not None and listener.pid == os.getpid() and listener.is_alive():
+        return
+
+    with _listener_lock:
+        listener = _listener
+        if listener is not None and listener.pid == os.getpid() and listener.is_alive():
+            return
+        _listener = InvalidationListener(client_factory, apply)
+        _listener.start()
+
+
+class InvalidationListener(threading.Thread):
+    """Daemon thread applying invalidation messages to the local cache."""
+
+    def __init__(self, client_factory: Callable[[], Any], apply: Callable[[dict], None]):
+        """Initialize listener.
+
+        Args:
+            client_factory: Callable returning a Redis client to subscribe with
+            apply: Callable applying a decoded message to the local cache
+        """
+        super().__init__(name="cap-cache-invalidation", daemon=True)
+        self.client_factory = client_factory
+        self.apply = apply
+        self.pid = os.getpid()
+        self._stopped = threading.Event()
+
+    def stop(self) -> None:
+        """Ask the listener to stop after the current poll."""
+        self._stopped.set()
+
+    def run(self) -> None:
+        """Subscribe and apply messages, reconnecting with backoff on errors."""
+        backoff = 1.0
+        while not self._stopped.is_set():
+            pubsub = None
+            try:
+                client = self.client_factory()
+                if client is None:
+                    raise ConnectionError("No Redis client available")
+
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                backoff = 1.0
+
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._handle(message.get("data"))
+            except Exception as e:
+                logger.warning("Cache invalidation listener error: %s", e)
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def _handle(self, data: Any) -> None:
+        """Decode and apply a single message."""
+        try:
+            if isinstance(data, bytes):
+                data = data.decode()
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+
+        if message.get("origin") == get_origin():
+            return
+
+        self.apply(message)
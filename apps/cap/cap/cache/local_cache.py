@@ -0,0 +1,205 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: local_cache.py
+"""
+import fnmatch
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+"""Local (L1) Cache
+
+Bounded, process-local LRU cache that sits in front of the shared cache tiers.
+"""
+
+
+class LocalCache:
+    """Process-local LRU cache with an entry and byte budget.
+
+    Values are stored pickled, so callers always receive a private copy and
+    the byte budget reflects the real payload size.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 16 * 1024 * 1024,
+                 default_ttl: int = 30):
+        """Initialize local cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            max_bytes: Maximum total size of stored payloads in bytes
+            default_ttl: Upper bound for the lifetime of an entry in seconds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Get value from local cache.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of (found, value)
+        """
+        self._check_fork()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            payload, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return False, None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+        return True, pickle.loads(payload)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Set value in local cache.
+
+        Args:
+            key: Cache key
+            value: Value to cache (must be picklable)
+            ttl: Time to live in seconds, capped at ``default_ttl``
+
+        Returns:
+            True if the value was stored
+        """
+        self._check_fork()
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+
+        if len(payload) > self.max_bytes:
+            self.delete(key)
+            return False
+
+        ttl = min(ttl, self.default_ttl) if ttl else self.default_ttl
+        expires_at = time.monotonic() + ttl
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (payload, expires_at)
+            self._size += len(payload)
+            self._evict()
+
+        return True
+
+    def delete(self, key: str) -> bool:
+        """Delete key from local cache.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            True if the key was present
+        """
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                return True
+        return False
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """Delete several keys from local cache.
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Number of keys removed
+        """
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._remove(key)
+                    removed += 1
+        return removed
+
+    def delete_pattern(self, pattern: str) -> int:
+        """Delete all keys matching a glob pattern.
+
+        Args:
+            pattern: Key pattern (e.g., 'user:*')
+
+        Returns:
+            Number of keys removed
+        """
+        with self._lock:
+            keys = [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def stats(self) -> Dict:
+        """Get local cache statistics.
+
+        Returns:
+            Dictionary with hit/miss counters and current usage
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "bytes": self._size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes
+        }
+
+    # Private methods
+
+    def _remove(self, key: str) -> None:
+        """Remove key; caller must hold the lock."""
+        payload, _ = self._data.pop(key)
+        self._size -= len(payload)
+
+    def _evict(self) -> None:
+        """Evict least recently used entries; caller must hold the lock."""
+        while self._data and (len(self._data) > self.max_entries or self._size > self.max_bytes):
+            _, (payload, _) = self._data.popitem(last=False)
+            self._size -= len(payload)
+            self.evictions += 1
+
+    def _check_fork(self) -> None:
+        """Drop inherited entries after a fork.
+
+        A forked worker no longer receives invalidations addressed to the
+        parent's listener until it starts its own, so anything inherited is
+        potentially stale.
+        """
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+            self.clear()
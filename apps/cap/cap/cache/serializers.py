@@ -0,0 +1,273 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: serializers.py
+"""
+import frappe
+import datetime
+import json
+import pickle
+import zlib
+from decimal import Decimal
+from typing import Any, Dict, Optional
+"""Cache Serializers
+
+Pluggable value serializers for the Redis cache tier with transparent
+compression.
+
+Every payload written by this module starts with a three byte header::
+
+    b"\\x00" + <serializer id> + <codec id>
+
+JSON never starts with a NUL byte, so values written by earlier releases
+(plain JSON) keep decoding while workers roll over to the new format.
+"""
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MAGIC = b"\x00"
+
+# Codec ids
+CODEC_NONE = b"n"
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+DEFAULT_COMPRESS_THRESHOLD = 1024
+DEFAULT_COMPRESS_LEVEL = 3
+
+# msgpack extension type codes
+_EXT_DATETIME = 1
+_EXT_DATE = 2
+_EXT_TIME = 3
+_EXT_TIMEDELTA = 4
+_EXT_DECIMAL = 5
+
+
+class JSONSerializer:
+    """JSON serializer for values read by non-Python consumers.
+
+    Dates, datetimes and Decimals are written as strings, the same way
+    frappe.as_json does, so they do not round-trip as their original types.
+    """
+
+    name = "json"
+    id = b"j"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class MsgpackSerializer:
+    """msgpack serializer with extension types for dates and Decimals."""
+
+    name = "msgpack"
+    id = b"m"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+
+
+class PickleSerializer:
+    """Pickle (protocol 5) serializer for arbitrary Python objects.
+
+    Only use for keys written by trusted code; unpickling runs code.
+    """
+
+    name = "pickle"
+    id = b"p"
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=5)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+_serializers: Dict[str, Any] = {}
+_serializers_by_id: Dict[bytes, Any] = {}
+
+
+def register_serializer(serializer: Any) -> None:
+    """Register a serializer.
+
+    Args:
+        serializer: Object with ``name``, a one byte ``id`` and
+            ``dumps``/``loads`` methods
+    """
+    if len(serializer.id) != 1:
+        raise ValueError("Serializer id must be a single byte")
+    _serializers[serializer.name] = serializer
+    _serializers_by_id[serializer.id] = serializer
+
+
+def get_serializer(name: Optional[str] = None) -> Any:
+    """Get a serializer by name.
+
+    Args:
+        name: Serializer name; defaults to cap_cache_serializer from site
+            config, or msgpack when installed and pickle otherwise
+
+    Returns:
+        Serializer instance
+    """
+    if not name:
+        name = _conf().get("cap_cache_serializer") or ("msgpack" if msgpack else "pickle")
+    if name == "msgpack" and msgpack is None:
+        name = "pickle"
+    try:
+        return _serializers[name]
+    except KeyError:
+        raise ValueError(f"Unknown cache serializer: {name}")
+
+
+def serializer_for_key(key: Optional[str]) -> Any:
+    """Pick the serializer for a key from the per-prefix site config map.
+
+    ``cap_cache_serializers`` maps key prefixes to serializer names, e.g.
+    ``{"integration:": "json"}``; the longest matching prefix wins.
+
+    Args:
+        key: Cache key
+
+    Returns:
+        Serializer instance
+    """
+    prefixes = _conf().get("cap_cache_serializers") or {}
+    if key and prefixes:
+        matches = [prefix for prefix in prefixes if key.startswith(prefix)]
+        if matches:
+            return get_serializer(prefixes[max(matches, key=len)])
+    return get_serializer()
+
+
+def dumps(value: Any, key: Optional[str] = None, serializer: Optional[str] = None) -> bytes:
+    """Serialize a value for storage, compressing large payloads.
+
+    Plain integers are stored as decimal text so INCRBY keeps working on
+    counters written through set().
+
+    Args:
+        value: Value to serialize
+        key: Cache key, used to pick a per-prefix serializer
+        serializer: Explicit serializer name, overrides the key lookup
+
+    Returns:
+        Encoded payload
+    """
+    if type(value) is int:
+        return str(value).encode()
+
+    codec = get_serializer(serializer) if serializer else serializer_for_key(key)
+    data = codec.dumps(value)
+
+    conf = _conf()
+    threshold = conf.get("cap_cache_compress_threshold")
+    threshold = DEFAULT_COMPRESS_THRESHOLD if threshold is None else int(threshold)
+
+    if 0 < threshold <= len(data):
+        level = int(conf.get("cap_cache_compress_level") or DEFAULT_COMPRESS_LEVEL)
+        if zstandard is not None:
+            return MAGIC + codec.id + CODEC_ZSTD + zstandard.ZstdCompressor(level=level).compress(data)
+        return MAGIC + codec.id + CODEC_ZLIB + zlib.compress(data, level)
+
+    return MAGIC + codec.id + CODEC_NONE + data
+
+
+def loads(payload: Any) -> Any:
+    """Deserialize a payload written by dumps() or by the legacy JSON format.
+
+    Args:
+        payload: Stored bytes (or str from a decode_responses client)
+
+    Returns:
+        Decoded value
+    """
+    if isinstance(payload, str):
+        return json.loads(payload)
+
+    if not payload.startswith(MAGIC):
+        return json.loads(payload)
+
+    codec = _serializers_by_id.get(payload[1:2])
+    if codec is None:
+        raise ValueError(f"Unknown cache serializer id: {payload[1:2]!r}")
+
+    compression = payload[2:3]
+    data = payload[3:]
+    if compression == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard is required to read this cache value")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif compression == CODEC_ZLIB:
+        data = zlib.decompress(data)
+    elif compression != CODEC_NONE:
+        raise ValueError(f"Unknown cache compression codec: {compression!r}")
+
+    return codec.loads(data)
+
+
+# Private helpers
+
+def _conf() -> dict:
+    """Site config, or an empty dict outside a site context."""
+    return getattr(frappe, "conf", None) or {}
+
+
+def _msgpack_default(value: Any) -> Any:
+    """Encode types msgpack does not support natively."""
+    if isinstance(value, datetime.datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, datetime.date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode())
+    if isinstance(value, datetime.time):
+        return msgpack.ExtType(_EXT_TIME, value.isoformat().encode())
+    if isinstance(value, datetime.timedelta):
+        return msgpack.ExtType(_EXT_TIMEDELTA, str(value.total_seconds()).encode())
+    if isinstance(value, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(value).encode())
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__} with msgpack")
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    """Decode extension types written by _msgpack_default."""
+    text = data.decode()
+    if code == _EXT_DATETIME:
+        return datetime.datetime.fromisoformat(text)
+    if code == _EXT_DATE:
+        return datetime.date.fromisoformat(text)
+    if code == _EXT_TIME:
+        return datetime.time.fromisoformat(text)
+    if code == _EXT_TIMEDELTA:
+        return datetime.timedelta(seconds=float(text))
+    if code == _EXT_DECIMAL:
+        return Decimal(text)
+    return msgpack.ExtType(code, data)
+
+
+register_serializer(JSONSerializer())
+register_serializer(PickleSerializer())
+if msgpack is not None:
+    register_serializer(MsgpackSerializer())
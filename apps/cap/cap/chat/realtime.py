@@ -10,14 +10,17 @@ SPDX-FileContributor: Raasid (AI Companion)
 CAP module: realtime.py
 """
 import frappe
+from cap.observability.tracer import current_traceparent, traced
 # CAP Chat Realtime Module
 
 
+@traced("chat.broadcast_message")
 def broadcast_message(doc, method):
     """Broadcast new message to realtime listeners"""
     try:
         # Publish to specific chat session room
         room = f"chat_session_{getattr(doc, 'session_id', 'unknown')}"
+        traceparent = current_traceparent()
         
         frappe.publish_realtime(
             event='new_message',
@@ -27,7 +30,8 @@ def broadcast_message(doc, method):
                 'content': getattr(doc, 'content', ''),
                 'role': getattr(doc, 'role', 'user'),
                 'timestamp': getattr(doc, 'creation', None),
-                'tenant': getattr(doc, 'tenant', None)
+                'tenant': getattr(doc, 'tenant', None),
+                'traceparent': traceparent
             },
             room=room
         )
@@ -38,7 +42,8 @@ def broadcast_message(doc, method):
             event='tenant_message',
             message={
                 'session_id': getattr(doc, 'session_id', None),
-                'tenant': getattr(doc, 'tenant', None)
+                'tenant': getattr(doc, 'tenant', None),
+                'traceparent': traceparent
             },
             room=tenant_room
         )
@@ -11,29 +11,30 @@ CAP module: sessions.py
 """
 import frappe
 from frappe.utils import add_days, now_datetime
+from cap.repositories.base_repository import BaseRepository
 # CAP Chat Sessions Module
 
 
+# Sessions marked idle per UPDATE and commit
+SESSION_BATCH_SIZE = 500
+
+
 def cleanup_idle_sessions():
     """Clean up idle chat sessions"""
     try:
         # Find sessions idle for more than 24 hours
         cutoff_time = add_days(now_datetime(), -1)
         
-        idle_sessions = frappe.get_all(
-            'Chat Session',
-            filters={
+        # One set-based UPDATE per chunk, committed to release row locks
+        BaseRepository('Chat Session').update_where(
+            {
                 'modified': ['<', cutoff_time],
                 'status': 'Active'
             },
-            fields=['name']
+            {'status': 'Idle'},
+            chunk_size=SESSION_BATCH_SIZE,
+            commit=True
         )
         
-        for session in idle_sessions:
-            frappe.db.set_value('Chat Session', session.name, 'status', 'Idle')
-            
-        if idle_sessions:
-            frappe.db.commit()
-            
     except Exception as e:
         frappe.log_error(f"Error cleaning up sessions: {str(e)}", "CAP Chat")
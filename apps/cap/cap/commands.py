@@ -0,0 +1,55 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: commands.py
+"""
+import click
+import frappe
+import sys
+from frappe.commands import get_site, pass_context
+"""Bench Commands
+
+Registered with bench through the ``commands`` list, e.g.
+
+    bench --site <site> cap-verify-indexes
+"""
+
+
+
+@click.command("cap-verify-indexes")
+@click.option("--create", is_flag=True, help="Create missing indexes before checking")
+@pass_context
+def verify_indexes(context, create=False):
+    """EXPLAIN CAP's known query shapes and fail on any full scan."""
+    from cap.setup.indexes import ensure_indexes, verify_indexes as explain_query_shapes
+    
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        if create:
+            ensure_indexes()
+            frappe.db.commit()
+        results = explain_query_shapes()
+        frappe.db.rollback()
+    finally:
+        frappe.destroy()
+    
+    for result in results:
+        click.echo(f"{'ok  ' if result['ok'] else 'SCAN'}  {result['label']}")
+        if not result["ok"]:
+            click.echo(f"      {result['plan']}")
+    
+    failures = [result for result in results if not result["ok"]]
+    if failures:
+        click.secho(f"{len(failures)} of {len(results)} query shapes fall back to a full scan", fg="red")
+        sys.exit(1)
+    click.secho(f"All {len(results)} query shapes use an index", fg="green")
+
+
+commands = [verify_indexes]
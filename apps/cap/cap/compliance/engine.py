@@ -10,6 +10,9 @@ SPDX-FileContributor: Raasid (AI Companion)
 CAP module: engine.py
 """
 import frappe
+from frappe.utils import cint
+from cap.compliance.integrity import DEFAULT_SCAN_TIMEOUT
+from cap.observability.tracer import enqueue
 # CAP Compliance Engine Module
 
 
@@ -32,7 +35,14 @@ def run_quick_checks():
 def run_scheduled_scans():
     """Run scheduled compliance scans"""
     try:
-        # Placeholder for scheduled scans
-        pass
+        # The integrity sweep can outlast one job; it checkpoints and the next run resumes it.
+        # Skipped while a scan is still queued or running, so sweeps never overlap
+        enqueue(
+            "cap.compliance.integrity.run_integrity_scan",
+            queue="long",
+            timeout=cint(frappe.conf.get("cap_integrity_scan_timeout")) or DEFAULT_SCAN_TIMEOUT,
+            job_id="cap_integrity_scan",
+            deduplicate=True
+        )
     except Exception as e:
         frappe.log_error(f"Error in scheduled scans: {str(e)}", "CAP Compliance")
@@ -0,0 +1,453 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: integrity.py
+"""
+import frappe
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from frappe.utils import cint, get_datetime, now_datetime
+from cap.ledger.verify import MAX_REPORTED_FAILURES, VERIFY_FIELDS, verify_batch
+from cap.ledger.writer import GENESIS_HASH, canonical_json
+from cap.repositories.base_repository import BaseRepository
+"""Integrity Scanner
+
+Re-verifies every tenant's Ledger Event chain and every Evidence Chain in
+full. Each chain is a shard; shards run in a process pool, each worker
+streaming its chain in keyset batches with its own database connection.
+After every batch a shard writes an Integrity Scan Checkpoint (position,
+hash reached, counts) and commits, so a sweep killed by a job timeout or
+a worker restart resumes where it stopped on the next run instead of
+starting over.
+
+Evidence Chain Items are linked by link_chain_items() when their chain is
+saved, and by link_chain() for chains stored before items were hashed.
+Items that were never linked are skipped by the scan, not failed.
+"""
+
+
+# Shard kinds, also the checkpoint name prefix
+LEDGER_SHARD = "Ledger"
+CHAIN_SHARD = "Evidence Chain"
+
+# Rows per streamed batch and checkpoint
+SCAN_BATCH_SIZE = 2000
+
+# Evidence Chain Item fields read for verification
+ITEM_FIELDS = ["name", "sequence_number", "evidence", "hash_before", "hash_current"]
+
+# Fields of an Evidence Chain Item covered by hash_current
+ITEM_HASHED_FIELDS = ("sequence_number", "evidence", "content_hash")
+
+# Sweeps stop before the next hourly run starts another one; an
+# unfinished sweep is picked up by that run
+DEFAULT_SCAN_TIMEOUT = 3300
+
+
+def run_integrity_scan(workers=None) -> Optional[str]:
+    """Resume the unfinished sweep, or start one when the last is due.
+    
+    A new sweep starts once the previous one finished more than
+    ``cap_integrity_scan_interval_hours`` (default 24) ago.
+    
+    Args:
+        workers: Pool size, default ``cap_integrity_scan_workers`` or up to 4
+    
+    Returns:
+        Integrity Scan name, or None when no sweep is due
+    """
+    scan = _open_scan()
+    if not scan:
+        return None
+    
+    workers = cint(workers) or cint(frappe.conf.get("cap_integrity_scan_workers")) or min(4, os.cpu_count() or 1)
+    errors = sum(1 for ok in _run_shards(scan, _shards(), workers) if not ok)
+    
+    shards, checked, failed = frappe.db.sql(
+        "SELECT COUNT(*), COALESCE(SUM(`checked`), 0), COALESCE(SUM(`failed`), 0) "
+        "FROM `tabIntegrity Scan Checkpoint` WHERE `integrity_scan`=%s", (scan,)
+    )[0]
+    values = {"shards": shards, "checked": checked, "failed": failed}
+    # Shards that raised stay Running and are retried by the next run
+    if not errors:
+        values.update(status="Completed", finished_at=now_datetime())
+    frappe.db.set_value("Integrity Scan", scan, values)
+    frappe.db.commit()
+    
+    if failed:
+        frappe.log_error(f"Integrity scan {scan} found {failed} failures in {checked} records", "CAP Integrity")
+    return scan
+
+
+def scan_shard(scan: str, kind: str, subject: str) -> bool:
+    """Verify one chain from its checkpoint; runs in a pool worker.
+    
+    Args:
+        scan: Integrity Scan name
+        kind: LEDGER_SHARD (subject is a tenant) or CHAIN_SHARD (an Evidence Chain)
+        subject: Tenant or Evidence Chain name
+    
+    Returns:
+        True when the shard completed, False when it raised
+    """
+    try:
+        checkpoint = _checkpoint(scan, kind, subject)
+        if checkpoint.status != "Completed":
+            if kind == LEDGER_SHARD:
+                _scan_ledger(subject, checkpoint)
+            else:
+                _scan_evidence_chain(subject, checkpoint)
+        return True
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Error scanning {kind} {subject}: {str(e)}", "CAP Integrity")
+        return False
+
+
+def chain_item_hash(hash_before: Optional[str], item: Dict) -> str:
+    """SHA-256 link hash of an Evidence Chain Item.
+    
+    Args:
+        hash_before: hash_current of the preceding item
+        item: Item with ITEM_HASHED_FIELDS; content_hash is the Evidence's
+    
+    Returns:
+        Hex digest
+    """
+    fields = {field: item.get(field) for field in ITEM_HASHED_FIELDS}
+    payload = (hash_before or GENESIS_HASH) + canonical_json(fields)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def link_chain_items(doc, method=None):
+    """Hook: link an Evidence Chain's new items before the chain is saved.
+    
+    Items already linked keep their hashes, so an edit made after linking
+    still fails the scan. New items after the last linked one get
+    hash_before/hash_current and the chain's master_hash follows the last
+    of them. Linking stops at an item whose Evidence has no content_hash
+    yet; link_chain() picks it up once the Evidence is hashed.
+    
+    Args:
+        doc: Evidence Chain document
+        method: Hook method name
+    """
+    items = doc.get("evidence_table") or []
+    unlinked = [item.evidence for item in items if not item.get("hash_current")]
+    master_hash = _link_items(items, _evidence_hashes(unlinked))
+    if master_hash:
+        doc.master_hash = master_hash
+
+
+def link_chain(chain: str) -> int:
+    """Link an Evidence Chain's unlinked items in the database, without loading the chain.
+    
+    Args:
+        chain: Evidence Chain name
+    
+    Returns:
+        Number of items linked
+    """
+    items = frappe.get_all(
+        "Evidence Chain Item", filters={"parenttype": "Evidence Chain", "parent": chain},
+        fields=["name", "sequence_number", "evidence", "hash_before", "hash_current"], order_by="idx asc"
+    )
+    unlinked = {item.name for item in items if not item.hash_current}
+    master_hash = _link_items(items, _evidence_hashes([item.evidence for item in items if item.name in unlinked]))
+    
+    linked = [item for item in items if item.name in unlinked and item.hash_current]
+    for item in linked:
+        frappe.db.set_value("Evidence Chain Item", item.name, {
+            "sequence_number": item.sequence_number,
+            "hash_before": item.hash_before,
+            "hash_current": item.hash_current
+        }, update_modified=False)
+    if linked:
+        frappe.db.set_value("Evidence Chain", chain, "master_hash", master_hash, update_modified=False)
+    return len(linked)
+
+
+def verify_chain_items(previous: Optional[Tuple[int, str]], rows: List[Dict]) -> Tuple[int, List[Dict]]:
+    """Verify consecutive Evidence Chain Items, skipping items never linked.
+    
+    Args:
+        previous: (sequence_number, stored hash_current) of the item before
+            the batch, or None at the start of the chain
+        rows: Items in sequence_number order, with ITEM_FIELDS and the
+            linked Evidence's content_hash
+    
+    Returns:
+        (items checked, failures)
+    """
+    checked, failures = 0, []
+    for row in rows:
+        if not row["hash_current"]:
+            continue
+        checked += 1
+        problems = []
+        if previous and row["sequence_number"] <= previous[0]:
+            problems.append(f"sequence_number does not follow {previous[0]}")
+        if (row["hash_before"] or GENESIS_HASH) != (previous[1] if previous else GENESIS_HASH):
+            problems.append("hash_before does not match the preceding item")
+        if not row.get("content_hash"):
+            problems.append("linked Evidence is missing or has no content_hash")
+        elif chain_item_hash(row["hash_before"], row) != row["hash_current"]:
+            problems.append("hash_current does not match the item and its evidence")
+        
+        if problems:
+            failures.append({"item": row["name"], "sequence": row["sequence_number"], "problems": problems})
+        previous = (row["sequence_number"], row["hash_current"])
+    return checked, failures
+
+
+def _open_scan() -> Optional[str]:
+    """The Running Integrity Scan, or a new one if the last finished long enough ago."""
+    running = frappe.db.get_value("Integrity Scan", {"status": "Running"}, "name")
+    if running:
+        return running
+    
+    last = frappe.db.sql("SELECT MAX(`finished_at`) FROM `tabIntegrity Scan`")[0][0]
+    interval = cint(frappe.conf.get("cap_integrity_scan_interval_hours") or 24)
+    if last and get_datetime(last) > now_datetime() - timedelta(hours=interval):
+        return None
+    
+    scan = frappe.get_doc({"doctype": "Integrity Scan", "status": "Running", "started_at": now_datetime()})
+    scan.insert(ignore_permissions=True)
+    frappe.db.commit()
+    return scan.name
+
+
+def _shards() -> Iterator[Tuple[str, str]]:
+    """Stream (kind, subject) for every ledger chain and Evidence Chain."""
+    for head in BaseRepository("Ledger Chain Head").iter_all(fields=["name", "tenant"], batch_size=SCAN_BATCH_SIZE):
+        yield LEDGER_SHARD, head["tenant"]
+    for chain in BaseRepository("Evidence Chain").iter_all(fields=["name"], batch_size=SCAN_BATCH_SIZE):
+        yield CHAIN_SHARD, chain["name"]
+
+
+def _run_shards(scan: str, shards: Iterable[Tuple[str, str]], workers: int) -> Iterator[bool]:
+    """Run shards inline or in a process pool with at most 2 x workers queued."""
+    if workers <= 1:
+        for kind, subject in shards:
+            yield scan_shard(scan, kind, subject)
+        return
+    
+    # Spawned, not forked: a forked child would share the parent's
+    # database socket; each worker opens its own connection instead
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_connect_worker,
+                             initargs=(frappe.local.site, frappe.local.sites_path)) as pool:
+        pending = deque()
+        for kind, subject in shards:
+            pending.append(pool.submit(scan_shard, scan, kind, subject))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _connect_worker(site: str, sites_path: str) -> None:
+    """Pool initializer: connect the worker process to the site."""
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+
+
+def _checkpoint(scan: str, kind: str, subject: str) -> Dict:
+    """Load a shard's checkpoint, resetting one left by an earlier sweep."""
+    name = f"{kind}:{subject}"
+    checkpoint = frappe.db.get_value(
+        "Integrity Scan Checkpoint", name,
+        ["name", "integrity_scan", "status", "position", "last_hash", "checked", "failed", "failures"], as_dict=True
+    )
+    if checkpoint and checkpoint.integrity_scan == scan:
+        checkpoint.failures = json.loads(checkpoint.failures or "[]")
+        return checkpoint
+    
+    fresh = frappe._dict(integrity_scan=scan, status="Running", position=0, last_hash=None,
+                         checked=0, failed=0, failures=None)
+    if checkpoint:
+        frappe.db.set_value("Integrity Scan Checkpoint", name, fresh)
+    else:
+        frappe.get_doc(dict(fresh, doctype="Integrity Scan Checkpoint", shard=name, kind=kind, subject=subject)
+                       ).insert(ignore_permissions=True)
+    frappe.db.commit()
+    return frappe._dict(fresh, name=name, failures=[])
+
+
+def _save_progress(checkpoint: Dict, position: int, last_hash: str, checked: int, failures: List[Dict],
+                   status: str = "Running") -> None:
+    """Advance a checkpoint past a verified batch and commit."""
+    checkpoint.position, checkpoint.last_hash, checkpoint.status = position, last_hash, status
+    checkpoint.checked += checked
+    checkpoint.failed += len(failures)
+    checkpoint.failures.extend(failures[:MAX_REPORTED_FAILURES - len(checkpoint.failures)])
+    frappe.db.set_value("Integrity Scan Checkpoint", checkpoint.name, {
+        "status": status,
+        "position": position,
+        "last_hash": last_hash,
+        "checked": checkpoint.checked,
+        "failed": checkpoint.failed,
+        "failures": json.dumps(checkpoint.failures)
+    })
+    frappe.db.commit()
+
+
+def _batches(rows: Iterable[Dict]) -> Iterator[List[Dict]]:
+    """Group streamed rows into SCAN_BATCH_SIZE lists."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SCAN_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _scan_ledger(tenant: str, checkpoint: Dict) -> None:
+    """Verify a tenant's Ledger Event chain after the checkpoint, then its head."""
+    events = BaseRepository("Ledger Event").iter_all(
+        filters=[["tenant", "=", tenant], ["sequence", ">", checkpoint.position]],
+        fields=VERIFY_FIELDS, batch_size=SCAN_BATCH_SIZE, order_key="sequence"
+    )
+    previous = (checkpoint.position, checkpoint.last_hash) if checkpoint.position else None
+    
+    for batch in _batches(events):
+        checked, failures = verify_batch(previous, batch)
+        previous = (batch[-1]["sequence"], batch[-1]["current_hash"])
+        _save_progress(checkpoint, previous[0], previous[1], checked, failures)
+    
+    _save_progress(checkpoint, checkpoint.position, checkpoint.last_hash, 0,
+                   _ledger_head_failures(tenant, checkpoint.position, checkpoint.last_hash), "Completed")
+
+
+def _ledger_head_failures(tenant: str, sequence: int, current_hash: Optional[str]) -> List[Dict]:
+    """Check the Ledger Chain Head against the last event scanned.
+    
+    A head ahead of the scan is fine when its event exists (appended while
+    scanning); otherwise the chain's tail was removed.
+    """
+    head = frappe.db.get_value("Ledger Chain Head", tenant, ["last_sequence", "last_hash"], as_dict=True)
+    if not head:
+        return []
+    
+    last_sequence = cint(head.last_sequence)
+    if last_sequence > sequence:
+        if frappe.db.exists("Ledger Event", {"tenant": tenant, "sequence": last_sequence}):
+            return []
+        problem = f"chain ends at {sequence} but its head is at {last_sequence}"
+    elif last_sequence < sequence:
+        problem = f"head is at {last_sequence} but the chain continues to {sequence}"
+    elif head.last_hash != current_hash:
+        problem = "head hash does not match the last event"
+    else:
+        return []
+    return [{"event": None, "sequence": sequence, "problems": [problem]}]
+
+
+def _scan_evidence_chain(chain: str, checkpoint: Dict) -> None:
+    """Verify an Evidence Chain's items after the checkpoint and record the result on the chain."""
+    filters = [["parenttype", "=", "Evidence Chain"], ["parent", "=", chain]]
+    # Item sequence numbers may start at 0, so resume on the hash reached
+    previous = (checkpoint.position, checkpoint.last_hash) if checkpoint.last_hash else None
+    if previous:
+        filters.append(["sequence_number", ">", checkpoint.position])
+    items = BaseRepository("Evidence Chain Item").iter_all(
+        filters=filters, fields=ITEM_FIELDS, batch_size=SCAN_BATCH_SIZE, order_key="sequence_number"
+    )
+    
+    for batch in _batches(items):
+        _attach_content_hashes(batch)
+        checked, failures = verify_chain_items(previous, batch)
+        _mark_items(batch, failures)
+        linked = [item for item in batch if item["hash_current"]]
+        if linked:
+            previous = (linked[-1]["sequence_number"], linked[-1]["hash_current"])
+        _save_progress(checkpoint, batch[-1]["sequence_number"], previous[1] if previous else None, checked,
+                       failures)
+    
+    chain_doc = frappe.db.get_value("Evidence Chain", chain, ["master_hash", "alert_on_integrity_failure"],
+                                    as_dict=True) or frappe._dict()
+    failures = []
+    if chain_doc.master_hash and chain_doc.master_hash != checkpoint.last_hash:
+        failures.append({"item": None, "sequence": checkpoint.position,
+                         "problems": ["master_hash does not match the last item"]})
+    _save_progress(checkpoint, checkpoint.position, checkpoint.last_hash, 0, failures, "Completed")
+    
+    checked, failed = checkpoint.checked, checkpoint.failed
+    score = round(100.0 * max(checked - failed, 0) / checked, 2) if checked else (0.0 if failed else 100.0)
+    frappe.db.sql(
+        "UPDATE `tabEvidence Chain` SET `integrity_status`=%s, `integrity_score`=%s, `integrity_failure_count`=%s, "
+        "`last_integrity_check`=%s, `verification_count`=COALESCE(`verification_count`, 0) + 1 WHERE `name`=%s",
+        ("Compromised" if failed else "Intact" if checked else "Unknown", score, failed, now_datetime(), chain)
+    )
+    frappe.db.commit()
+    
+    if failed and chain_doc.alert_on_integrity_failure:
+        frappe.publish_realtime(
+            "integrity_alert",
+            {"chain_name": chain, "message": f"{failed} integrity failures in {checked} items"},
+            doctype="Evidence Chain", docname=chain
+        )
+
+
+def _link_items(items: List[Dict], content_hashes: Dict[str, str]) -> Optional[str]:
+    """Link the items after the last linked one, in sequence_number order; returns the last hash_current.
+    
+    Items are linked in the order the scanner verifies them. Items without
+    a sequence_number come last, in row order, and are numbered on.
+    """
+    items = sorted(items, key=lambda item: (item.get("sequence_number") is None, cint(item.get("sequence_number"))))
+    start = max((i + 1 for i, item in enumerate(items) if item.get("hash_current")), default=0)
+    previous = items[start - 1] if start else None
+    for item in items[start:]:
+        content_hash = content_hashes.get(item.get("evidence"))
+        if not content_hash:
+            break
+        if item.get("sequence_number") is None:
+            item.sequence_number = cint(previous.sequence_number) + 1 if previous else 1
+        item.hash_before = previous.hash_current if previous else None
+        item.hash_current = chain_item_hash(item.hash_before, {
+            "sequence_number": item.sequence_number,
+            "evidence": item.evidence,
+            "content_hash": content_hash
+        })
+        previous = item
+    return previous.hash_current if previous else None
+
+
+def _evidence_hashes(names: Iterable[str]) -> Dict[str, str]:
+    """content_hash of each named Evidence, in one query."""
+    names = list({name for name in names if name})
+    return dict(frappe.get_all("Evidence", filters=[["name", "in", names]], fields=["name", "content_hash"],
+                               as_list=True)) if names else {}
+
+
+def _attach_content_hashes(items: List[Dict]) -> None:
+    """Set each item's content_hash from its Evidence, one query per batch."""
+    hashes = _evidence_hashes(item["evidence"] for item in items)
+    for item in items:
+        item["content_hash"] = hashes.get(item["evidence"])
+
+
+def _mark_items(items: List[Dict], failures: List[Dict]) -> None:
+    """Store each verified item's result in its integrity_check flag."""
+    failed = {failure["item"] for failure in failures}
+    items = [item for item in items if item["hash_current"]]
+    for flag, names in ((0, [item["name"] for item in items if item["name"] in failed]),
+                        (1, [item["name"] for item in items if item["name"] not in failed])):
+        if names:
+            frappe.db.set_value("Evidence Chain Item", {"name": ["in", names]}, "integrity_check", flag,
+                                update_modified=False)
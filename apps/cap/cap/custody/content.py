@@ -0,0 +1,313 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: content.py
+"""
+import frappe
+import hashlib
+import os
+import shutil
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from frappe.utils import cint, get_files_path
+from cap.compliance.integrity import link_chain
+from cap.ledger.writer import canonical_json, rollback_to_savepoint, savepoint
+from cap.observability.tracer import enqueue
+"""Evidence Content Hashing
+
+Hashes evidence text and attachment files in one streaming pass over a
+fixed buffer, so memory stays at one chunk no matter how large the file
+is. Files up to the inline limit are hashed while the Evidence is saved;
+larger ones are left to a background job, and the Evidence keeps its
+previous hash until that job replaces it.
+
+Identical private files are stored once. Each private attachment is
+stored at /private/files/blobs/<sha256> and registered as a Content Blob;
+a later upload with the same content is pointed at the same path,
+whichever tenant it belongs to. Uploaded paths stay valid as hard links
+to the blob. Evidence.content_hash itself is computed per tenant over the
+text and attachment hashes, so shared storage never makes two tenants'
+evidence hashes equal.
+"""
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# Bytes read per chunk
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Folder under private files holding shared content, named by SHA-256
+BLOB_FOLDER = "blobs"
+
+# Attachments larger than this are hashed in a background job
+DEFAULT_INLINE_HASH_LIMIT = 8 * 1024 * 1024
+
+
+def new_prehash():
+    """Fast non-cryptographic hasher: xxh3-128 when xxhash is installed, else BLAKE2b-128."""
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_stream(stream: BinaryIO, prehash: bool = False, chunk_size: int = HASH_CHUNK_SIZE) -> Dict:
+    """Hash a binary stream in fixed-size chunks.
+    
+    Args:
+        stream: Object with readinto(), e.g. a file opened with buffering=0
+        prehash: Also compute the fast pre-hash in the same pass
+        chunk_size: Buffer size in bytes
+    
+    Returns:
+        Dict with sha256, size and prehash (None unless requested)
+    """
+    sha256 = hashlib.sha256()
+    fast = new_prehash() if prehash else None
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    size = 0
+    
+    while True:
+        read = stream.readinto(buffer)
+        if not read:
+            break
+        chunk = view[:read]
+        sha256.update(chunk)
+        if fast is not None:
+            fast.update(chunk)
+        size += read
+    
+    return {"sha256": sha256.hexdigest(), "size": size, "prehash": fast.hexdigest() if fast else None}
+
+
+def hash_file(path: str, prehash: bool = False) -> Dict:
+    """Hash a file with hash_stream(), reading straight into the chunk buffer.
+    
+    Args:
+        path: File path
+        prehash: Also compute the fast pre-hash
+    
+    Returns:
+        Dict with sha256, size and prehash
+    """
+    with open(path, "rb", buffering=0) as stream:
+        return hash_stream(stream, prehash)
+
+
+def evidence_content_hash(tenant: Optional[str], content_sha256: Optional[str], attachments: List[str]) -> str:
+    """Per-tenant hash of an Evidence's text and attachments.
+    
+    Args:
+        tenant: Evidence tenant
+        content_sha256: SHA-256 of the text content, None without text
+        attachments: Attachment SHA-256s in row order
+    
+    Returns:
+        Hex digest
+    """
+    manifest = {"tenant": tenant, "content": content_sha256, "attachments": attachments}
+    return hashlib.sha256(canonical_json(manifest).encode("utf-8")).hexdigest()
+
+
+def set_content_hash(doc, method=None):
+    """Hook: hash an Evidence's content before it is saved.
+    
+    Text and attachments up to ``cap_inline_hash_limit`` bytes are hashed
+    now. If any changed attachment is larger, hash_evidence_content runs
+    after the commit and the Evidence keeps its last complete content_hash
+    until then, so Evidence Chain Items linked to it keep verifying.
+    
+    Args:
+        doc: Evidence document
+        method: Hook method name
+    """
+    before = doc.get_doc_before_save()
+    hashed = {row.name: row.file_url for row in (before.get("attachments") if before else None) or []
+              if row.get("content_hash")}
+    limit = cint(frappe.conf.get("cap_inline_hash_limit")) or DEFAULT_INLINE_HASH_LIMIT
+    
+    pending = False
+    for row in doc.get("attachments") or []:
+        if row.get("content_hash") and hashed.get(row.name) == row.file_url:
+            continue
+        row.content_hash = None
+        path = file_path(row.file_url)
+        if path is None:
+            continue
+        if not os.path.exists(path):
+            # A missing file must not block the save; the row stays unhashed
+            frappe.log_error(f"Attachment {row.file_url} of evidence {doc.name} is missing", "CAP Evidence")
+            continue
+        if os.path.getsize(path) > limit:
+            pending = True
+            continue
+        _hash_attachment(row)
+    
+    if pending:
+        doc.content_hash, doc.content_size = (before.content_hash, before.content_size) if before else (None, None)
+        enqueue("cap.custody.content.hash_evidence_content", queue="long", evidence=doc.name,
+                enqueue_after_commit=True)
+    else:
+        doc.content_hash, doc.content_size = _evidence_digest(doc)
+
+
+def hash_evidence_content(evidence: str) -> None:
+    """Background job: hash an Evidence's unhashed attachments and set its content_hash.
+    
+    Evidence Chain Items left unlinked while the Evidence had no
+    content_hash are linked once it has one.
+    
+    Args:
+        evidence: Evidence name
+    """
+    try:
+        doc = frappe.get_doc("Evidence", evidence)
+        for row in doc.get("attachments") or []:
+            path = file_path(row.file_url)
+            if not row.get("content_hash") and path and os.path.exists(path):
+                _hash_attachment(row)
+                frappe.db.set_value("Evidence Attachment", row.name, {
+                    "file_url": row.file_url,
+                    "file_size": row.file_size,
+                    "content_hash": row.content_hash
+                }, update_modified=False)
+        
+        content_hash, content_size = _evidence_digest(doc)
+        frappe.db.set_value("Evidence", evidence, {"content_hash": content_hash, "content_size": content_size},
+                            update_modified=False)
+        chains = frappe.get_all("Evidence Chain Item", filters={"parenttype": "Evidence Chain", "evidence": evidence},
+                                pluck="parent")
+        for chain in set(chains):
+            link_chain(chain)
+        frappe.db.commit()
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Error hashing evidence {evidence}: {str(e)}", "CAP Evidence")
+
+
+def file_path(file_url: Optional[str]) -> Optional[str]:
+    """Local path of a /files/ or /private/files/ URL; None for external URLs."""
+    if not file_url:
+        return None
+    for prefix, is_private in (("/private/files/", True), ("/files/", False)):
+        if file_url.startswith(prefix):
+            return get_files_path(*file_url[len(prefix):].split("/"), is_private=is_private)
+    return None
+
+
+def store_blob(digest: Dict, file_url: str) -> str:
+    """Store a hashed private file at its content address, sharing identical content.
+    
+    Every private file is stored at /private/files/blobs/<sha256>, whether
+    or not the content was stored before, so the URL an upload gets says
+    nothing about other tenants' files. Its File rows are repointed there
+    and keep their own file_name. The uploaded path is kept, as a hard
+    link to the blob where the filesystem allows, so Attach fields and
+    other rows still holding the old URL keep working. File.content_hash
+    is kept in step so Frappe keeps a shared file on disk until its last
+    File is deleted. Public files stay where they are.
+    
+    Args:
+        digest: hash_file() result for the file
+        file_url: URL of the file just hashed
+    
+    Returns:
+        The URL the content is stored at from now on
+    """
+    url = blob_url(digest["sha256"])
+    if not file_url.startswith("/private/files/") or file_url == url:
+        return file_url
+    
+    uploaded, path = file_path(file_url), file_path(url)
+    if not os.path.exists(path):
+        # The first copy, or the stored one was deleted with its last File
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _link_file(uploaded, path)
+    else:
+        _share_file(path, uploaded)
+    _register_blob(digest, url)
+    
+    content_hash = frappe.db.get_value("File", {"file_url": url}, "content_hash")
+    values = {"file_url": url, "content_hash": content_hash} if content_hash else {"file_url": url}
+    frappe.db.set_value("File", {"file_url": file_url}, values, update_modified=False)
+    return url
+
+
+def blob_url(sha256: str) -> str:
+    """Tenant-neutral URL of the stored content with this SHA-256."""
+    return f"/private/files/{BLOB_FOLDER}/{sha256}"
+
+
+def _hash_attachment(row) -> None:
+    """Hash an attachment row's file, share its storage and set content_hash and file_size."""
+    # The BLAKE2b fallback costs more than SHA-256 itself, so the pre-hash defaults on only with xxhash
+    prehash = cint(frappe.conf.get("cap_content_prehash", xxhash is not None))
+    digest = hash_file(file_path(row.file_url), prehash=bool(prehash))
+    row.file_url = store_blob(digest, row.file_url)
+    row.content_hash = digest["sha256"]
+    row.file_size = digest["size"]
+
+
+def _evidence_digest(doc) -> Tuple[str, int]:
+    """(content_hash, content_size) of an Evidence whose attachments are hashed."""
+    content = (doc.get("content") or "").encode("utf-8")
+    content_sha256 = hashlib.sha256(content).hexdigest() if content else None
+    rows = [row for row in doc.get("attachments") or [] if row.get("content_hash")]
+    size = len(content) + sum(cint(row.file_size) for row in rows)
+    return evidence_content_hash(doc.get("tenant"), content_sha256, [row.content_hash for row in rows]), size
+
+
+def _register_blob(digest: Dict, url: str) -> None:
+    """Record a stored blob in the Content Blob registry unless it is there already."""
+    if frappe.db.get_value("Content Blob", digest["sha256"], "name"):
+        return
+    # A failed INSERT aborts the whole transaction on Postgres
+    savepoint("content_blob")
+    try:
+        frappe.get_doc({
+            "doctype": "Content Blob",
+            "sha256": digest["sha256"],
+            "size": digest["size"],
+            "prehash": digest["prehash"],
+            "file_url": url
+        }).insert(ignore_permissions=True)
+    except frappe.DuplicateEntryError:
+        # Registered concurrently by another job
+        rollback_to_savepoint("content_blob")
+
+
+def _link_file(source: str, target: str) -> None:
+    """Give source's content a second name at target without copying it where the filesystem allows."""
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        # Stored concurrently; same address, same content
+        pass
+    except OSError:
+        partial_path = f"{target}.{os.getpid()}.part"
+        shutil.copyfile(source, partial_path)
+        os.replace(partial_path, target)
+
+
+def _share_file(stored: str, duplicate: str) -> None:
+    """Replace a duplicate's bytes with a hard link to the stored copy, keeping its path."""
+    if os.path.samefile(stored, duplicate):
+        return
+    link = f"{duplicate}.{os.getpid()}.link"
+    try:
+        os.link(stored, link)
+    except OSError:
+        # No hard links on this filesystem; the duplicate keeps its own bytes
+        return
+    try:
+        os.replace(link, duplicate)
+    except OSError:
+        os.remove(link)
@@ -0,0 +1,17 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+DocType module: integrity_scan_checkpoint.py
+"""
+import frappe
+from frappe.model.document import Document
+
+
+class IntegrityScanCheckpoint(Document):
+    pass
@@ -0,0 +1,32 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+DocType module: metric_sketch.py
+"""
+import frappe
+import json
+from frappe.model.document import Document
+from cap.observability.sketch import DDSketch
+
+
+class MetricSketch(Document):
+    def get_sketch(self) -> DDSketch:
+        """Deserialize the stored sketch."""
+        return DDSketch.from_dict(json.loads(self.sketch or "{}"))
+
+    def set_sketch(self, sketch: DDSketch) -> None:
+        """Store a sketch and refresh the summary fields derived from it."""
+        self.sketch = json.dumps(sketch.to_dict(), separators=(",", ":"))
+        self.sample_count = sketch.count
+        self.total = sketch.sum
+        self.min_value = sketch.min if sketch.count else None
+        self.max_value = sketch.max if sketch.count else None
+        self.p50 = sketch.quantile(0.5)
+        self.p90 = sketch.quantile(0.9)
+        self.p99 = sketch.quantile(0.99)
@@ -11,10 +11,13 @@ SPDX-FileContributor: Raasid (AI Companion)
 from __future__ import unicode_literals
 import frappe
 from frappe.model.document import Document
-from frappe.utils import now_datetime, add_days, cstr
+from frappe.utils import add_days, cstr
 import secrets
 import hashlib
 import uuid
+from cap.repositories.base_repository import BaseRepository
+from cap.repositories.counters import get_count
+from cap.ledger.events import create_ledger_event
 
 class Tenant(Document):
     def before_insert(self):
@@ -258,61 +261,55 @@ class Tenant(Document):
     def log_creation_event(self):
         """تسجيل إنشاء المستأجر في دفتر الأستاذ"""
         try:
-            frappe.get_doc({
-                "doctype": "Ledger Event",
-                "tenant": self.name,
-                "event_type": "tenant_created",
-                "subject_doctype": "Tenant",
-                "subject_name": self.name,
-                "actor_user": frappe.session.user,
-                "event_data": frappe.as_json({
+            create_ledger_event(
+                tenant=self.name,
+                event_type="tenant_created",
+                subject_doctype="Tenant",
+                subject_name=self.name,
+                actor_user=frappe.session.user,
+                event_data={
                     "tenant_name": self.tenant_name,
                     "domain": self.domain,
                     "plan_type": self.plan_type,
                     "status": self.status
-                }),
-                "timestamp": now_datetime()
-            }).insert(ignore_permissions=True)
+                }
+            )
         except Exception as e:
             frappe.log_error(f"خطأ في تسجيل إنشاء المستأجر {self.name}: {str(e)}")
     
     def log_status_change(self):
         """تسجيل تغيير حالة المستأجر"""
         try:
-            frappe.get_doc({
-                "doctype": "Ledger Event", 
-                "tenant": self.name,
-                "event_type": "tenant_status_changed",
-                "subject_doctype": "Tenant",
-                "subject_name": self.name,
-                "actor_user": frappe.session.user,
-                "event_data": frappe.as_json({
+            create_ledger_event(
+                tenant=self.name,
+                event_type="tenant_status_changed",
+                subject_doctype="Tenant",
+                subject_name=self.name,
+                actor_user=frappe.session.user,
+                event_data={
                     "old_status": self.get_doc_before_save().status if self.get_doc_before_save() else None,
                     "new_status": self.status,
                     "reason": "Status changed by admin"
-                }),
-                "timestamp": now_datetime()
-            }).insert(ignore_permissions=True)
+                }
+            )
         except Exception as e:
             frappe.log_error(f"خطأ في تسجيل تغيير حالة المستأجر {self.name}: {str(e)}")
     
     def suspend_tenant_users(self):
         """تعليق جميع مستخدمي المستأجر"""
         try:
-            users = frappe.get_all("User", filters={"tenant": self.name}, pluck="name")
-            for user in users:
-                frappe.db.set_value("User", user, "enabled", 0)
-            frappe.db.commit()
+            BaseRepository("User").update_where(
+                {"enabled": 1}, {"enabled": 0}, tenant=self.name, commit=True
+            )
         except Exception as e:
             frappe.log_error(f"خطأ في تعليق مستخدمي المستأجر {self.name}: {str(e)}")
     
     def activate_tenant_users(self):
         """تفعيل جميع مستخدمي المستأجر"""
         try:
-            users = frappe.get_all("User", filters={"tenant": self.name}, pluck="name")
-            for user in users:
-                frappe.db.set_value("User", user, "enabled", 1)
-            frappe.db.commit()
+            BaseRepository("User").update_where(
+                {"enabled": 0}, {"enabled": 1}, tenant=self.name, commit=True
+            )
         except Exception as e:
             frappe.log_error(f"خطأ في تفعيل مستخدمي المستأجر {self.name}: {str(e)}")
     
@@ -340,10 +337,10 @@ class Tenant(Document):
         """إحصائيات استخدام المستأجر"""
         try:
             stats = {
-                "users_count": frappe.db.count("User", {"tenant": self.name}),
-                "policies_count": frappe.db.count("Policy", {"tenant": self.name}),
-                "chat_sessions_count": frappe.db.count("Chat Session", {"tenant": self.name}),
-                "evidence_count": frappe.db.count("Evidence", {"tenant": self.name}),
+                "users_count": get_count("User", self.name),
+                "policies_count": get_count("Policy", self.name),
+                "chat_sessions_count": get_count("Chat Session", self.name),
+                "evidence_count": get_count("Evidence", self.name),
                 "storage_used": self.calculate_storage_usage(),
                 "last_activity": self.get_last_activity(),
             }
@@ -387,16 +384,14 @@ class Tenant(Document):
         self.save(ignore_permissions=True)
         
         # تسجيل الحدث
-        frappe.get_doc({
-            "doctype": "Ledger Event",
-            "tenant": self.name,
-            "event_type": "api_key_regenerated", 
-            "subject_doctype": "Tenant",
-            "subject_name": self.name,
-            "actor_user": frappe.session.user,
-            "event_data": frappe.as_json({"action": "API key regenerated"}),
-            "timestamp": now_datetime()
-        }).insert(ignore_permissions=True)
+        create_ledger_event(
+            tenant=self.name,
+            event_type="api_key_regenerated",
+            subject_doctype="Tenant",
+            subject_name=self.name,
+            actor_user=frappe.session.user,
+            event_data={"action": "API key regenerated"}
+        )
         
         return {"message": "تم إعادة إنشاء مفتاح API بنجاح"}
     
@@ -405,10 +400,10 @@ class Tenant(Document):
         """الحصول على ملخص الامتثال للمستأجر"""
         try:
             summary = {
-                "total_policies": frappe.db.count("Policy", {"tenant": self.name}),
-                "total_assessments": frappe.db.count("Compliance Assessment", {"tenant": self.name}),
-                "total_violations": frappe.db.count("Violation", {"tenant": self.name}),
-                "total_evidence": frappe.db.count("Evidence", {"tenant": self.name}),
+                "total_policies": get_count("Policy", self.name),
+                "total_assessments": get_count("Compliance Assessment", self.name),
+                "total_violations": get_count("Violation", self.name),
+                "total_evidence": get_count("Evidence", self.name),
                 "compliance_framework": self.compliance_framework or "Not Set",
                 "audit_enabled": self.audit_enabled,
                 "data_retention_days": self.data_retention_days
@@ -464,9 +459,9 @@ class Tenant(Document):
                 "month": current_month,
                 "year": current_year,
                 "active_users": frappe.db.count("User", {"tenant": self.name, "enabled": 1}),
-                "total_sessions": frappe.db.count("Chat Session", {"tenant": self.name}),
-                "policies_created": frappe.db.count("Policy", {"tenant": self.name}),
-                "assessments_completed": frappe.db.count("Compliance Assessment", {"tenant": self.name}),
+                "total_sessions": get_count("Chat Session", self.name),
+                "policies_created": get_count("Policy", self.name),
+                "assessments_completed": get_count("Compliance Assessment", self.name),
                 "storage_used_gb": self.calculate_storage_usage(),
                 "api_calls": self.get_api_calls_count()
             }
@@ -48,6 +48,9 @@ doc_events = {
     "*": {
         "before_save": "cap.utils.tenant.auto_set_tenant",
         "before_insert": "cap.utils.tenant.validate_tenant_access",
+        # per-tenant Record Counters (cap.repositories.counters.COUNTED_DOCTYPES)
+        "after_insert": "cap.repositories.counters.on_insert",
+        "on_trash": "cap.repositories.counters.on_trash",
     },
     
     # دفتر الأستاذ - تسجيل كل تغيير مهم
@@ -58,10 +61,15 @@ doc_events = {
     },
     
     "Evidence": {
+        "before_save": "cap.custody.content.set_content_hash",
         "after_insert": "cap.ledger.events.log_evidence_added",
         "on_update": "cap.custody.chain.log_custody_change",
     },
     
+    "Evidence Chain": {
+        "before_save": "cap.compliance.integrity.link_chain_items",
+    },
+    
     "Message": {
         "before_insert": "cap.compliance.check.pre_message_check",
         "after_insert": "cap.chat.realtime.broadcast_message",
@@ -77,6 +85,12 @@ doc_events = {
     }
 }
 
+# Batched after-insert subscribers for BaseRepository.bulk_insert(fast=True),
+# called once per chunk with (doctype, rows): {"DocType": ["dotted.path"]}.
+# The fast path skips doc_events, so it is refused for DocTypes that have
+# no subscriber here and aren't in base_repository.FAST_INSERT_DOCTYPES
+cap_bulk_after_insert = {}
+
 # ==========================================
 # المهام المجدولة (Scheduled Jobs)
 # ==========================================
@@ -111,6 +125,7 @@ scheduler_events = {
         "cap.reports.daily.generate_daily_reports",
         "cap.cleanup.sessions.archive_old_sessions",
         "cap.backup.evidence.backup_evidence_files",
+        "cap.repositories.counters.reconcile_counters",
     ],
     
     # أسبوعياً - تحليلات عميقة
@@ -120,6 +135,33 @@ scheduler_events = {
     ],
 }
 
+# ==========================================
+# Background Jobs
+# ==========================================
+
+# Flush aggregated metrics, sampled spans and queued logs before the work-horse process exits
+after_job = [
+    "cap.observability.metrics.flush_metrics",
+    "cap.observability.tracer.flush_traces",
+    "cap.observability.logger.flush_logs",
+    "cap.observability.logger.clear_context",
+]
+
+# ==========================================
+# Request Tracing
+# ==========================================
+
+# Server span per request, continuing an incoming W3C traceparent, and a
+# request-scoped log context
+before_request = [
+    "cap.observability.tracer.start_request_trace",
+    "cap.observability.logger.start_request_context",
+]
+after_request = [
+    "cap.observability.tracer.end_request_trace",
+    "cap.observability.logger.end_request_context",
+]
+
 # ==========================================
 # استعلامات الصلاحيات (Permission Queries)
 # ==========================================
@@ -238,6 +280,8 @@ jenv = {
 # ==========================================
 
 after_install = "cap.setup.install.after_install"
+# Patches are marked done on fresh installs, so indexes are (re)checked on every migrate
+after_migrate = ["cap.setup.indexes.ensure_indexes"]
 
 # ==========================================
 # تخصيص القوائم
@@ -10,13 +10,251 @@ SPDX-FileContributor: Raasid (AI Companion)
 CAP module: anchor.py
 """
 import frappe
-# CAP Ledger Anchor Module
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+from frappe.utils import cint, now_datetime
+from cap.ledger.merkle import build_levels, inclusion_proof, leaf_hash
+from cap.repositories.base_repository import BaseRepository
+"""Merkle-batched Anchoring
+
+Every hour the un-anchored events of each tenant are streamed in chain
+order and folded into one Merkle root, which is written once to the anchor
+backend. 1,000 events or 1,000,000 cost the same single external write.
+
+Events are hashed in chunks of ANCHOR_CHUNK_SIZE: each chunk's tree gives
+its events their proof up to the chunk root, written as the chunk is read.
+Chunk roots form the top tree, whose root is anchored. A final UPDATE per
+chunk appends the chunk's top-tree path to its events' proofs and stamps
+merkle_root and the backend receipt. Memory is one chunk plus one hash per
+chunk, whatever the batch size.
+"""
+
+
+# Events per chunk tree
+ANCHOR_CHUNK_SIZE = 1024
+
+# Events anchored per tenant per run; the rest wait for the next run
+DEFAULT_MAX_EVENTS = 1000000
+
+# Rows per CASE UPDATE when writing chunk proofs
+PROOF_UPDATE_SIZE = 512
+
+
+class AnchorBackend:
+    """Where Merkle roots are published.
+    
+    Subclasses implement anchor(); select one with the
+    ``cap_anchor_backend`` site config (dotted path to the class).
+    """
+    
+    name = "base"
+    
+    def anchor(self, tenant: str, merkle_root: str, metadata: Dict) -> Dict:
+        """Publish a root.
+        
+        Args:
+            tenant: Tenant name
+            merkle_root: Hex root
+            metadata: Event count and sequence range
+            
+        Returns:
+            Receipt with block_hash, transaction_hash and anchored_at
+        """
+        raise NotImplementedError
+    
+    def lookup(self, merkle_root: str) -> Optional[Dict]:
+        """Receipt of a previously anchored root, or None."""
+        raise NotImplementedError
+
+
+class SQLiteNotary(AnchorBackend):
+    """Offline stand-in for a blockchain: an append-only, hash-chained SQLite file.
+    
+    Each entry's hash covers the previous entry's hash, so rewriting an
+    anchored root breaks every later entry. Keep the file on separate
+    storage (or copy it off-site) for it to mean anything.
+    """
+    
+    name = "sqlite_notary"
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or frappe.conf.get("cap_notary_path") or \
+            frappe.get_site_path("private", "cap_notary.sqlite3")
+    
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS anchors (
+                id INTEGER PRIMARY KEY,
+                tenant TEXT NOT NULL,
+                merkle_root TEXT NOT NULL,
+                metadata TEXT,
+                previous_hash TEXT NOT NULL,
+                entry_hash TEXT NOT NULL UNIQUE,
+                anchored_at TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS anchors_root ON anchors (merkle_root)")
+        return conn
+    
+    def anchor(self, tenant: str, merkle_root: str, metadata: Dict) -> Dict:
+        anchored_at = now_datetime()
+        conn = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front, serializing workers
+            conn.execute("BEGIN IMMEDIATE")
+            last = conn.execute("SELECT entry_hash FROM anchors ORDER BY id DESC LIMIT 1").fetchone()
+            previous_hash = last[0] if last else "0" * 64
+            entry_hash = hashlib.sha256(
+                f"{previous_hash}|{tenant}|{merkle_root}|{anchored_at.isoformat()}".encode()
+            ).hexdigest()
+            cursor = conn.execute(
+                "INSERT INTO anchors (tenant, merkle_root, metadata, previous_hash, entry_hash, anchored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (tenant, merkle_root, json.dumps(metadata, default=str), previous_hash, entry_hash,
+                 anchored_at.isoformat())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        
+        return {"block_hash": str(cursor.lastrowid), "transaction_hash": entry_hash, "anchored_at": anchored_at}
+    
+    def lookup(self, merkle_root: str) -> Optional[Dict]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT id, entry_hash, anchored_at FROM anchors WHERE merkle_root = ? ORDER BY id LIMIT 1",
+                (merkle_root,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        return {"block_hash": str(row[0]), "transaction_hash": row[1], "anchored_at": row[2]}
+
+
+def get_anchor_backend() -> AnchorBackend:
+    """Backend configured by ``cap_anchor_backend``, the SQLite notary by default."""
+    path = frappe.conf.get("cap_anchor_backend")
+    return frappe.get_attr(path)() if path else SQLiteNotary()
 
 
 def batch_anchor_to_blockchain():
-    """Batch anchor events to blockchain"""
+    """Anchor each tenant's un-anchored Ledger Events under one Merkle root"""
     try:
-        # Placeholder for blockchain anchoring
-        pass
+        tenants = [row[0] for row in frappe.db.sql("""
+            SELECT DISTINCT `tenant` FROM `tabLedger Event`
+            WHERE `merkle_root` IS NULL AND `sequence` IS NOT NULL
+        """)]
+        if not tenants:
+            return
+        
+        backend = get_anchor_backend()
+        max_events = cint(frappe.conf.get("cap_anchor_max_events")) or DEFAULT_MAX_EVENTS
+        for tenant in sorted(tenants):
+            try:
+                anchor_tenant_events(tenant, backend, max_events)
+            except Exception as e:
+                frappe.db.rollback()
+                frappe.log_error(f"Anchoring ledger of tenant {tenant} failed: {str(e)}", "CAP Ledger")
     except Exception as e:
         frappe.log_error(f"Blockchain anchor error: {str(e)}", "CAP Ledger")
+
+
+def anchor_tenant_events(tenant: str, backend: AnchorBackend, max_events: int = DEFAULT_MAX_EVENTS,
+                         chunk_size: int = ANCHOR_CHUNK_SIZE) -> Optional[str]:
+    """Build, anchor and stamp one Merkle root over a tenant's un-anchored events.
+    
+    Args:
+        tenant: Tenant name
+        backend: Anchor backend
+        max_events: Events per root at most
+        chunk_size: Events per chunk tree
+        
+    Returns:
+        Ledger Anchor name, or None when nothing was pending
+    """
+    events = BaseRepository("Ledger Event").iter_all(
+        filters={"tenant": tenant, "merkle_root": ["is", "not set"], "sequence": ["is", "set"]},
+        fields=["name", "sequence", "current_hash"],
+        batch_size=chunk_size,
+        order_key="sequence"
+    )
+    
+    chunks: List[Tuple[int, int]] = []
+    chunk_roots: List[bytes] = []
+    chunk: List[Dict] = []
+    count = 0
+    for event in events:
+        chunk.append(event)
+        count += 1
+        if len(chunk) == chunk_size or count == max_events:
+            chunks.append(_write_chunk_proofs(chunk, chunk_roots))
+            chunk = []
+        if count == max_events:
+            break
+    if chunk:
+        chunks.append(_write_chunk_proofs(chunk, chunk_roots))
+    if not chunks:
+        return None
+    
+    top = build_levels(chunk_roots)
+    merkle_root = top[-1][0].hex()
+    metadata = {"events": count, "first_sequence": chunks[0][0], "last_sequence": chunks[-1][1]}
+    receipt = backend.anchor(tenant, merkle_root, metadata)
+    
+    anchor = frappe.get_doc({
+        "doctype": "Ledger Anchor",
+        "tenant": tenant,
+        "merkle_root": merkle_root,
+        "event_count": count,
+        "first_sequence": metadata["first_sequence"],
+        "last_sequence": metadata["last_sequence"],
+        "chunk_size": chunk_size,
+        "chunk_roots": json.dumps([root.hex() for root in chunk_roots]),
+        "backend": backend.name,
+        "block_hash": receipt.get("block_hash"),
+        "transaction_hash": receipt.get("transaction_hash"),
+        "anchored_at": receipt.get("anchored_at")
+    }).insert(ignore_permissions=True)
+    
+    for index, (first, last) in enumerate(chunks):
+        frappe.db.sql("""
+            UPDATE `tabLedger Event`
+            SET `merkle_root`=%s, `ledger_anchor`=%s, `block_hash`=%s, `transaction_hash`=%s, `anchored_at`=%s,
+                `merkle_proof`=CONCAT(COALESCE(`merkle_proof`, ''), %s)
+            WHERE `tenant`=%s AND `sequence` BETWEEN %s AND %s AND `merkle_root` IS NULL
+        """, (merkle_root, anchor.name, receipt.get("block_hash"), receipt.get("transaction_hash"),
+              receipt.get("anchored_at"), inclusion_proof(top, index), tenant, first, last))
+    
+    # The Ledger Anchor is the record of the anchoring. A ledger event for it
+    # would itself be un-anchored, so every run would re-anchor the last one
+    frappe.db.commit()
+    return anchor.name
+
+
+def _write_chunk_proofs(chunk: List[Dict], chunk_roots: List[bytes]) -> Tuple[int, int]:
+    """Store each event's proof up to its chunk root; returns the chunk's sequence range."""
+    levels = build_levels([leaf_hash(bytes.fromhex(event.current_hash)) for event in chunk])
+    chunk_roots.append(levels[-1][0])
+    
+    proofs = [(event.name, inclusion_proof(levels, index)) for index, event in enumerate(chunk)]
+    for start in range(0, len(proofs), PROOF_UPDATE_SIZE):
+        batch = proofs[start:start + PROOF_UPDATE_SIZE]
+        cases = " ".join(["WHEN %s THEN %s"] * len(batch))
+        values = [value for pair in batch for value in pair] + [tuple(name for name, _ in batch)]
+        frappe.db.sql(
+            f"UPDATE `tabLedger Event` SET `merkle_proof` = CASE `name` {cases} END WHERE `name` IN %s",
+            values
+        )
+    # Proofs are only meaningful once stamped; committing per chunk keeps transactions short
+    frappe.db.commit()
+    return chunk[0].sequence, chunk[-1].sequence
@@ -12,6 +12,153 @@ CAP module: events.py
 from __future__ import unicode_literals
 import frappe
 from frappe.utils import now_datetime, cstr
-import json
-    import csv
-    import io
\ No newline at end of file
+from cap.ledger.writer import append_event
+# CAP Ledger Events Module
+
+
+def create_ledger_event(tenant, event_type, subject_doctype=None, subject_name=None,
+                        actor_user=None, event_data=None, **metadata):
+    """Append an event to the tenant's ledger chain.
+    
+    The event is written, hashed and sequenced when the current transaction
+    commits, together with every other event of the transaction.
+    
+    Args:
+        tenant: Tenant name
+        event_type: Ledger Event type
+        subject_doctype: DocType the event is about
+        subject_name: Document the event is about
+        actor_user: User performing the action (defaults to the session user)
+        event_data: Event payload, covered by the chain hash
+        **metadata: Extra context stored unhashed (e.g. impact_level)
+        
+    Returns:
+        The queued event dict
+    """
+    event_types = frappe.get_meta("Ledger Event").get_field("event_type").options.split("\n")
+    if event_type not in event_types:
+        raise frappe.ValidationError(f"Unknown ledger event type: {event_type}")
+    
+    request = getattr(frappe.local, "request", None)
+    return append_event({
+        "tenant": tenant,
+        "event_type": event_type,
+        "subject_doctype": subject_doctype,
+        "subject_name": cstr(subject_name) if subject_name is not None else None,
+        "actor_user": actor_user or frappe.session.user,
+        "actor_ip": getattr(frappe.local, "request_ip", None),
+        "user_agent": request.headers.get("User-Agent") if request else None,
+        "session_id": getattr(frappe.session, "sid", None),
+        "event_data": event_data or {},
+        "metadata": metadata or None,
+        "timestamp": now_datetime()
+    })
+
+
+def log_policy_created(doc, method=None):
+    """Record a new policy"""
+    try:
+        create_ledger_event(
+            tenant=doc.tenant,
+            event_type="policy_created",
+            subject_doctype=doc.doctype,
+            subject_name=doc.name,
+            event_data={
+                "policy_name": doc.get("policy_name"),
+                "policy_type": doc.get("policy_type"),
+                "version": doc.get("version"),
+                "status": doc.get("status")
+            }
+        )
+    except Exception as e:
+        frappe.log_error(f"Error logging policy creation {doc.name}: {str(e)}", "CAP Ledger")
+
+
+def log_policy_updated(doc, method=None):
+    """Record changed fields of an existing policy"""
+    try:
+        before = doc.get_doc_before_save()
+        if not before:
+            # on_update also runs right after insert, which log_policy_created covers
+            return
+        
+        changed = [
+            df.fieldname for df in doc.meta.fields
+            if df.fieldname and cstr(before.get(df.fieldname)) != cstr(doc.get(df.fieldname))
+        ]
+        if not changed:
+            return
+        
+        create_ledger_event(
+            tenant=doc.tenant,
+            event_type="policy_updated",
+            subject_doctype=doc.doctype,
+            subject_name=doc.name,
+            event_data={
+                "changed_fields": changed,
+                "version": doc.get("version"),
+                "status": doc.get("status")
+            }
+        )
+    except Exception as e:
+        frappe.log_error(f"Error logging policy update {doc.name}: {str(e)}", "CAP Ledger")
+
+
+def log_policy_published(doc, method=None):
+    """Record a submitted (published) policy"""
+    try:
+        create_ledger_event(
+            tenant=doc.tenant,
+            event_type="policy_published",
+            subject_doctype=doc.doctype,
+            subject_name=doc.name,
+            event_data={
+                "version": doc.get("version"),
+                "effective_from": doc.get("effective_from"),
+                "effective_until": doc.get("effective_until")
+            }
+        )
+    except Exception as e:
+        frappe.log_error(f"Error logging policy publication {doc.name}: {str(e)}", "CAP Ledger")
+
+
+def log_evidence_added(doc, method=None):
+    """Record new evidence with its content hash"""
+    try:
+        create_ledger_event(
+            tenant=doc.tenant,
+            event_type="evidence_added",
+            subject_doctype=doc.doctype,
+            subject_name=doc.name,
+            event_data={
+                "title": doc.get("title"),
+                "evidence_type": doc.get("evidence_type"),
+                "content_hash": doc.get("content_hash"),
+                "source_type": doc.get("source_type")
+            }
+        )
+    except Exception as e:
+        frappe.log_error(f"Error logging evidence {doc.name}: {str(e)}", "CAP Ledger")
+
+
+def log_violation_detected(data):
+    """Record a detected violation.
+    
+    Args:
+        data: Dict with tenant, doctype, doc_name, violation_type, severity
+            and details
+    """
+    try:
+        create_ledger_event(
+            tenant=data.get("tenant"),
+            event_type="violation_detected",
+            subject_doctype=data.get("doctype"),
+            subject_name=data.get("doc_name"),
+            event_data={
+                "violation_type": data.get("violation_type"),
+                "severity": data.get("severity"),
+                "details": data.get("details") or {}
+            }
+        )
+    except Exception as e:
+        frappe.log_error(f"Error logging violation {data.get('doc_name')}: {str(e)}", "CAP Ledger")
@@ -0,0 +1,109 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: merkle.py
+"""
+import hashlib
+from typing import List, Tuple
+"""Merkle Trees
+
+Left-balanced binary Merkle trees as in RFC 6962 (Certificate
+Transparency). Leaves and inner nodes are hashed with distinct prefixes so
+an inner node can't be passed off as a leaf, and an odd node at the end of
+a level is promoted unchanged.
+
+Inclusion proofs are strings of steps, each a side and a sibling hash
+followed by ";", e.g. ``"R<hex>;L<hex>;"``. "L" means the sibling is on
+the left. Proofs of nested trees join by concatenation: a leaf's proof in
+its chunk followed by the chunk root's proof in the tree of chunk roots.
+"""
+
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(value: bytes) -> bytes:
+    """Hash a leaf value."""
+    return hashlib.sha256(LEAF_PREFIX + value).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    """Hash two child nodes."""
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_levels(nodes: List[bytes]) -> List[List[bytes]]:
+    """All levels of a tree, from the given bottom nodes up to the root.
+    
+    Args:
+        nodes: Bottom level (already hashed leaves, or subtree roots)
+        
+    Returns:
+        Levels, bottom first; the last level holds only the root
+    """
+    if not nodes:
+        raise ValueError("A Merkle tree needs at least one node")
+    
+    levels = [list(nodes)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def inclusion_proof(levels: List[List[bytes]], index: int) -> str:
+    """Proof that the bottom node at index is included under the root.
+    
+    Args:
+        levels: Output of build_levels
+        index: Position in the bottom level
+        
+    Returns:
+        Proof string
+    """
+    steps = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            steps.append(f"{'L' if sibling < index else 'R'}{level[sibling].hex()};")
+        index //= 2
+    return "".join(steps)
+
+
+def root_from_proof(leaf: bytes, proof: str) -> bytes:
+    """Recompute the root a proof leads to from a hashed leaf.
+    
+    Args:
+        leaf: Hashed leaf
+        proof: Proof string
+        
+    Returns:
+        Root hash
+    """
+    node = leaf
+    for step in parse_proof(proof):
+        side, sibling = step
+        node = node_hash(sibling, node) if side == "L" else node_hash(node, sibling)
+    return node
+
+
+def parse_proof(proof: str) -> List[Tuple[str, bytes]]:
+    """Split a proof string into (side, sibling) steps."""
+    steps = []
+    for step in (proof or "").split(";"):
+        if not step:
+            continue
+        if step[0] not in "LR" or len(step) != 65:
+            raise ValueError(f"Malformed Merkle proof step: {step}")
+        steps.append((step[0], bytes.fromhex(step[1:])))
+    return steps
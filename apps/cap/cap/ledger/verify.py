@@ -0,0 +1,277 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: verify.py
+"""
+import frappe
+import itertools
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from frappe.utils import cint, get_datetime
+from cap.ledger.merkle import leaf_hash, root_from_proof
+from cap.ledger.writer import GENESIS_HASH, HASHED_FIELDS, compute_hash
+from cap.observability.tracer import enqueue
+from cap.repositories.base_repository import BaseRepository
+"""Ledger Verification
+
+verify_event() checks one event in O(log n): its own hash, its Merkle
+inclusion proof and the Ledger Anchor holding the root, without reading
+the rest of the chain. verify_range() re-validates a stretch of a tenant's
+chain by streaming it in batches; ranges too large for a request are
+queued and verified in parallel in a process pool. Each batch carries the stored hash preceding it, so batches
+are independent and memory stays bounded by the batches in flight.
+"""
+
+
+# Events per batch handed to a pool worker
+VERIFY_BATCH_SIZE = 2000
+
+# Failures reported in full; the rest are only counted
+MAX_REPORTED_FAILURES = 100
+
+# Events verified inside the request; larger ranges go to the long queue
+VERIFY_INLINE_EVENTS = 50000
+
+# Fields read per event for verification
+VERIFY_FIELDS = list(HASHED_FIELDS) + ["name", "previous_hash", "current_hash", "merkle_root", "merkle_proof"]
+
+
+@frappe.whitelist()
+def verify_event(name):
+    """Verify one Ledger Event's hash, inclusion proof and anchor.
+    
+    Args:
+        name: Ledger Event name
+        
+    Returns:
+        Dict with hash_valid, proof_valid, anchored, valid and errors
+    """
+    frappe.has_permission("Ledger Event", "read", doc=name, throw=True)
+    event = frappe.db.get_value("Ledger Event", name, VERIFY_FIELDS + ["ledger_anchor"], as_dict=True)
+    if not event:
+        raise frappe.DoesNotExistError(f"Ledger Event {name} not found")
+    
+    errors = []
+    hash_valid = event.sequence is not None and \
+        compute_hash(event.previous_hash or GENESIS_HASH, event) == event.current_hash
+    if not hash_valid:
+        errors.append("Event hash does not match its contents")
+    
+    proof_valid, anchored, anchor = None, False, None
+    if event.merkle_root:
+        proof_valid = _proof_valid(event)
+        if not proof_valid:
+            errors.append("Merkle proof does not lead to the stored root")
+        
+        anchor = frappe.db.get_value(
+            "Ledger Anchor", event.ledger_anchor,
+            ["name", "merkle_root", "backend", "block_hash", "transaction_hash", "anchored_at"], as_dict=True
+        ) if event.ledger_anchor else None
+        anchored = bool(anchor and anchor.merkle_root == event.merkle_root)
+        if not anchored:
+            errors.append("No Ledger Anchor records this event's root")
+    
+    return {
+        "event": name,
+        "sequence": event.sequence,
+        "hash_valid": hash_valid,
+        "proof_valid": proof_valid,
+        "anchored": anchored,
+        "anchor": anchor,
+        "valid": not errors,
+        "errors": errors
+    }
+
+
+@frappe.whitelist()
+def verify_range(tenant, from_ts=None, to_ts=None, workers=None):
+    """Re-validate a tenant's chain between two timestamps.
+    
+    Ranges up to VERIFY_INLINE_EVENTS are verified in the request. Larger
+    ones are queued on the long queue, where the process pool runs, and
+    the result is sent to the caller as a ``ledger_verify_completed``
+    realtime event.
+    
+    Args:
+        tenant: Tenant name
+        from_ts: Start of the range (inclusive), default the chain start
+        to_ts: End of the range (inclusive), default now
+        workers: Pool size for queued ranges, capped by ``cap_verify_workers``
+        
+    Returns:
+        Dict with checked, failed, valid and up to MAX_REPORTED_FAILURES
+        failures, or with queued=True for a large range
+    """
+    frappe.has_permission("Ledger Event", "read", throw=True)
+    # Rows are streamed without permission checks, so the tenant itself must be readable
+    frappe.has_permission("Tenant", "read", doc=tenant, throw=True)
+    
+    # Sequences are assigned at commit, so timestamps aren't strictly ordered
+    # along the chain; verify the whole sequence span the window touches
+    conditions, values = ["`tenant`=%(tenant)s", "`sequence` IS NOT NULL"], {"tenant": tenant}
+    if from_ts:
+        conditions.append("`timestamp`>=%(from_ts)s")
+        values["from_ts"] = get_datetime(from_ts)
+    if to_ts:
+        conditions.append("`timestamp`<=%(to_ts)s")
+        values["to_ts"] = get_datetime(to_ts)
+    first, last = frappe.db.sql(
+        f"SELECT MIN(`sequence`), MAX(`sequence`) FROM `tabLedger Event` WHERE {' AND '.join(conditions)}", values
+    )[0]
+    if first is None:
+        return {"tenant": tenant, "checked": 0, "failed": 0, "valid": True, "failures": []}
+    
+    if last - first + 1 > VERIFY_INLINE_EVENTS:
+        enqueue("cap.ledger.verify.run_verify_range", queue="long", tenant=tenant, first=first, last=last,
+                workers=_worker_count(workers), user=frappe.session.user)
+        return {"tenant": tenant, "queued": True, "first_sequence": first, "last_sequence": last}
+    
+    return verify_sequences(tenant, first, last, workers=1)
+
+
+def run_verify_range(tenant: str, first: int, last: int, workers: int = 1, user: Optional[str] = None) -> None:
+    """Background job: verify a sequence span and send the result to the user.
+    
+    Args:
+        tenant: Tenant name
+        first: First sequence
+        last: Last sequence
+        workers: Pool size
+        user: Recipient of the ledger_verify_completed event
+    """
+    try:
+        result = verify_sequences(tenant, first, last, _worker_count(workers))
+        frappe.publish_realtime("ledger_verify_completed", result, user=user)
+    except Exception as e:
+        frappe.log_error(f"Error verifying ledger of tenant {tenant}: {str(e)}", "CAP Ledger")
+
+
+def verify_sequences(tenant: str, first: int, last: int, workers: int = 1) -> Dict:
+    """Verify the events of a tenant's chain from first to last sequence.
+    
+    Args:
+        tenant: Tenant name
+        first: First sequence
+        last: Last sequence
+        workers: Pool size; 1 verifies in this process
+        
+    Returns:
+        Dict with checked, failed, valid and up to MAX_REPORTED_FAILURES failures
+    """
+    filters = [["tenant", "=", tenant], ["sequence", ">=", first], ["sequence", "<=", last]]
+    events = BaseRepository("Ledger Event").iter_all(
+        filters=filters, fields=VERIFY_FIELDS, batch_size=VERIFY_BATCH_SIZE, order_key="sequence"
+    )
+    
+    checked, failures, failed = 0, [], 0
+    for batch_checked, batch_failures in _verify_batches(tenant, _batches(events), workers):
+        checked += batch_checked
+        failed += len(batch_failures)
+        failures.extend(batch_failures[:MAX_REPORTED_FAILURES - len(failures)])
+    
+    return {"tenant": tenant, "checked": checked, "failed": failed, "valid": failed == 0, "failures": failures}
+
+
+def verify_batch(previous: Optional[Tuple[int, str]], rows: List[Dict]) -> Tuple[int, List[Dict]]:
+    """Verify a run of consecutive events; runs in a pool worker.
+    
+    Args:
+        previous: (sequence, stored current_hash) of the event before the
+            batch, or None at the start of the chain
+        rows: Events in sequence order, with VERIFY_FIELDS
+        
+    Returns:
+        (events checked, failures)
+    """
+    failures = []
+    for row in rows:
+        problems = []
+        expected_sequence = previous[0] + 1 if previous else 1
+        expected_previous = previous[1] if previous else GENESIS_HASH
+        
+        if row["sequence"] != expected_sequence:
+            problems.append(f"sequence gap: expected {expected_sequence}")
+        if (row["previous_hash"] or GENESIS_HASH) != expected_previous:
+            problems.append("previous_hash does not match the preceding event")
+        if compute_hash(row["previous_hash"] or GENESIS_HASH, row) != row["current_hash"]:
+            problems.append("current_hash does not match the event contents")
+        if row.get("merkle_root") and not _proof_valid(row):
+            problems.append("Merkle proof does not lead to merkle_root")
+        
+        if problems:
+            failures.append({"event": row["name"], "sequence": row["sequence"], "problems": problems})
+        previous = (row["sequence"], row["current_hash"])
+    return len(rows), failures
+
+
+def _proof_valid(event: Dict) -> bool:
+    """Whether an event's stored proof leads from its hash to its merkle_root."""
+    try:
+        leaf = leaf_hash(bytes.fromhex(event["current_hash"]))
+        return root_from_proof(leaf, event["merkle_proof"] or "").hex() == event["merkle_root"]
+    except (TypeError, ValueError):
+        return False
+
+
+def _batches(events: Iterable[Dict]) -> Iterable[List[Dict]]:
+    """Group streamed events into VERIFY_BATCH_SIZE lists of plain dicts."""
+    batch = []
+    for event in events:
+        batch.append(dict(event))
+        if len(batch) == VERIFY_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _worker_count(requested=None) -> int:
+    """Pool size: the requested count, never more than cap_verify_workers (default min(4, CPUs))."""
+    limit = cint(frappe.conf.get("cap_verify_workers")) or min(4, os.cpu_count() or 1)
+    return max(1, min(cint(requested) or limit, limit))
+
+
+def _verify_batches(tenant: str, batches: Iterable[List[Dict]], workers: int) -> Iterator[Tuple[int, List[Dict]]]:
+    """Verify batches in order, in a process pool with at most 2 x workers in flight."""
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None:
+        return
+    previous = _preceding_event(tenant, first[0]["sequence"])
+    batches = itertools.chain([first], batches)
+    
+    # A range that fits in one batch isn't worth starting a pool
+    if workers <= 1 or len(first) < VERIFY_BATCH_SIZE:
+        for batch in batches:
+            yield verify_batch(previous, batch)
+            previous = (batch[-1]["sequence"], batch[-1]["current_hash"])
+        return
+    
+    # Spawned, not forked, so workers don't inherit the job's database connection
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(verify_batch, previous, batch))
+            previous = (batch[-1]["sequence"], batch[-1]["current_hash"])
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _preceding_event(tenant: str, sequence: int) -> Optional[Tuple[int, str]]:
+    """(sequence, current_hash) of the event before sequence, None at the chain start."""
+    if sequence <= 1:
+        return None
+    current_hash = frappe.db.get_value("Ledger Event", {"tenant": tenant, "sequence": sequence - 1}, "current_hash")
+    # A missing predecessor is reported as a link failure on the first event
+    return (sequence - 1, current_hash or "")
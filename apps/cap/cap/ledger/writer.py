@@ -0,0 +1,203 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: writer.py
+"""
+import frappe
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from frappe.utils import now_datetime
+from cap.repositories.base_repository import BaseRepository
+"""Ledger Writer
+
+Appends Ledger Events to per-tenant SHA-256 hash chains with group commit.
+
+Events are buffered for the current transaction and written just before it
+commits (frappe.db.before_commit). Per tenant, the flush locks that
+tenant's Ledger Chain Head row once, hashes the buffered events in order
+(sequence n+1, n+2, ...), writes them with one multi-row INSERT per chunk
+and advances the head. A burst of events costs one lock and a few
+statements instead of a read-latest-then-insert per event. Tenants never
+wait on each other's locks, and the head commits or rolls back atomically
+with the events it describes.
+
+Rolling back to a savepoint fires no Frappe callback, so savepoints around
+code that appends events must be taken with savepoint() and undone with
+rollback_to_savepoint() from this module; they drop the events queued since
+the savepoint. A plain frappe.db.rollback(save_point=...) leaves them queued.
+"""
+
+
+# previous_hash of the first event in every chain
+GENESIS_HASH = "0" * 64
+
+# Event fields covered by current_hash, in hashing order
+HASHED_FIELDS = (
+    "tenant",
+    "sequence",
+    "event_type",
+    "subject_doctype",
+    "subject_name",
+    "actor_user",
+    "event_data",
+    "timestamp"
+)
+
+
+def canonical_json(value: Any) -> str:
+    """Deterministic JSON: sorted keys, no whitespace, str() for other types."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def canonical_timestamp(value: Any) -> str:
+    """Timestamp as stored in Datetime(6) columns, always with microseconds."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def compute_hash(previous_hash: str, event: Dict) -> str:
+    """SHA-256 chain hash of an event.
+    
+    Args:
+        previous_hash: current_hash of the preceding event in the chain
+        event: Event with HASHED_FIELDS; event_data as stored (JSON text)
+        
+    Returns:
+        Hex digest
+    """
+    fields = {field: event.get(field) for field in HASHED_FIELDS}
+    fields["timestamp"] = canonical_timestamp(fields["timestamp"])
+    payload = previous_hash + canonical_json(fields)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def append_event(event: Dict) -> Dict:
+    """Queue an event for the current transaction's chain flush.
+    
+    Args:
+        event: Ledger Event fields; tenant and event_type are required
+        
+    Returns:
+        The queued event, completed with sequence and hashes on flush
+    """
+    if not event.get("tenant"):
+        raise frappe.ValidationError("Ledger events require a tenant")
+    
+    event = dict(event)
+    event.setdefault("timestamp", now_datetime())
+    if not isinstance(event.get("event_data"), str):
+        event["event_data"] = canonical_json(event.get("event_data") or {})
+    
+    pending = getattr(frappe.local, "cap_ledger_pending", None)
+    if pending is None:
+        pending = frappe.local.cap_ledger_pending = []
+        frappe.db.before_commit.add(flush_pending)
+        frappe.db.after_rollback.add(_discard_pending)
+    pending.append(event)
+    return event
+
+
+def savepoint(name: str) -> None:
+    """Take a database savepoint and remember how many events were queued at it.
+    
+    Args:
+        name: Savepoint name, passed on to frappe.db.savepoint
+    """
+    pending = getattr(frappe.local, "cap_ledger_pending", None)
+    positions = getattr(frappe.local, "cap_ledger_savepoints", None)
+    if positions is None:
+        positions = frappe.local.cap_ledger_savepoints = {}
+    positions[name] = len(pending) if pending else 0
+    frappe.db.savepoint(name)
+
+
+def rollback_to_savepoint(name: str) -> None:
+    """Roll back to a savepoint taken with savepoint(), dropping the events queued since.
+    
+    Args:
+        name: Savepoint name
+    """
+    frappe.db.rollback(save_point=name)
+    positions = getattr(frappe.local, "cap_ledger_savepoints", None) or {}
+    pending = getattr(frappe.local, "cap_ledger_pending", None)
+    if pending and name in positions:
+        del pending[positions[name]:]
+
+
+def flush_pending() -> int:
+    """Chain and write every queued event; runs before the transaction commits.
+    
+    Tenants are processed in sorted order so concurrent flushes take head
+    locks in the same order and can't deadlock.
+    
+    Returns:
+        Number of events written
+    """
+    pending = getattr(frappe.local, "cap_ledger_pending", None)
+    frappe.local.cap_ledger_pending = None
+    frappe.local.cap_ledger_savepoints = None
+    if not pending:
+        return 0
+    
+    by_tenant: Dict[str, List[Dict]] = {}
+    for event in pending:
+        by_tenant.setdefault(event["tenant"], []).append(event)
+    
+    for tenant in sorted(by_tenant):
+        _write_chain(tenant, by_tenant[tenant])
+    return len(pending)
+
+
+def _write_chain(tenant: str, events: List[Dict]) -> None:
+    """Append one tenant's events after its locked chain head."""
+    sequence, previous_hash = _lock_chain_head(tenant)
+    processed_at = now_datetime()
+    
+    for event in events:
+        sequence += 1
+        event["sequence"] = sequence
+        event["previous_hash"] = previous_hash
+        event["current_hash"] = previous_hash = compute_hash(previous_hash, event)
+        event["processed_at"] = processed_at
+    
+    BaseRepository("Ledger Event").bulk_insert(events, fast=True)
+    frappe.db.sql(
+        "UPDATE `tabLedger Chain Head` SET `last_sequence`=%s, `last_hash`=%s, `modified`=%s WHERE `name`=%s",
+        (sequence, previous_hash, processed_at, tenant)
+    )
+
+
+def _lock_chain_head(tenant: str) -> Tuple[int, str]:
+    """Lock a tenant's chain head row, creating it on first use.
+    
+    Returns:
+        (last sequence, last hash)
+    """
+    query = "SELECT `last_sequence`, `last_hash` FROM `tabLedger Chain Head` WHERE `name`=%s FOR UPDATE"
+    head = frappe.db.sql(query, (tenant,))
+    if not head:
+        now = now_datetime()
+        # Concurrent first appends both try the insert; the loser's is a no-op
+        conflict = "ON CONFLICT (`name`) DO NOTHING" if frappe.db.db_type == "postgres" \
+            else "ON DUPLICATE KEY UPDATE `name`=`name`"
+        frappe.db.sql(f"""
+            INSERT INTO `tabLedger Chain Head` (`name`, `tenant`, `last_sequence`, `last_hash`, `creation`, `modified`)
+            VALUES (%s, %s, 0, %s, %s, %s) {conflict}
+        """, (tenant, tenant, GENESIS_HASH, now, now))
+        head = frappe.db.sql(query, (tenant,))
+    return int(head[0][0] or 0), head[0][1] or GENESIS_HASH
+
+
+def _discard_pending() -> None:
+    """Drop queued events when their transaction rolls back."""
+    frappe.local.cap_ledger_pending = None
+    frappe.local.cap_ledger_savepoints = None
@@ -9,7 +9,6 @@ SPDX-FileContributor: Raasid (AI Companion)
 
 CAP module: __init__.py
 """
-    from cap.observability import get_logger, MetricsCollector, Tracer
 from cap.observability.logger import get_logger, setup_logging
 from cap.observability.metrics import MetricsCollector
 from cap.observability.tracer import Tracer
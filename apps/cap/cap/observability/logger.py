@@ -10,21 +10,104 @@ SPDX-FileContributor: Raasid (AI Companion)
 CAP module: logger.py
 """
 import logging
+import atexit
 import json
+import os
+import queue
 import sys
-from typing import Any, Dict, Optional
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
+from datetime import datetime, timezone
 import frappe
 """Structured Logging
 
 Provides structured logging with JSON output for production.
+
+Records are put on a bounded queue by the logging thread and formatted and
+written by a background listener, so slow stdout never blocks a request.
+When the queue is full the oldest record is dropped and counted.
+
+Context fields bound with bind_context() or log_context() live in a
+ContextVar, so they are scoped to the current request, job or thread and
+are reset by the request hooks.
 """
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+DEFAULT_QUEUE_SIZE = 10000
+
+# Fields added to every record logged in the current context
+_context: ContextVar[Dict[str, Any]] = ContextVar("cap_logger_context", default={})
+
+# Renders exception text on the logging thread before a record is queued
+_exception_formatter = logging.Formatter()
+
+
+def _dumps_json(data: Dict) -> str:
+    """Encode a log line with the standard library."""
+    return json.dumps(data, separators=(",", ":"), default=str)
+
+
+def _dumps_orjson(data: Dict) -> str:
+    """Encode a log line with orjson."""
+    return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _request_context() -> Dict:
+    """Request, user and site of the current request.
+    
+    Built on the first record of a request and reused for the rest of it.
+    
+    Returns:
+        Context dictionary (empty outside a site context)
+    """
+    try:
+        context = getattr(frappe.local, 'cap_log_context', None)
+        if context is not None:
+            return context
+        
+        context = {}
+        request = getattr(frappe.local, 'request', None)
+        if request:
+            context['request'] = {
+                'method': request.method,
+                'path': request.path,
+                'ip': getattr(frappe.local, 'request_ip', None)
+            }
+        
+        session = getattr(frappe.local, 'session', None)
+        if session and session.get('user'):
+            context['user'] = session.user
+        
+        if getattr(frappe.local, 'site', None):
+            context['site'] = frappe.local.site
+        
+        frappe.local.cap_log_context = context
+        return context
+    except Exception:
+        return {}
+
 
 
 class StructuredFormatter(logging.Formatter):
     """JSON formatter for structured logging."""
     
+    def __init__(self, encoder: Optional[str] = None):
+        """Initialize formatter.
+        
+        Args:
+            encoder: "orjson" or "json" (default: orjson when installed)
+        """
+        super().__init__()
+        self._dumps = _dumps_orjson if orjson is not None and encoder != "json" else _dumps_json
+    
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON.
         
@@ -35,7 +118,7 @@ class StructuredFormatter(logging.Formatter):
             JSON formatted log string
         """
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -48,28 +131,17 @@ class StructuredFormatter(logging.Formatter):
         if hasattr(record, 'extra_data'):
             log_data.update(record.extra_data)
         
-        # Add exception info if present
+        # Add exception info if present (pre-rendered for queued records)
         if record.exc_info:
             log_data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_data['exception'] = record.exc_text
         
-        # Add Frappe-specific context
-        try:
-            if frappe.local.request:
-                log_data['request'] = {
-                    'method': frappe.local.request.method,
-                    'path': frappe.local.request.path,
-                    'ip': frappe.local.request_ip
-                }
-            
-            if frappe.session.user:
-                log_data['user'] = frappe.session.user
-            
-            if hasattr(frappe.local, 'site'):
-                log_data['site'] = frappe.local.site
-        except:
-            pass
+        # Add Frappe-specific context, captured on the logging thread for queued records
+        context = getattr(record, 'cap_context', None)
+        log_data.update(_request_context() if context is None else context)
         
-        return json.dumps(log_data)
+        return self._dumps(log_data)
 
 
 class HumanReadableFormatter(logging.Formatter):
@@ -109,39 +181,177 @@ class HumanReadableFormatter(logging.Formatter):
         # Add exception
         if record.exc_info:
             msg += f"\n{self.formatException(record.exc_info)}"
+        elif record.exc_text:
+            msg += f"\n{record.exc_text}"
         
         return msg
 
 
+class DropOldestQueueHandler(QueueHandler):
+    """QueueHandler with a bounded queue that drops the oldest record when full."""
+    
+    def __init__(self, maxsize: int = DEFAULT_QUEUE_SIZE):
+        """Initialize handler.
+        
+        Args:
+            maxsize: Maximum queued records
+        """
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Resolve everything that needs the logging thread.
+        
+        The message is merged with its args, the exception rendered and the
+        request context attached; formatting is left to the listener. The
+        record is updated in place rather than copied: the merged message
+        and the cached exc_text format the same for any other handler.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        record.cap_context = _request_context()
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Queue a record, discarding the oldest one if the queue is full."""
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+
+class DropReportingListener(QueueListener):
+    """QueueListener that reports records dropped by its handler."""
+    
+    def __init__(self, queue_handler: DropOldestQueueHandler, *handlers: logging.Handler):
+        """Initialize listener.
+        
+        Args:
+            queue_handler: Handler feeding the queue
+            *handlers: Handlers writing the records
+        """
+        super().__init__(queue_handler.queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self._reported = 0
+    
+    def handle(self, record: logging.LogRecord) -> None:
+        """Write a record, preceded by a warning if records were dropped."""
+        dropped = self.queue_handler.dropped
+        if dropped != self._reported:
+            notice = logging.LogRecord(
+                __name__, logging.WARNING, __file__, 0,
+                "Log queue full, dropped %d records", (dropped - self._reported,), None
+            )
+            self._reported = dropped
+            super().handle(notice)
+        super().handle(record)
+    
+    def enqueue_sentinel(self) -> None:
+        """Queue the stop sentinel even when the queue is full."""
+        self.queue_handler.enqueue(self._sentinel)
+
+
 class StructuredLogger(logging.Logger):
     """Custom logger with structured logging support."""
     
-    def __init__(self, name: str, level=logging.NOTSET):
-        super().__init__(name, level)
-        self.extra_data = {}
-    
     def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, stacklevel=1):
         """Override _log to inject extra data."""
-        if extra is None:
-            extra = {}
-        
-        # Merge with instance extra_data
-        merged_extra = {**self.extra_data, **extra}
+        context = _context.get()
         
-        # Create a custom LogRecord with extra_data attribute
-        if merged_extra:
-            extra['extra_data'] = merged_extra
+        # Merge the bound context with the call's extra fields
+        if extra:
+            extra = {**extra, 'extra_data': {**context, **extra}}
+        elif context:
+            extra = {'extra_data': context}
         
         super()._log(level, msg, args, exc_info, extra, stack_info, stacklevel + 1)
     
-    def with_context(self, **kwargs) -> 'StructuredLogger':
+    def with_context(self, **kwargs) -> 'BoundLogger':
         """Add context to all log messages.
         
+        The logger itself is shared and left unchanged; the context only
+        applies to messages logged through the returned adapter.
+        
         Returns:
-            Self for chaining
+            BoundLogger adding the context
         """
-        self.extra_data.update(kwargs)
-        return self
+        return BoundLogger(self, kwargs)
+
+
+class BoundLogger(logging.LoggerAdapter):
+    """Logger adapter carrying its own context fields."""
+    
+    def process(self, msg, kwargs):
+        """Add the bound fields to the call's extra fields."""
+        kwargs['extra'] = {**self.extra, **(kwargs.get('extra') or {})}
+        return msg, kwargs
+    
+    def with_context(self, **kwargs) -> 'BoundLogger':
+        """Return an adapter with additional context.
+        
+        Returns:
+            BoundLogger adding both contexts
+        """
+        return BoundLogger(self.logger, {**self.extra, **kwargs})
+
+
+def bind_context(**kwargs) -> Token:
+    """Add fields to every record logged in the current context.
+    
+    Args:
+        **kwargs: Context fields
+    
+    Returns:
+        Token for reset_context()
+    """
+    return _context.set({**_context.get(), **kwargs})
+
+
+def reset_context(token: Token) -> None:
+    """Restore the context from before a bind_context() call.
+    
+    Args:
+        token: Token returned by bind_context()
+    """
+    _context.reset(token)
+
+
+def clear_context() -> None:
+    """Remove all bound context fields."""
+    _context.set({})
+
+
+def get_context() -> Dict[str, Any]:
+    """Get the bound context fields.
+    
+    Returns:
+        Context dictionary (do not modify)
+    """
+    return _context.get()
+
+
+@contextmanager
+def log_context(**kwargs) -> Iterator[None]:
+    """Bind context fields for the duration of a block.
+    
+    Args:
+        **kwargs: Context fields
+    """
+    token = bind_context(**kwargs)
+    try:
+        yield
+    finally:
+        reset_context(token)
 
 
 def get_logger(name: str) -> StructuredLogger:
@@ -153,25 +363,43 @@ def get_logger(name: str) -> StructuredLogger:
     Returns:
         StructuredLogger instance
     """
+    # Configure once per process
+    if _listener is None:
+        setup_logging()
+    
     # Set custom logger class
     logging.setLoggerClass(StructuredLogger)
     
-    logger = logging.getLogger(name)
-    
-    # Configure if not already configured
-    if not logger.handlers:
-        setup_logging()
-    
-    return logger
+    return logging.getLogger(name)
 
 
-def setup_logging(log_level: str = "INFO", use_json: bool = None):
+_queue_handler: Optional[DropOldestQueueHandler] = None
+_listener: Optional[DropReportingListener] = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(log_level: str = "INFO", use_json: bool = None, queue_size: Optional[int] = None,
+                  force: bool = False):
     """Setup logging configuration.
     
+    Runs once per process; later calls are no-ops unless force is set.
+    
     Args:
         log_level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         use_json: Use JSON format (default: auto-detect based on environment)
+        queue_size: Maximum queued records (default: cap_log_queue_size
+            from site config, or 10000)
+        force: Replace an existing configuration
     """
+    with _setup_lock:
+        if _listener is None or force:
+            _configure_logging(log_level, use_json, queue_size)
+
+
+def _configure_logging(log_level: str, use_json: Optional[bool], queue_size: Optional[int]) -> None:
+    """Install the queue handler and listener on the root logger."""
+    global _queue_handler, _listener
+    
     # Auto-detect format based on environment
     if use_json is None:
         # Use JSON in production, human-readable in development
@@ -179,7 +407,7 @@ def setup_logging(log_level: str = "INFO", use_json: bool = None):
     
     # Choose formatter
     if use_json:
-        formatter = StructuredFormatter()
+        formatter = StructuredFormatter(frappe.conf.get('cap_log_encoder'))
     else:
         formatter = HumanReadableFormatter()
     
@@ -195,8 +423,66 @@ def setup_logging(log_level: str = "INFO", use_json: bool = None):
     for h in root_logger.handlers[:]:
         root_logger.removeHandler(h)
     
-    root_logger.addHandler(handler)
+    # Write from a background listener; the logging thread only enqueues
+    if _listener is not None:
+        _listener.stop()
+    _queue_handler = DropOldestQueueHandler(queue_size or frappe.conf.get('cap_log_queue_size') or DEFAULT_QUEUE_SIZE)
+    _listener = DropReportingListener(_queue_handler, handler)
+    _listener.start()
+    
+    root_logger.addHandler(_queue_handler)
     
     # Configure Frappe logger
     frappe_logger = logging.getLogger('frappe')
     frappe_logger.setLevel(logging.WARNING)  # Reduce Frappe noise
+
+
+def flush_logs(**kwargs) -> None:
+    """Wait until queued records are written.
+    
+    Registered as an ``after_job`` hook: RQ work-horses exit without
+    running atexit handlers, so queued job logs are drained explicitly.
+    """
+    if _queue_handler is None:
+        return
+    
+    log_queue = _queue_handler.queue
+    with log_queue.all_tasks_done:
+        log_queue.all_tasks_done.wait_for(lambda: not log_queue.unfinished_tasks, timeout=5)
+
+
+def _stop_listener() -> None:
+    """Write what is left at interpreter exit."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_listener_after_fork() -> None:
+    """Start a fresh queue and listener thread in a forked child."""
+    if _listener is None:
+        return
+    _queue_handler.queue = queue.Queue(_queue_handler.queue.maxsize)
+    _queue_handler.dropped = 0
+    _listener.queue = _queue_handler.queue
+    _listener._reported = 0
+    _listener._thread = None
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+atexit.register(_stop_listener)
+
+
+def start_request_context() -> None:
+    """before_request hook: start each request with a fresh log context."""
+    context = {}
+    tracer = getattr(frappe.local, 'tracer', None)
+    if tracer is not None:
+        context['trace_id'] = f"{tracer.trace_id:032x}"
+    _context.set(context)
+
+
+def end_request_context(response=None, request=None) -> None:
+    """after_request hook: drop the request's log context from the worker thread."""
+    clear_context()
@@ -10,17 +10,435 @@ SPDX-FileContributor: Raasid (AI Companion)
 CAP module: metrics.py
 """
 import frappe
-from typing import Dict, Any, Optional
-from datetime import datetime
+import atexit
+import bisect
 import json
-        import time
-        import time
+import re
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Any, List, Optional
+from cap.observability.sketch import DDSketch
 """Metrics Collection
 
 Collects and exports application metrics.
+
+Samples are pre-aggregated in memory per (name, tags) by a process-wide
+aggregator and written out in one compact batch per flush interval by a
+background thread. Batches are also added to a Redis hash shared by all
+workers, which export() renders in OpenMetrics text format. Gauges are
+kept in one Redis hash per process and summed on export, so workers
+don't overwrite each other's values.
 """
 
 
+DEFAULT_FLUSH_INTERVAL = 10
+
+# Upper bounds (seconds) of the fixed histogram buckets; +Inf is implicit
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Fleet-wide cumulative metrics, one hash for all workers and sites
+REDIS_METRICS_KEY = "cap:metrics:v1"
+
+# Gauges, one hash per process (host:pid), indexed in a set; a process's
+# gauges expire once it stops reporting them
+GAUGE_KEY_PREFIX = "cap:metrics:v1:gauges:"
+GAUGE_INDEX_KEY = "cap:metrics:v1:gauges"
+GAUGE_KEY_TTL = 600
+
+# Attempts at writing a batch to Redis before it is dropped
+MAX_PUBLISH_ATTEMPTS = 5
+
+# Per-site, per-hour (UTC) lists of serialized sketches awaiting merge
+SKETCH_KEY_PREFIX = "cap:metrics:sketches:"
+SKETCH_KEY_TTL = 2 * 86400
+
+logger = logging.getLogger(__name__)
+
+
+def log_batch(batch: Dict) -> None:
+    """Default sink: write the batch as one compact JSON log line."""
+    frappe.logger("cap.metrics").info(json.dumps(batch, separators=(",", ":"), default=str))
+
+
+def _conf_flush_interval() -> float:
+    """Flush interval from site config."""
+    return float(_conf_value("cap_metrics_flush_interval") or DEFAULT_FLUSH_INTERVAL)
+
+
+def _conf_value(key: str, default: Any = None) -> Any:
+    """Read site config, tolerating threads without a site context."""
+    try:
+        return frappe.conf.get(key, default)
+    except Exception:
+        return default
+
+
+class MetricsAggregator:
+    """Process-wide, thread-safe metrics aggregator.
+    
+    Counters are summed, gauges keep the last value, and histograms and
+    timers keep count, sum, min, max, one count per HISTOGRAM_BUCKETS
+    bucket (plus +Inf) and a DDSketch for quantiles per series. Recording
+    is a dict lookup plus an add under a lock; serialization happens only
+    on flush.
+    """
+    
+    def __init__(self, flush_interval: Optional[float] = None):
+        """Initialize aggregator.
+        
+        Args:
+            flush_interval: Seconds between background flushes (default:
+                cap_metrics_flush_interval from site config, or 10)
+        """
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters: Dict[tuple, float] = {}
+        self._gauges: Dict[tuple, float] = {}
+        self._histograms: Dict[tuple, list] = {}
+        self._sketches: Dict[tuple, DDSketch] = {}
+        self._sinks: List[Callable[[Dict], None]] = [log_batch]
+        self._window_start = time.time()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+    
+    def add(self, metric_type: str, name: str, value: float, tags: Optional[Dict] = None) -> None:
+        """Add a sample.
+        
+        Args:
+            metric_type: counter, gauge, histogram or timer
+            name: Full metric name
+            value: Sample value
+            tags: Metric tags
+        """
+        key = (name, tuple(sorted(tags.items())) if tags else ())
+        
+        if self._thread is None:
+            self.start()
+        
+        with self._lock:
+            if metric_type == "counter":
+                self._counters[key] = self._counters.get(key, 0) + value
+            elif metric_type == "gauge":
+                self._gauges[key] = value
+            else:
+                series = self._histograms.get(key)
+                if series is None:
+                    series = self._histograms[key] = [0, 0, value, value] + [0] * (len(HISTOGRAM_BUCKETS) + 1)
+                series[0] += 1
+                series[1] += value
+                if value < series[2]:
+                    series[2] = value
+                if value > series[3]:
+                    series[3] = value
+                series[4 + bisect.bisect_left(HISTOGRAM_BUCKETS, value)] += 1
+                
+                sketch = self._sketches.get(key)
+                if sketch is None:
+                    sketch = self._sketches[key] = DDSketch()
+                sketch.add(value)
+    
+    def add_sink(self, sink: Callable[[Dict], None]) -> None:
+        """Register a callable receiving every flushed batch.
+        
+        Args:
+            sink: Callable taking the batch dictionary
+        """
+        if sink not in self._sinks:
+            self._sinks.append(sink)
+    
+    def collect(self) -> Optional[Dict]:
+        """Swap out the aggregated state and return it as a batch.
+        
+        Returns:
+            Batch dictionary, or None if nothing was recorded
+        """
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            gauges, self._gauges = self._gauges, {}
+            histograms, self._histograms = self._histograms, {}
+            sketches, self._sketches = self._sketches, {}
+            started, self._window_start = self._window_start, time.time()
+        
+        if not (counters or gauges or histograms):
+            return None
+        
+        return {
+            "start": round(started, 3),
+            "end": round(self._window_start, 3),
+            "pid": os.getpid(),
+            "counters": [[name, dict(tags), value] for (name, tags), value in counters.items()],
+            "gauges": [[name, dict(tags), value] for (name, tags), value in gauges.items()],
+            "histograms": [[name, dict(tags), series] for (name, tags), series in histograms.items()],
+            "sketches": [[name, dict(tags), sketch.to_dict()] for (name, tags), sketch in sketches.items()]
+        }
+    
+    def flush(self) -> None:
+        """Collect the current window and hand it to every sink."""
+        batch = self.collect()
+        if batch is None:
+            return
+        
+        for sink in list(self._sinks):
+            try:
+                sink(batch)
+            except Exception as e:
+                logger.warning("Metrics sink %s failed: %s", getattr(sink, "__name__", sink), e)
+    
+    def start(self) -> None:
+        """Start the background flush thread if not running."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="cap-metrics-flush", daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop the background thread and flush what is left."""
+        self._stopped.set()
+        self.flush()
+    
+    def _run(self) -> None:
+        """Flush periodically until stopped."""
+        interval = self.flush_interval or _conf_flush_interval()
+        while not self._stopped.wait(interval):
+            self.flush()
+    
+    def _reset_after_fork(self) -> None:
+        """Drop state inherited from the parent; the parent flushes it."""
+        self._lock = threading.Lock()
+        self._counters, self._gauges, self._histograms, self._sketches = {}, {}, {}, {}
+        self._window_start = time.time()
+        self._thread = None
+        self._stopped = threading.Event()
+
+
+_aggregator = MetricsAggregator()
+
+
+def get_aggregator() -> MetricsAggregator:
+    """Get the process-wide metrics aggregator.
+    
+    Returns:
+        MetricsAggregator instance
+    """
+    return _aggregator
+
+
+def flush_metrics(**kwargs) -> None:
+    """Flush aggregated metrics now.
+    
+    Registered as an ``after_job`` hook: RQ work-horses exit without
+    running atexit handlers, so job metrics are flushed explicitly.
+    """
+    _aggregator.flush()
+
+
+# [attempts, batch] for batches not yet written to Redis, retried on the next flush
+_unpublished: deque = deque(maxlen=60)
+
+
+def publish_to_redis(batch: Dict) -> None:
+    """Sink: add a batch to the fleet-wide cumulative metrics hash.
+    
+    Counters and histogram components are added with HINCRBYFLOAT, so
+    every worker contributes to the same cumulative series; gauges are
+    set in this process's own hash. Sketches are appended to per-site
+    hourly lists merged by cap.analytics.metrics.calculate_hourly_metrics.
+    Batches are kept for a later retry if Redis is down, and dropped after
+    MAX_PUBLISH_ATTEMPTS failed writes.
+    """
+    _unpublished.append([0, batch])
+    if not _conf_value("cap_metrics_redis", True):
+        _unpublished.clear()
+        return
+    
+    client = frappe.cache()
+    
+    while _unpublished:
+        entry = _unpublished[0]
+        entry[0] += 1
+        pending = entry[1]
+        pipe = client.pipeline(transaction=False)
+        
+        for name, tags, value in pending["counters"]:
+            pipe.execute_command("HINCRBYFLOAT", REDIS_METRICS_KEY, _field("counter", name, tags), value)
+        if pending["gauges"]:
+            gauge_key = f"{GAUGE_KEY_PREFIX}{socket.gethostname()}:{pending['pid']}"
+            for name, tags, value in pending["gauges"]:
+                pipe.execute_command("HSET", gauge_key, _field("gauge", name, tags), value)
+            pipe.execute_command("EXPIRE", gauge_key, GAUGE_KEY_TTL)
+            pipe.execute_command("SADD", GAUGE_INDEX_KEY, gauge_key)
+        for name, tags, series in pending["histograms"]:
+            pipe.execute_command("HINCRBYFLOAT", REDIS_METRICS_KEY, _field("histogram", name, tags, "count"), series[0])
+            pipe.execute_command("HINCRBYFLOAT", REDIS_METRICS_KEY, _field("histogram", name, tags, "sum"), series[1])
+            for bound, count in zip(_bucket_labels(), series[4:]):
+                if count:
+                    pipe.execute_command("HINCRBYFLOAT", REDIS_METRICS_KEY,
+                                         _field("histogram", name, tags, bound), count)
+        
+        hour = sketch_hour(pending["end"])
+        for name, tags, sketch in pending.get("sketches", []):
+            key = sketch_key(tags.get("site") or "", hour)
+            pipe.execute_command("RPUSH", key, json.dumps([name, tags, sketch], separators=(",", ":")))
+            pipe.execute_command("EXPIRE", key, SKETCH_KEY_TTL)
+        
+        try:
+            pipe.execute()
+        except Exception:
+            if entry[0] >= MAX_PUBLISH_ATTEMPTS:
+                _unpublished.popleft()
+                logger.warning("Dropped a metrics batch after %s failed Redis writes", entry[0])
+            raise
+        _unpublished.popleft()
+
+
+@frappe.whitelist()
+def export():
+    """Render fleet-wide metrics for this site in OpenMetrics text format.
+    
+    Served at /api/method/cap.observability.metrics.export for scraping
+    with an API key of a System Manager.
+    
+    Returns:
+        Response with OpenMetrics text
+    """
+    from werkzeug.wrappers import Response
+    
+    frappe.only_for("System Manager")
+    flush_metrics()
+    
+    client = frappe.cache()
+    raw = client.execute_command("HGETALL", REDIS_METRICS_KEY) or {}
+    raw.update(live_gauges(client))
+    body = render_openmetrics(raw, site=getattr(frappe.local, "site", None))
+    
+    return Response(body, content_type="application/openmetrics-text; version=1.0.0; charset=utf-8")
+
+
+def live_gauges(client) -> Dict:
+    """Sum each gauge over the processes whose gauge hashes haven't expired.
+    
+    Args:
+        client: Redis client
+    
+    Returns:
+        Dict of hash field to summed value, in the REDIS_METRICS_KEY format
+    """
+    keys = list(client.execute_command("SMEMBERS", GAUGE_INDEX_KEY) or [])
+    if not keys:
+        return {}
+    
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.execute_command("HGETALL", key)
+    
+    totals: Dict = {}
+    for key, fields in zip(keys, pipe.execute()):
+        if not fields:
+            client.execute_command("SREM", GAUGE_INDEX_KEY, key)
+            continue
+        for field, value in fields.items():
+            totals[field] = totals.get(field, 0.0) + float(value)
+    return totals
+
+
+def render_openmetrics(raw: Dict, site: Optional[str] = None) -> str:
+    """Render the Redis metrics hash as OpenMetrics text.
+    
+    Args:
+        raw: HGETALL result of REDIS_METRICS_KEY
+        site: Only include series tagged with this site
+    
+    Returns:
+        OpenMetrics exposition text
+    """
+    families: Dict[tuple, Dict] = {}
+    
+    for field, value in raw.items():
+        metric_type, name, tags, component = json.loads(field)
+        if site and tags.get("site") not in (None, site):
+            continue
+        family = families.setdefault((_metric_name(name), metric_type), {})
+        labels = tuple(sorted(tags.items()))
+        family.setdefault(labels, {})[component] = float(value)
+    
+    lines = []
+    for (name, metric_type), series in sorted(families.items()):
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, components in sorted(series.items()):
+            if metric_type == "counter":
+                lines.append(f"{name}_total{_labels(labels)} {_number(components[''])}")
+            elif metric_type == "gauge":
+                lines.append(f"{name}{_labels(labels)} {_number(components[''])}")
+            else:
+                cumulative = 0.0
+                for bound in _bucket_labels():
+                    cumulative += components.get(bound, 0.0)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {_number(cumulative)}")
+                lines.append(f"{name}_count{_labels(labels)} {_number(components.get('count', 0.0))}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(components.get('sum', 0.0))}")
+    
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def sketch_hour(timestamp: float) -> str:
+    """UTC hour bucket (YYYYMMDDHH) for a timestamp."""
+    return time.strftime("%Y%m%d%H", time.gmtime(timestamp))
+
+
+def sketch_key(site: str, hour: str) -> str:
+    """Redis list holding a site's sketches for one hour."""
+    return f"{SKETCH_KEY_PREFIX}{site}:{hour}"
+
+
+def _field(metric_type: str, name: str, tags: Dict, component: str = "") -> str:
+    """Hash field identifying one component of one series."""
+    return json.dumps([metric_type, name, tags, component], sort_keys=True, separators=(",", ":"))
+
+
+def _bucket_labels() -> List[str]:
+    """'le' label values of the histogram buckets, ending with +Inf."""
+    return [repr(float(bound)) for bound in HISTOGRAM_BUCKETS] + ["+Inf"]
+
+
+def _metric_name(name: str) -> str:
+    """OpenMetrics metric name for a dotted CAP metric name."""
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels(labels: tuple) -> str:
+    """Render a label set."""
+    if not labels:
+        return ""
+    rendered = ",".join(
+        f'{re.sub(r"[^a-zA-Z0-9_]", "_", key)}="{_escape(value)}"' for key, value in labels
+    )
+    return "{" + rendered + "}"
+
+
+def _escape(value: Any) -> str:
+    """Escape a label value."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    """Render a sample value, dropping a trailing .0 on integers."""
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+_aggregator.add_sink(publish_to_redis)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_aggregator._reset_after_fork)
+    os.register_at_fork(after_in_child=_unpublished.clear)
+atexit.register(flush_metrics)
+
 
 class MetricsCollector:
     """Metrics collector for application monitoring.
@@ -30,6 +448,9 @@ class MetricsCollector:
     - Gauges (current values)
     - Histograms (distributions)
     - Timers (duration tracking)
+    
+    Collectors are cheap facades over the process-wide aggregator, so any
+    number of them can be created.
     """
     
     def __init__(self, prefix: str = "cap"):
@@ -39,7 +460,7 @@ class MetricsCollector:
             prefix: Metric name prefix
         """
         self.prefix = prefix
-        self._metrics_buffer = []
+        self._aggregator = get_aggregator()
     
     def counter(self, name: str, value: float = 1, **tags) -> None:
         """Record a counter metric.
@@ -103,78 +524,29 @@ class MetricsCollector:
         """
         return TimingContext(self, name, tags)
     
+    def flush(self) -> None:
+        """Flush the process-wide aggregator."""
+        self._aggregator.flush()
+    
     def _record_metric(self, metric_type: str, name: str, value: float, tags: Dict) -> None:
         """Internal method to record metric.
         
+        The site is added as a tag. The user is not: per-user series would
+        make the aggregated state grow with the number of users.
+        
         Args:
             metric_type: Type of metric
             name: Metric name
             value: Metric value
             tags: Metric tags
         """
-        metric = {
-            "type": metric_type,
-            "name": f"{self.prefix}.{name}",
-            "value": value,
-            "tags": tags,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        # Add default tags
         try:
-            if frappe.session.user:
-                metric["tags"]["user"] = frappe.session.user
-            
-            if hasattr(frappe.local, 'site'):
-                metric["tags"]["site"] = frappe.local.site
-        except:
-            pass
-        
-        # Store metric
-        self._store_metric(metric)
-    
-    def _store_metric(self, metric: Dict) -> None:
-        """Store metric.
-        
-        Args:
-            metric: Metric data
-        """
-        try:
-            # Buffer metrics
-            self._metrics_buffer.append(metric)
-            
-            # Flush if buffer is large
-            if len(self._metrics_buffer) >= 100:
-                self.flush()
-        except Exception as e:
-            frappe.log_error(f"Failed to store metric: {str(e)}", "MetricsCollector")
-    
-    def flush(self) -> None:
-        """Flush metrics buffer."""
-        if not self._metrics_buffer:
-            return
-        
-        try:
-            # In production, you would send to your metrics backend
-            # (e.g., Prometheus, StatsD, CloudWatch, etc.)
-            
-            # For now, log to Frappe
-            for metric in self._metrics_buffer:
-                self._log_metric(metric)
-            
-            self._metrics_buffer.clear()
+            site = getattr(frappe.local, "site", None)
+            if site:
+                tags["site"] = site
+            self._aggregator.add(metric_type, f"{self.prefix}.{name}", value, tags)
         except Exception as e:
-            frappe.log_error(f"Failed to flush metrics: {str(e)}", "MetricsCollector")
-    
-    def _log_metric(self, metric: Dict) -> None:
-        """Log metric to Frappe.
-        
-        Args:
-            metric: Metric data
-        """
-        # Log to Frappe's error log for now
-        # In production, replace with proper metrics backend
-        frappe.logger().debug(f"METRIC: {json.dumps(metric)}")
+            logger.warning("Failed to record metric %s: %s", name, e)
 
 
 class TimingContext:
@@ -195,12 +567,12 @@ class TimingContext:
     
     def __enter__(self):
         """Enter context."""
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Exit context."""
-        duration = time.time() - self.start_time
+        duration = time.perf_counter() - self.start_time
         
         # Add status tag
         if exc_type is not None:
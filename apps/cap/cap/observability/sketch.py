@@ -0,0 +1,207 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: sketch.py
+"""
+import math
+from typing import Dict, Optional
+"""Quantile Sketches
+
+DDSketch: a mergeable quantile sketch with bounded relative error.
+
+Values are counted in logarithmically sized bins, so any quantile is
+returned within ``relative_accuracy`` of the true value while memory stays
+bounded by ``max_bins`` regardless of the number of samples. Two sketches
+with the same accuracy merge exactly by adding bin counts, which makes
+them suitable for combining workers and time windows.
+"""
+
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BINS = 2048
+
+# Magnitudes below this are counted as zero
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+class DDSketch:
+    """Mergeable quantile sketch with relative accuracy guarantees."""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+                 max_bins: int = DEFAULT_MAX_BINS):
+        """Initialize sketch.
+
+        Args:
+            relative_accuracy: Maximum relative error of reported quantiles
+            max_bins: Maximum bins per sign; the lowest bins are collapsed
+                beyond this, losing accuracy only for the smallest values
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+        self.bins: Dict[int, int] = {}
+        self.negative_bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Add a value.
+
+        Args:
+            value: Sample value
+            count: Number of occurrences
+        """
+        if value > MIN_INDEXABLE_VALUE:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+            if len(self.bins) > self.max_bins:
+                self._collapse(self.bins)
+        elif value < -MIN_INDEXABLE_VALUE:
+            index = math.ceil(math.log(-value) / self._log_gamma)
+            self.negative_bins[index] = self.negative_bins.get(index, 0) + count
+            if len(self.negative_bins) > self.max_bins:
+                self._collapse(self.negative_bins)
+        else:
+            self.zero_count += count
+
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "DDSketch") -> None:
+        """Merge another sketch into this one.
+
+        Args:
+            other: Sketch with the same relative accuracy
+        """
+        if not math.isclose(other.gamma, self.gamma):
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        for index, count in other.negative_bins.items():
+            self.negative_bins[index] = self.negative_bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse(self.bins)
+        if len(self.negative_bins) > self.max_bins:
+            self._collapse(self.negative_bins)
+
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile.
+
+        Args:
+            q: Quantile between 0 and 1 (e.g., 0.99)
+
+        Returns:
+            Estimated value, or None if the sketch is empty
+        """
+        if self.count == 0:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+
+        rank = q * (self.count - 1)
+        seen = 0
+
+        # Ascending value order: most negative first, then zero, then positive
+        for index in sorted(self.negative_bins, reverse=True):
+            seen += self.negative_bins[index]
+            if seen > rank:
+                return self._clamp(-self._value(index))
+
+        seen += self.zero_count
+        if seen > rank:
+            return self._clamp(0.0)
+
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return self._clamp(self._value(index))
+
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Mean of the added values, or None if empty."""
+        return self.sum / self.count if self.count else None
+
+    def to_dict(self) -> Dict:
+        """Serialize to a JSON-compatible dictionary.
+
+        Returns:
+            Compact dictionary representation
+        """
+        return {
+            "a": self.relative_accuracy,
+            "m": self.max_bins,
+            "p": {str(index): count for index, count in self.bins.items()},
+            "n": {str(index): count for index, count in self.negative_bins.items()},
+            "z": self.zero_count,
+            "c": self.count,
+            "s": self.sum,
+            "lo": self.min if self.count else None,
+            "hi": self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DDSketch":
+        """Deserialize a dictionary produced by to_dict().
+
+        Args:
+            data: Serialized sketch
+
+        Returns:
+            DDSketch instance
+        """
+        sketch = cls(data.get("a", DEFAULT_RELATIVE_ACCURACY), data.get("m", DEFAULT_MAX_BINS))
+        sketch.bins = {int(index): count for index, count in (data.get("p") or {}).items()}
+        sketch.negative_bins = {int(index): count for index, count in (data.get("n") or {}).items()}
+        sketch.zero_count = data.get("z", 0)
+        sketch.count = data.get("c", 0)
+        sketch.sum = data.get("s", 0.0)
+        if data.get("lo") is not None:
+            sketch.min = data["lo"]
+        if data.get("hi") is not None:
+            sketch.max = data["hi"]
+        return sketch
+
+    # Private methods
+
+    def _value(self, index: int) -> float:
+        """Representative value of a bin, within relative_accuracy of every value in it."""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def _clamp(self, value: float) -> float:
+        """Keep estimates within the observed range."""
+        return max(self.min, min(self.max, value))
+
+    def _collapse(self, bins: Dict[int, int]) -> None:
+        """Fold the lowest-magnitude bins into one to respect max_bins."""
+        indexes = sorted(bins)
+        excess = len(indexes) - self.max_bins
+        folded = sum(bins.pop(index) for index in indexes[:excess])
+        target = indexes[excess]
+        bins[target] += folded
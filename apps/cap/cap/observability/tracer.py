@@ -10,32 +10,157 @@ SPDX-FileContributor: Raasid (AI Companion)
 CAP module: tracer.py
 """
 import frappe
-import uuid
-import time
-from typing import Optional, Dict, Any
-from datetime import datetime
+import atexit
+import functools
 import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 """Distributed Tracing
 
 Provides distributed tracing for request tracking across services.
+
+Traces are head-sampled when they start (cap_trace_sample_rate) and
+tail-sampled when their local root span ends: traces containing an error
+or slower than cap_trace_slow_ms are always kept. Kept spans go to a
+fixed-size, process-wide ring buffer that a background thread exports in
+OTLP/JSON batches, either to an OTLP/HTTP collector (cap_otlp_endpoint) or
+appended to a JSON-lines file (cap_trace_file). Trace context crosses
+process boundaries as a W3C ``traceparent`` header.
 """
 
 
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_SLOW_THRESHOLD_MS = 1000
+
+# Finished spans held per trace until its local root span ends
+MAX_SPANS_PER_TRACE = 512
+
+DEFAULT_BUFFER_SIZE = 4096
+DEFAULT_BATCH_SIZE = 512
+DEFAULT_FLUSH_INTERVAL = 5
+
+# W3C trace context: version-trace_id-parent_id-flags
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+FLAG_SAMPLED = 0x01
+
+# OTLP enum values
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+STATUS_CODES = {"unset": 0, "ok": 1, "error": 2}
+
+logger = logging.getLogger(__name__)
+
+
+def _conf_value(key: str, default: Any = None) -> Any:
+    """Read site config, tolerating threads without a site context."""
+    try:
+        return frappe.conf.get(key, default)
+    except Exception:
+        return default
+
+
+def generate_trace_id() -> int:
+    """Random non-zero 128-bit trace ID."""
+    return random.getrandbits(128) or 1
+
+
+def generate_span_id() -> int:
+    """Random non-zero 64-bit span ID."""
+    return random.getrandbits(64) or 1
+
+
+def format_traceparent(trace_id: int, span_id: int, sampled: bool = True) -> str:
+    """Build a W3C traceparent header.
+    
+    Args:
+        trace_id: 128-bit trace ID
+        span_id: 64-bit ID of the parent span
+        sampled: Whether the trace is sampled
+    
+    Returns:
+        traceparent header value
+    """
+    return f"00-{trace_id:032x}-{span_id:016x}-{FLAG_SAMPLED if sampled else 0:02x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[int, int, bool]]:
+    """Parse a W3C traceparent header.
+    
+    Args:
+        header: traceparent header value
+    
+    Returns:
+        Tuple of (trace_id, parent_span_id, sampled), or None if invalid
+    """
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match:
+        return None
+    
+    trace_id, span_id = int(match.group(1), 16), int(match.group(2), 16)
+    if not trace_id or not span_id:
+        return None
+    return trace_id, span_id, bool(int(match.group(3), 16) & FLAG_SAMPLED)
+
 
 class Tracer:
     """Distributed tracer for tracking requests.
     
     Implements a simple tracing mechanism compatible with OpenTelemetry concepts.
+    Spans started while another span of the same tracer is active become its
+    children.
     """
     
-    def __init__(self, trace_id: Optional[str] = None):
+    def __init__(self, trace_id: Optional[Union[int, str]] = None,
+                 parent_span_id: Optional[int] = None, sampled: Optional[bool] = None):
         """Initialize tracer.
         
         Args:
             trace_id: Optional trace ID (auto-generated if not provided)
+            parent_span_id: Remote parent span ID when continuing a trace
+            sampled: Head sampling decision (default: decided from
+                cap_trace_sample_rate)
         """
-        self.trace_id = trace_id or self._generate_trace_id()
-        self.spans = []
+        if isinstance(trace_id, str):
+            trace_id = int(trace_id.replace("-", ""), 16)
+        
+        self.trace_id = trace_id or generate_trace_id()
+        self.parent_span_id = parent_span_id
+        if sampled is None:
+            sampled = random.random() < float(_conf_value("cap_trace_sample_rate", DEFAULT_SAMPLE_RATE))
+        self.sampled = sampled
+        self.slow_threshold = float(_conf_value("cap_trace_slow_ms", DEFAULT_SLOW_THRESHOLD_MS)) / 1000
+        self.spans = deque(maxlen=MAX_SPANS_PER_TRACE)
+        self.dropped_spans = 0
+        self._active: List["Span"] = []
+        self._pending: deque = deque(maxlen=MAX_SPANS_PER_TRACE)
+        self._has_error = False
+    
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> "Tracer":
+        """Continue a trace from a traceparent header, or start a new one.
+        
+        Args:
+            header: traceparent header value
+        
+        Returns:
+            Tracer instance
+        """
+        parsed = parse_traceparent(header)
+        if parsed is None:
+            return cls()
+        trace_id, parent_span_id, sampled = parsed
+        return cls(trace_id, parent_span_id=parent_span_id, sampled=sampled)
+    
+    @property
+    def current_span(self) -> Optional["Span"]:
+        """Innermost active span."""
+        return self._active[-1] if self._active else None
     
     def span(self, name: str, **attributes):
         """Create a new span.
@@ -43,19 +168,47 @@ class Tracer:
         Args:
             name: Span name
             **attributes: Span attributes
-            
+        
         Returns:
             Span context manager
         """
         return Span(self, name, attributes)
     
+    def start_span(self, name: str, kind: str = "internal", attributes: Optional[Dict] = None) -> "Span":
+        """Create a span of a given kind.
+        
+        Args:
+            name: Span name
+            kind: internal, server, client, producer or consumer
+            attributes: Span attributes
+        
+        Returns:
+            Span, started by start() or when entered as a context manager
+        """
+        return Span(self, name, attributes or {}, kind)
+    
     def add_span(self, span_data: Dict) -> None:
         """Add completed span to trace.
         
         Args:
             span_data: Span data
         """
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped_spans += 1
         self.spans.append(span_data)
+        self._pending.append(span_data)
+        if span_data.get("status") == "error":
+            self._has_error = True
+    
+    def traceparent(self) -> str:
+        """traceparent header for work continuing this trace.
+        
+        Returns:
+            traceparent header value pointing at the current span
+        """
+        span = self.current_span
+        span_id = span.span_id if span else (self.parent_span_id or generate_span_id())
+        return format_traceparent(self.trace_id, span_id, self.sampled)
     
     def get_trace_context(self) -> Dict:
         """Get trace context for propagation.
@@ -64,7 +217,9 @@ class Tracer:
             Trace context dictionary
         """
         return {
-            "trace_id": self.trace_id,
+            "trace_id": f"{self.trace_id:032x}",
+            "traceparent": self.traceparent(),
+            "sampled": self.sampled,
             "span_count": len(self.spans)
         }
     
@@ -75,68 +230,102 @@ class Tracer:
             Complete trace data
         """
         return {
-            "trace_id": self.trace_id,
-            "spans": self.spans,
+            "trace_id": f"{self.trace_id:032x}",
+            "spans": list(self.spans),
             "total_duration": sum(s.get('duration', 0) for s in self.spans)
         }
     
-    def _generate_trace_id(self) -> str:
-        """Generate unique trace ID.
+    def _finish(self, span: "Span") -> None:
+        """Record a finished span; apply tail sampling when the local root ends."""
+        if span in self._active:
+            self._active.remove(span)
+        self.add_span(span._export())
         
-        Returns:
-            Trace ID string
-        """
-        return str(uuid.uuid4())
+        if self._active:
+            return
+        
+        keep = self.sampled or self._has_error or span.duration >= self.slow_threshold
+        if keep:
+            _exporter.submit(list(self._pending))
+        self._pending.clear()
+        self._has_error = False
 
 
 class Span:
     """Span context manager for tracing operations."""
     
-    def __init__(self, tracer: Tracer, name: str, attributes: Dict):
+    def __init__(self, tracer: Tracer, name: str, attributes: Dict, kind: str = "internal"):
         """Initialize span.
         
         Args:
             tracer: Parent tracer
             name: Span name
             attributes: Span attributes
+            kind: internal, server, client, producer or consumer
         """
         self.tracer = tracer
-        self.span_id = str(uuid.uuid4())
+        self.span_id = generate_span_id()
+        self.parent_id: Optional[int] = None
         self.name = name
+        self.kind = kind
         self.attributes = attributes
-        self.start_time = None
-        self.end_time = None
+        self.start_time: Optional[int] = None
+        self.end_time: Optional[int] = None
         self.status = "unset"
+        self.status_message = ""
         self.events = []
     
     def __enter__(self):
         """Enter span context."""
-        self.start_time = time.time()
-        self.add_event("span.start")
-        return self
+        return self.start()
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Exit span context."""
-        self.end_time = time.time()
+        self.finish(exc_val)
+    
+    @property
+    def duration(self) -> float:
+        """Duration in seconds (0 until finished)."""
+        return (self.end_time - self.start_time) / 1e9 if self.end_time else 0
+    
+    def start(self) -> "Span":
+        """Start the span as a child of the tracer's current span."""
+        parent = self.tracer.current_span
+        self.parent_id = parent.span_id if parent else self.tracer.parent_span_id
+        self.start_time = time.time_ns()
+        self.tracer._active.append(self)
+        return self
+    
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """End the span.
+        
+        Args:
+            error: Exception that ended the span, if any
+        """
+        if self.end_time is not None:
+            return
+        self.end_time = time.time_ns()
         
         # Set status based on exception
-        if exc_type is not None:
-            self.status = "error"
-            self.attributes['error'] = {
-                "type": exc_type.__name__,
-                "message": str(exc_val)
-            }
-        else:
+        if error is not None:
+            self.record_exception(error)
+        elif self.status == "unset":
             self.status = "ok"
         
-        self.add_event("span.end")
-        
-        # Export span
-        span_data = self._export()
-        self.tracer.add_span(span_data)
+        self.tracer._finish(self)
+    
+    def record_exception(self, error: BaseException) -> None:
+        """Mark the span as failed.
         
-        # Log span
-        self._log_span(span_data)
+        Args:
+            error: Exception raised
+        """
+        self.status = "error"
+        self.status_message = str(error)
+        self.add_event("exception", **{
+            "exception.type": type(error).__name__,
+            "exception.message": str(error)
+        })
     
     def add_event(self, name: str, **attributes) -> None:
         """Add event to span.
@@ -145,12 +334,7 @@ class Span:
             name: Event name
             **attributes: Event attributes
         """
-        event = {
-            "name": name,
-            "timestamp": datetime.utcnow().isoformat(),
-            "attributes": attributes
-        }
-        self.events.append(event)
+        self.events.append({"name": name, "time": time.time_ns(), "attributes": attributes})
     
     def set_attribute(self, key: str, value: Any) -> None:
         """Set span attribute.
@@ -167,30 +351,249 @@ class Span:
         Returns:
             Span data dictionary
         """
-        duration = (self.end_time - self.start_time) if self.end_time else 0
-        
         return {
-            "span_id": self.span_id,
-            "trace_id": self.tracer.trace_id,
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id else None,
+            "trace_id": f"{self.tracer.trace_id:032x}",
             "name": self.name,
+            "kind": self.kind,
             "start_time": self.start_time,
             "end_time": self.end_time,
-            "duration": duration,
+            "duration": self.duration,
             "status": self.status,
+            "status_message": self.status_message,
             "attributes": self.attributes,
             "events": self.events
         }
+
+
+class SpanExporter:
+    """Process-wide ring buffer of finished spans, exported in batches.
     
-    def _log_span(self, span_data: Dict) -> None:
-        """Log span data.
+    submit() only appends to a bounded deque; when the buffer is full the
+    oldest spans are dropped and counted. A background thread converts
+    batches to OTLP/JSON and hands them to the sinks.
+    """
+    
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """Initialize exporter.
         
         Args:
-            span_data: Span data
+            buffer_size: Maximum buffered spans
+            batch_size: Maximum spans per exported batch; a full batch
+                wakes the export thread early
+            flush_interval: Seconds between background exports
         """
-        try:
-            frappe.logger().debug(f"TRACE: {json.dumps(span_data)}")
-        except Exception as e:
-            frappe.log_error(f"Failed to log span: {str(e)}", "Tracer")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.endpoint: Optional[str] = None
+        self.file_path: Optional[str] = None
+        self.dropped = 0
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._sinks: List[Callable[[Dict], None]] = [self.write]
+        self._configured = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+    
+    def submit(self, spans: List[Dict]) -> None:
+        """Buffer finished spans for export.
+        
+        Args:
+            spans: Exported span dictionaries
+        """
+        if not spans:
+            return
+        if not self._configured:
+            self.configure()
+        if self._thread is None:
+            self.start()
+        
+        with self._lock:
+            overflow = len(self._buffer) + len(spans) - self._buffer.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+            self._buffer.extend(spans)
+            full = len(self._buffer) >= self.batch_size
+        
+        if full:
+            self._wakeup.set()
+    
+    def configure(self) -> None:
+        """Read export settings; called from a thread with a site context."""
+        self.endpoint = _conf_value("cap_otlp_endpoint")
+        self.file_path = _conf_value("cap_trace_file") or _default_trace_file()
+        self._configured = True
+    
+    def add_sink(self, sink: Callable[[Dict], None]) -> None:
+        """Register a callable receiving every OTLP/JSON payload.
+        
+        Args:
+            sink: Callable taking an ExportTraceServiceRequest dictionary
+        """
+        self._sinks.append(sink)
+    
+    def flush(self) -> None:
+        """Export everything buffered, one batch per payload."""
+        while True:
+            with self._lock:
+                count = min(len(self._buffer), self.batch_size)
+                batch = [self._buffer.popleft() for _ in range(count)]
+                dropped, self.dropped = self.dropped, 0
+            
+            if dropped:
+                logger.warning("Dropped %d spans, trace buffer full", dropped)
+            if not batch:
+                return
+            
+            payload = to_otlp(batch)
+            for sink in list(self._sinks):
+                try:
+                    sink(payload)
+                except Exception as e:
+                    logger.warning("Trace sink %s failed: %s", getattr(sink, "__name__", sink), e)
+    
+    def write(self, payload: Dict) -> None:
+        """Default sink: POST to the OTLP/HTTP collector or append to the trace file."""
+        body = json.dumps(payload, separators=(",", ":"), default=str)
+        
+        if self.endpoint:
+            request = urllib.request.Request(
+                self.endpoint, data=body.encode(), headers={"Content-Type": "application/json"}
+            )
+            urllib.request.urlopen(request, timeout=5).close()
+        elif self.file_path:
+            with open(self.file_path, "a") as f:
+                f.write(body + "\n")
+    
+    def start(self) -> None:
+        """Start the background export thread if not running."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="cap-trace-export", daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop the background thread and export what is left."""
+        self._stopped.set()
+        self._wakeup.set()
+        self.flush()
+    
+    def _run(self) -> None:
+        """Export periodically, or early when a batch fills up."""
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def _reset_after_fork(self) -> None:
+        """Drop spans inherited from the parent; the parent exports them."""
+        self._lock = threading.Lock()
+        self._buffer.clear()
+        self.dropped = 0
+        self._thread = None
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+
+
+def to_otlp(spans: List[Dict]) -> Dict:
+    """Convert exported spans to an OTLP/JSON ExportTraceServiceRequest.
+    
+    Args:
+        spans: Exported span dictionaries
+    
+    Returns:
+        OTLP/JSON payload
+    """
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({
+                "service.name": "cap",
+                "process.pid": os.getpid()
+            })},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_otlp_span(span) for span in spans]
+            }]
+        }]
+    }
+
+
+def _otlp_span(span: Dict) -> Dict:
+    """Convert one exported span to OTLP/JSON."""
+    otlp = {
+        "traceId": span["trace_id"],
+        "spanId": span["span_id"],
+        "name": span["name"],
+        "kind": SPAN_KINDS.get(span.get("kind"), 1),
+        "startTimeUnixNano": str(span["start_time"]),
+        "endTimeUnixNano": str(span["end_time"]),
+        "attributes": _otlp_attributes(span.get("attributes") or {}),
+        "status": {"code": STATUS_CODES.get(span.get("status"), 0)}
+    }
+    if span.get("parent_id"):
+        otlp["parentSpanId"] = span["parent_id"]
+    if span.get("status_message"):
+        otlp["status"]["message"] = span["status_message"]
+    if span.get("events"):
+        otlp["events"] = [
+            {"timeUnixNano": str(event["time"]), "name": event["name"],
+             "attributes": _otlp_attributes(event.get("attributes") or {})}
+            for event in span["events"]
+        ]
+    return otlp
+
+
+def _otlp_attributes(attributes: Dict) -> List[Dict]:
+    """Convert attributes to OTLP KeyValue list."""
+    result = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": value if isinstance(value, str) else json.dumps(value, default=str)}
+        result.append({"key": key, "value": typed})
+    return result
+
+
+def _default_trace_file() -> str:
+    """logs/cap_traces.jsonl in the bench directory."""
+    from frappe.utils import get_bench_path
+    return os.path.join(get_bench_path(), "logs", "cap_traces.jsonl")
+
+
+_exporter = SpanExporter()
+
+
+def get_exporter() -> SpanExporter:
+    """Get the process-wide span exporter.
+    
+    Returns:
+        SpanExporter instance
+    """
+    return _exporter
+
+
+def flush_traces(**kwargs) -> None:
+    """Export buffered spans now.
+    
+    Registered as an ``after_job`` hook: RQ work-horses exit without
+    running atexit handlers, so job spans are exported explicitly.
+    """
+    _exporter.flush()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_exporter._reset_after_fork)
+atexit.register(flush_traces)
 
 
 def get_current_trace() -> Optional[Tracer]:
@@ -199,15 +602,138 @@ def get_current_trace() -> Optional[Tracer]:
     Returns:
         Current tracer or None
     """
-    if hasattr(frappe.local, 'tracer'):
-        return frappe.local.tracer
-    return None
+    return getattr(frappe.local, 'tracer', None)
 
 
-def set_current_trace(tracer: Tracer) -> None:
+def set_current_trace(tracer: Optional[Tracer]) -> None:
     """Set current trace in context.
     
     Args:
-        tracer: Tracer instance
+        tracer: Tracer instance, or None to clear
     """
     frappe.local.tracer = tracer
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent of the current trace, or None outside a trace."""
+    tracer = get_current_trace()
+    return tracer.traceparent() if tracer else None
+
+
+def traced(name: Optional[str] = None, kind: str = "internal"):
+    """Decorator running a function in a span of the current trace.
+    
+    Starts a new trace when none is active. For doc-event hooks the
+    document's doctype and name are recorded as attributes.
+    
+    Args:
+        name: Span name (default: module.qualname of the function)
+        kind: Span kind
+    
+    Returns:
+        Decorator
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = get_current_trace()
+            owns_trace = tracer is None
+            if owns_trace:
+                tracer = Tracer()
+                set_current_trace(tracer)
+            
+            attributes = {}
+            if args and getattr(args[0], "doctype", None):
+                attributes = {"frappe.doctype": args[0].doctype, "frappe.docname": getattr(args[0], "name", None)}
+            
+            try:
+                with tracer.start_span(span_name, kind, attributes):
+                    return func(*args, **kwargs)
+            finally:
+                if owns_trace:
+                    set_current_trace(None)
+        
+        return wrapper
+    return decorator
+
+
+def enqueue(method: Union[str, Callable], **kwargs):
+    """frappe.enqueue that continues the current trace in the job.
+    
+    Args:
+        method: Dotted path or function to run
+        **kwargs: frappe.enqueue options and job arguments
+    
+    Returns:
+        Whatever frappe.enqueue returns
+    """
+    tracer = get_current_trace()
+    if tracer is None:
+        return frappe.enqueue(method, **kwargs)
+    
+    if not isinstance(method, str):
+        method = f"{method.__module__}.{method.__qualname__}"
+    kwargs.setdefault("job_name", method)
+    
+    with tracer.start_span(f"enqueue {method}", "producer"):
+        return frappe.enqueue(
+            "cap.observability.tracer.run_traced",
+            traced_method=method,
+            traceparent=tracer.traceparent(),
+            **kwargs
+        )
+
+
+def run_traced(traced_method: str, traceparent: Optional[str] = None, **kwargs):
+    """Job entry point used by enqueue(): run a method inside the caller's trace.
+    
+    Args:
+        traced_method: Dotted path of the job method
+        traceparent: traceparent of the enqueuing span
+        **kwargs: Job arguments
+    
+    Returns:
+        Result of the job method
+    """
+    tracer = Tracer.from_traceparent(traceparent)
+    set_current_trace(tracer)
+    try:
+        with tracer.start_span(f"job {traced_method}", "consumer"):
+            return frappe.get_attr(traced_method)(**kwargs)
+    finally:
+        set_current_trace(None)
+
+
+def start_request_trace() -> None:
+    """before_request hook: start a server span, continuing an incoming traceparent."""
+    request = getattr(frappe.local, "request", None)
+    if request is None:
+        return
+    
+    tracer = Tracer.from_traceparent(request.headers.get("traceparent"))
+    span = tracer.start_span(f"{request.method} {request.path}", "server", {
+        "http.method": request.method,
+        "http.target": request.path,
+        "frappe.site": frappe.local.site
+    })
+    set_current_trace(tracer)
+    frappe.local.cap_request_span = span.start()
+
+
+def end_request_trace(response=None, request=None) -> None:
+    """after_request hook: end the server span opened by start_request_trace()."""
+    span = getattr(frappe.local, "cap_request_span", None)
+    if span is None:
+        return
+    
+    status_code = getattr(response, "status_code", None)
+    if status_code is not None:
+        span.set_attribute("http.status_code", status_code)
+        if status_code >= 500:
+            span.status = "error"
+    span.finish()
+    
+    frappe.local.cap_request_span = None
+    set_current_trace(None)
@@ -0,0 +1,18 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Patch module: add_tenant_indexes.py
+"""
+from cap.setup.indexes import ensure_indexes
+"""Create the composite tenant/time/status indexes on existing sites."""
+
+
+
+def execute():
+    ensure_indexes()
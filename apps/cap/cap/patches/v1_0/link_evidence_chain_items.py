@@ -0,0 +1,22 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Patch module: link_evidence_chain_items.py
+"""
+import frappe
+from cap.compliance.integrity import SCAN_BATCH_SIZE, link_chain
+from cap.repositories.base_repository import BaseRepository
+"""Link the items of Evidence Chains stored before chain items were hashed."""
+
+
+
+def execute():
+    for chain in BaseRepository("Evidence Chain").iter_all(fields=["name"], batch_size=SCAN_BATCH_SIZE):
+        link_chain(chain["name"])
+        frappe.db.commit()
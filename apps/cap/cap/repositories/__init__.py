@@ -9,7 +9,6 @@ SPDX-FileContributor: Raasid (AI Companion)
 
 CAP module: __init__.py
 """
-    from cap.repositories.tenant_repository import TenantRepository
 from cap.repositories.base_repository import BaseRepository
 """Repository Layer - Data Access
 
@@ -10,14 +10,40 @@ SPDX-FileContributor: Raasid (AI Companion)
 CAP module: base_repository.py
 """
 import frappe
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Type
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils import now_datetime
+from cap.repositories.counters import COUNTED_DOCTYPES, approximate_count, get_count
+from cap.repositories.naming import assign_names
 """Base Repository Class
 
 Provides common data access patterns for all repositories.
 """
 
 
+# Names per IN (...) query
+FETCH_CHUNK_SIZE = 1000
+
+# Rows per keyset page in iter_all()
+ITER_BATCH_SIZE = 500
+
+# Rows per multi-row INSERT in bulk_insert(fast=True)
+BULK_CHUNK_SIZE = 1000
+
+# DocTypes bulk_insert(fast=True) may write without batch subscribers: only
+# the "*" tenant hooks run on their insert, and their callers set tenant
+# themselves. Other DocTypes need a cap_bulk_after_insert entry
+FAST_INSERT_DOCTYPES = frozenset({
+    "Ledger Event"
+})
+
+# Rows per UPDATE / DELETE in update_where() and delete_where()
+WRITE_CHUNK_SIZE = 1000
+
+# Columns that are NOT NULL DEFAULT 0 in frappe tables
+NUMERIC_FIELDTYPES = ("Int", "Check", "Float", "Currency", "Percent")
+
 
 class BaseRepository:
     """Base repository for data access operations.
@@ -25,6 +51,10 @@ class BaseRepository:
     Provides common CRUD operations and query methods.
     """
     
+    # Cheap per-row checks run by bulk_insert(fast=True), e.g. format or
+    # range checks; each takes the row dict and raises on invalid data
+    bulk_validators: List[Callable[[Dict], None]] = []
+    
     def __init__(self, doctype: str):
         """Initialize repository.
         
@@ -42,10 +72,71 @@ class BaseRepository:
         Returns:
             Document or None
         """
-        if not frappe.db.exists(self.doctype, name):
+        try:
+            return frappe.get_doc(self.doctype, name)
+        except frappe.DoesNotExistError:
+            frappe.clear_last_message()
             return None
+    
+    def find_many(self, names: Iterable[str], fields: Optional[List[str]] = None,
+                  with_children: bool = False, as_docs: bool = False) -> List[Any]:
+        """Find documents by name with one query per chunk of names.
         
-        return frappe.get_doc(self.doctype, name)
+        Args:
+            names: Document names
+            fields: Fields to return (default: all columns)
+            with_children: Also load child table rows, one query per child
+                table and chunk, under their table fieldnames
+            as_docs: Build Document objects (implies all fields and children)
+            
+        Returns:
+            Rows (or Documents) in the order of names; missing names are skipped
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        
+        if as_docs:
+            fields, with_children = None, True
+        elif fields and "name" not in fields:
+            fields = ["name", *fields]
+        
+        rows = {}
+        for chunk in _chunks(names, FETCH_CHUNK_SIZE):
+            for row in frappe.get_all(self.doctype, filters={"name": ["in", chunk]},
+                                      fields=fields or ["*"]):
+                rows[row.name] = row
+            if with_children:
+                self._load_children(rows, chunk)
+        
+        found = [rows[name] for name in names if name in rows]
+        if as_docs:
+            return [frappe.get_doc({"doctype": self.doctype, **row}) for row in found]
+        return found
+    
+    def get_values_bulk(self, names: Iterable[str], fields: List[str],
+                        as_dict: bool = False) -> Dict[str, Any]:
+        """Get field values of many documents without building Documents.
+        
+        Args:
+            names: Document names
+            fields: Fields to return
+            as_dict: Return dicts instead of tuples
+            
+        Returns:
+            Mapping of name to a tuple (or dict) of the field values, for
+            the names that exist
+        """
+        names = list(dict.fromkeys(names))
+        values = {}
+        
+        for chunk in _chunks(names, FETCH_CHUNK_SIZE):
+            rows = frappe.get_all(self.doctype, filters={"name": ["in", chunk]},
+                                  fields=["name", *fields], as_list=True)
+            for row in rows:
+                values[row[0]] = dict(zip(fields, row[1:])) if as_dict else tuple(row[1:])
+        
+        return values
     
     def find_all(self, filters: Optional[Dict] = None, fields: Optional[List[str]] = None,
                  limit: Optional[int] = None, order_by: Optional[str] = None) -> List[Dict]:
@@ -68,6 +159,70 @@ class BaseRepository:
             order_by=order_by
         )
     
+    def iter_all(self, filters: Optional[Any] = None, fields: Optional[List[str]] = None,
+                 batch_size: int = ITER_BATCH_SIZE, order_key: Optional[str] = None) -> Iterator[Dict]:
+        """Stream all documents matching filters, one page at a time.
+        
+        Uses keyset (seek) pagination instead of OFFSET: each page continues
+        after the last row of the previous one, so memory stays constant,
+        every page is an index range scan, and rows inserted or changed
+        during the scan don't shift pages and cause skipped rows.
+        
+        With ``order_key="name"`` (the default for autoincrement DocTypes)
+        rows are ordered by name alone. Otherwise rows are ordered by
+        ``(order_key, name)``, with ``modified`` as the default key. A row
+        modified during the scan moves past the cursor and may be yielded
+        again.
+        
+        Args:
+            filters: Filter dictionary or list
+            fields: Fields to return; the order key and name are always added
+            batch_size: Rows per query
+            order_key: "name", "modified", "creation" or another indexed
+                column (e.g. Ledger Event's sequence)
+            
+        Yields:
+            Document dicts
+        """
+        if order_key is None:
+            order_key = "name" if (frappe.get_meta(self.doctype).autoname or "").lower() == "autoincrement" \
+                else "modified"
+        if order_key not in ("name", "modified", "creation") and \
+                order_key not in frappe.get_meta(self.doctype).get_valid_columns():
+            raise frappe.ValidationError(_(f"Unsupported order key for iter_all: {order_key}"))
+        
+        fields = list(fields or ["*"])
+        if "*" not in fields:
+            fields += [f for f in ("name", order_key) if f not in fields]
+        base_filters = _filter_list(filters)
+        order_by = "name asc" if order_key == "name" else f"{order_key} asc, name asc"
+        
+        last = None
+        while True:
+            page_filters, or_filters = list(base_filters), None
+            if last is not None:
+                if order_key == "name":
+                    page_filters.append(["name", ">", last.name])
+                else:
+                    # (key, name) > (k, n) as key >= k AND (key > k OR name > n),
+                    # which frappe filters can express and the index can seek on
+                    page_filters.append([order_key, ">=", last[order_key]])
+                    or_filters = [[order_key, ">", last[order_key]], ["name", ">", last.name]]
+            
+            rows = frappe.get_all(
+                self.doctype,
+                filters=page_filters,
+                or_filters=or_filters,
+                fields=fields,
+                order_by=order_by,
+                limit=batch_size
+            )
+            yield from rows
+            
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+    
     def find_one(self, filters: Dict, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Find one document matching filters.
         
@@ -139,15 +294,29 @@ class BaseRepository:
         """
         return frappe.db.exists(self.doctype, name)
     
-    def count(self, filters: Optional[Dict] = None) -> int:
+    def count(self, filters: Optional[Dict] = None, approximate: bool = False) -> int:
         """Count documents matching filters.
         
+        Tenant-only filters on DocTypes in counters.COUNTED_DOCTYPES are
+        served from their Record Counter instead of a COUNT(*) scan.
+        
         Args:
             filters: Filter dictionary
+            approximate: Without filters, return the table statistics'
+                row estimate instead of counting
             
         Returns:
             Count of documents
         """
+        if approximate and not filters:
+            estimate = approximate_count(self.doctype)
+            if estimate is not None:
+                return estimate
+        
+        if self.doctype in COUNTED_DOCTYPES and filters and list(filters) == ["tenant"] \
+                and isinstance(filters["tenant"], str):
+            return get_count(self.doctype, filters["tenant"])
+        
         return frappe.db.count(self.doctype, filters or {})
     
     def get_value(self, name: str, field: str) -> Any:
@@ -176,18 +345,274 @@ class BaseRepository:
         frappe.db.set_value(self.doctype, name, field, value)
         return True
     
-    def bulk_insert(self, data_list: List[Dict]) -> List[Document]:
+    def update_where(self, filters: Any, values: Dict, chunk_size: int = WRITE_CHUNK_SIZE,
+                     tenant: Optional[str] = None, commit: bool = False, audit: bool = True) -> int:
+        """Set fields on every document matching filters with set-based SQL.
+        
+        Matching names are read a chunk at a time (seeking on name), and each
+        chunk is written with a single ``UPDATE ... WHERE name IN (...)``
+        that also sets ``modified`` and ``modified_by``. Controller hooks
+        don't run. One summarized Audit Log entry is written for the whole
+        operation, instead of one per row.
+        
+        Args:
+            filters: Filter dictionary or list
+            values: Field values to set
+            chunk_size: Rows per UPDATE
+            tenant: Restrict to this tenant's rows
+            commit: Commit after each chunk, releasing row locks early
+            audit: Write the summary Audit Log entry
+            
+        Returns:
+            Number of rows updated
+        """
+        columns = frappe.get_meta(self.doctype).get_valid_columns()
+        invalid = [field for field in values if field not in columns or field in ("name", "modified", "modified_by")]
+        if not values or invalid:
+            raise frappe.ValidationError(_(f"Invalid fields for bulk update of {self.doctype}: {', '.join(invalid)}"))
+        
+        total = 0
+        for chunk in self._iter_name_chunks(filters, chunk_size, tenant):
+            frappe.db.set_value(self.doctype, {"name": ["in", chunk]}, values)
+            total += len(chunk)
+            if commit:
+                frappe.db.commit()
+        
+        if audit and total:
+            self._record_bulk_audit("bulk_update", total, filters, tenant, values)
+        return total
+    
+    def delete_where(self, filters: Any, chunk_size: int = WRITE_CHUNK_SIZE,
+                     tenant: Optional[str] = None, commit: bool = False, audit: bool = True) -> int:
+        """Delete every document matching filters with set-based SQL.
+        
+        Works like update_where(): one ``DELETE ... WHERE name IN (...)``
+        per chunk, plus one per child table. Controller hooks don't run, and
+        links to the deleted rows are not checked.
+        
+        Args:
+            filters: Filter dictionary or list
+            chunk_size: Rows per DELETE
+            tenant: Restrict to this tenant's rows
+            commit: Commit after each chunk, releasing row locks early
+            audit: Write the summary Audit Log entry
+            
+        Returns:
+            Number of rows deleted
+        """
+        child_doctypes = [df.options for df in frappe.get_meta(self.doctype).get_table_fields()]
+        
+        total = 0
+        for chunk in self._iter_name_chunks(filters, chunk_size, tenant):
+            for child_doctype in child_doctypes:
+                frappe.db.delete(child_doctype, {"parent": ["in", chunk], "parenttype": self.doctype})
+            frappe.db.delete(self.doctype, {"name": ["in", chunk]})
+            total += len(chunk)
+            if commit:
+                frappe.db.commit()
+        
+        if audit and total:
+            self._record_bulk_audit("bulk_delete", total, filters, tenant)
+        return total
+    
+    def bulk_insert(self, data_list: List[Dict], fast: bool = False,
+                    chunk_size: int = BULK_CHUNK_SIZE, commit: bool = False) -> List[Any]:
         """Bulk insert documents.
         
+        The default inserts each document with its full validation, naming and
+        hooks. With ``fast=True`` rows are written with one multi-row INSERT
+        per chunk instead:
+        
+        - names are reserved a block at a time (autoincrement sequences,
+          naming series and format: series)
+        - only cheap checks run per row: required fields, Select options and
+          the repository's ``bulk_validators``
+        - controller methods and doc_events are skipped; subscribers listed
+          for the DocType under the ``cap_bulk_after_insert`` hook are called
+          once per chunk with ``(doctype, rows)``
+        
+        The fast path is refused for DocTypes that are neither in
+        FAST_INSERT_DOCTYPES nor have subscribers, so their insert side
+        effects can't be skipped by accident.
+        
         Args:
             data_list: List of document data
+            fast: Use the multi-row insert path
+            chunk_size: Rows per INSERT (fast path)
+            commit: Commit after each chunk (fast path), keeping
+                transactions short for large imports
             
         Returns:
-            List of created documents
+            List of created documents, or of names with fast=True
         """
+        if fast:
+            return self._bulk_insert_fast(data_list, chunk_size, commit)
+        
         docs = []
         for data in data_list:
             doc = self.create(data)
             docs.append(doc)
         
         return docs
+    
+    def _bulk_insert_fast(self, data_list: List[Dict], chunk_size: int, commit: bool) -> List[Any]:
+        """Multi-row insert path of bulk_insert()."""
+        subscribers = (frappe.get_hooks("cap_bulk_after_insert") or {}).get(self.doctype, [])
+        if self.doctype not in FAST_INSERT_DOCTYPES and not subscribers:
+            raise frappe.ValidationError(_(
+                f"Fast bulk insert would skip the insert hooks of {self.doctype}; "
+                f"register a cap_bulk_after_insert subscriber for it"
+            ))
+        
+        meta = frappe.get_meta(self.doctype)
+        columns = meta.get_valid_columns()
+        fields = {df.fieldname: df for df in meta.fields if df.fieldname in columns}
+        table_fields = {df.fieldname for df in meta.get_table_fields()}
+        numeric = {name for name, df in fields.items() if df.fieldtype in NUMERIC_FIELDTYPES}
+        json_fields = {name for name, df in fields.items() if df.fieldtype == "JSON"}
+        required = [name for name, df in fields.items() if df.reqd]
+        options = {
+            name: set((df.options or "").split("\n"))
+            for name, df in fields.items() if df.fieldtype == "Select" and df.options
+        }
+        validators = list(self.bulk_validators)
+        
+        # Defaults (including user defaults) resolved once, like frappe.new_doc
+        defaults = {
+            key: value for key, value in frappe.new_doc(self.doctype).as_dict().items()
+            if key in fields and value is not None
+        }
+        
+        names = []
+        for chunk in _chunks(list(data_list), chunk_size):
+            now = now_datetime()
+            user = frappe.session.user
+            rows = []
+            for data in chunk:
+                if table_fields.intersection(data):
+                    raise frappe.ValidationError(_("Child tables are not supported by fast bulk insert"))
+                
+                row = {**defaults, **data}
+                row.update(owner=user, modified_by=user, creation=now, modified=now, docstatus=0, idx=0)
+                for fieldname in numeric:
+                    if row.get(fieldname) is None:
+                        row[fieldname] = 0
+                for fieldname in json_fields:
+                    if isinstance(row.get(fieldname), (dict, list)):
+                        row[fieldname] = frappe.as_json(row[fieldname])
+                
+                for fieldname in required:
+                    if row.get(fieldname) in (None, ""):
+                        raise frappe.ValidationError(_(f"Missing required field: {fieldname}"))
+                for fieldname, allowed in options.items():
+                    if row.get(fieldname) and row[fieldname] not in allowed:
+                        raise frappe.ValidationError(_(f"Invalid value for {fieldname}: {row[fieldname]}"))
+                for validate in validators:
+                    validate(row)
+                
+                rows.append(row)
+            
+            assign_names(self.doctype, meta.autoname, rows, now)
+            
+            insert_columns = [column for column in columns if any(column in row for row in rows)]
+            frappe.db.bulk_insert(
+                self.doctype,
+                insert_columns,
+                [[row.get(column) for column in insert_columns] for row in rows]
+            )
+            
+            for method in subscribers:
+                frappe.get_attr(method)(self.doctype, rows)
+            
+            if commit:
+                frappe.db.commit()
+            names.extend(row["name"] for row in rows)
+        
+        return names
+    
+    def _iter_name_chunks(self, filters: Any, chunk_size: int, tenant: Optional[str]) -> Iterator[List[str]]:
+        """Yield matching names a chunk at a time, seeking past the last name.
+        
+        Seeking instead of re-running the filter keeps each chunk read
+        cheap and terminates even when the write doesn't change whether
+        rows match.
+        """
+        base_filters = _filter_list(filters)
+        if tenant:
+            base_filters.append(["tenant", "=", tenant])
+        
+        last = None
+        while True:
+            page_filters = base_filters + ([["name", ">", last]] if last is not None else [])
+            names = frappe.get_all(self.doctype, filters=page_filters, pluck="name",
+                                   order_by="name asc", limit=chunk_size)
+            if names:
+                yield names
+            if len(names) < chunk_size:
+                return
+            last = names[-1]
+    
+    def _record_bulk_audit(self, action: str, count: int, filters: Any,
+                           tenant: Optional[str], values: Optional[Dict] = None) -> None:
+        """Write one Audit Log entry summarizing a set-based write."""
+        try:
+            frappe.get_doc({
+                "doctype": "Audit Log",
+                "log_id": frappe.generate_hash(length=16),
+                "log_type": "Data Change",
+                "timestamp": now_datetime(),
+                "severity": "Medium" if action == "bulk_delete" else "Low",
+                "status": "Success",
+                "event_category": "Data Modification",
+                "event_action": action,
+                "event_description": f"{action} on {count} {self.doctype} rows matching {frappe.as_json(filters)}",
+                "user": frappe.session.user,
+                "tenant": tenant,
+                "doctype_affected": self.doctype,
+                "new_value": frappe.as_json(values) if values else None,
+                "affected_records_count": count,
+                "bulk_operation": 1
+            }).insert(ignore_permissions=True)
+        except Exception as e:
+            frappe.log_error(f"Error recording {action} audit for {self.doctype}: {str(e)}", "CAP Repository")
+    
+    def _load_children(self, rows: Dict[str, Dict], names: List[str]) -> None:
+        """Attach child table rows to parent rows with one query per table."""
+        parents = [name for name in names if name in rows]
+        if not parents:
+            return
+        
+        for df in frappe.get_meta(self.doctype).get_table_fields():
+            for row in (rows[name] for name in parents):
+                row[df.fieldname] = []
+            
+            children = frappe.get_all(
+                df.options,
+                filters={"parent": ["in", parents], "parenttype": self.doctype, "parentfield": df.fieldname},
+                fields=["*"],
+                order_by="idx asc"
+            )
+            for child in children:
+                rows[child.parent][df.fieldname].append(child)
+
+
+def _filter_list(filters: Optional[Any]) -> List[List]:
+    """Normalize dict filters to frappe's [field, operator, value] list form."""
+    if not filters:
+        return []
+    if not isinstance(filters, dict):
+        return [list(f) for f in filters]
+    
+    result = []
+    for field, condition in filters.items():
+        if isinstance(condition, (list, tuple)):
+            result.append([field, condition[0], condition[1]])
+        else:
+            result.append([field, "=", condition])
+    return result
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    """Split a list into consecutive chunks."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,168 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: counters.py
+"""
+import frappe
+from typing import Optional
+from frappe.utils import now_datetime
+"""Record Counters
+
+Per-(DocType, tenant) row counts kept in Record Counter, so dashboards
+don't run COUNT(*) index scans on every call. Counters are adjusted in the
+inserting/deleting transaction by doc events, seeded on first read, and
+reconciled daily against the tables to correct drift from writes that
+bypass doc events (bulk_insert(fast=True), delete_where(), raw SQL, or a
+document moving between tenants).
+"""
+
+
+# DocTypes with a tenant field whose per-tenant counts are maintained
+COUNTED_DOCTYPES = frozenset({
+    "User",
+    "Policy",
+    "Chat Session",
+    "Evidence",
+    "Violation",
+    "Compliance Assessment"
+})
+
+
+def counter_name(doctype: str, tenant: str) -> str:
+    """Record Counter name for a DocType and tenant."""
+    return f"{doctype}::{tenant}"
+
+
+def get_count(doctype: str, tenant: str) -> int:
+    """Row count of a DocType for one tenant, served from its counter.
+    
+    Args:
+        doctype: Counted DocType
+        tenant: Tenant name
+        
+    Returns:
+        Number of rows
+    """
+    row = frappe.db.sql(
+        "SELECT `row_count` FROM `tabRecord Counter` WHERE `name`=%s",
+        (counter_name(doctype, tenant),)
+    )
+    if row:
+        return int(row[0][0] or 0)
+    
+    # First read seeds the counter; later inserts and deletes adjust it
+    count = frappe.db.count(doctype, {"tenant": tenant})
+    set_count(doctype, tenant, count)
+    return count
+
+
+def set_count(doctype: str, tenant: str, count: int) -> None:
+    """Create or overwrite a counter with an absolute value.
+    
+    Args:
+        doctype: Counted DocType
+        tenant: Tenant name
+        count: Row count
+    """
+    now = now_datetime()
+    values = (counter_name(doctype, tenant), doctype, tenant, count, now, now, now,
+              frappe.session.user, frappe.session.user)
+    columns = "`name`, `counted_doctype`, `tenant`, `row_count`, `reconciled_at`, `creation`, `modified`, `owner`, `modified_by`"
+    
+    if frappe.db.db_type == "postgres":
+        frappe.db.sql(f"""
+            INSERT INTO `tabRecord Counter` ({columns}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (`name`) DO UPDATE SET `row_count` = EXCLUDED.`row_count`,
+                `reconciled_at` = EXCLUDED.`reconciled_at`, `modified` = EXCLUDED.`modified`
+        """, values)
+    else:
+        frappe.db.sql(f"""
+            INSERT INTO `tabRecord Counter` ({columns}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE `row_count` = VALUES(`row_count`),
+                `reconciled_at` = VALUES(`reconciled_at`), `modified` = VALUES(`modified`)
+        """, values)
+
+
+def increment(doctype: str, tenant: str, delta: int) -> None:
+    """Adjust an existing counter by delta.
+    
+    Missing counters are left alone: they are seeded with the true count on
+    first read, which already includes this row.
+    
+    Args:
+        doctype: Counted DocType
+        tenant: Tenant name
+        delta: Rows added (negative for removed)
+    """
+    frappe.db.sql(
+        "UPDATE `tabRecord Counter` SET `row_count` = `row_count` + %s WHERE `name`=%s",
+        (delta, counter_name(doctype, tenant))
+    )
+
+
+def on_insert(doc, method=None):
+    """after_insert doc event: count the new row."""
+    if doc.doctype in COUNTED_DOCTYPES and doc.get("tenant"):
+        increment(doc.doctype, doc.tenant, 1)
+
+
+def on_trash(doc, method=None):
+    """on_trash doc event: uncount the deleted row."""
+    if doc.doctype in COUNTED_DOCTYPES and doc.get("tenant"):
+        increment(doc.doctype, doc.tenant, -1)
+
+
+def reconcile_counters():
+    """Reset every counter to its table's true per-tenant count.
+    
+    One GROUP BY scan per counted DocType instead of one COUNT per tenant.
+    Counters of tenants that no longer have rows are set to zero.
+    """
+    for doctype in sorted(COUNTED_DOCTYPES):
+        try:
+            counts = dict(frappe.db.sql(f"""
+                SELECT `tenant`, COUNT(*) FROM `tab{doctype}`
+                WHERE `tenant` IS NOT NULL AND `tenant` != ''
+                GROUP BY `tenant`
+            """))
+            for tenant in frappe.get_all("Record Counter", filters={"counted_doctype": doctype}, pluck="tenant"):
+                counts.setdefault(tenant, 0)
+            
+            for tenant, count in counts.items():
+                set_count(doctype, tenant, count)
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"Error reconciling {doctype} counters: {str(e)}", "CAP Counters")
+
+
+def approximate_count(doctype: str) -> Optional[int]:
+    """Table row estimate from the database's statistics, without scanning.
+    
+    InnoDB's estimate can be off by tens of percent; use it for list
+    headers and dashboards, never for limits or billing.
+    
+    Args:
+        doctype: DocType
+        
+    Returns:
+        Estimated row count, or None when no statistics exist yet
+    """
+    if frappe.db.db_type == "postgres":
+        row = frappe.db.sql("SELECT reltuples FROM pg_class WHERE relname = %s", (f"tab{doctype}",))
+    else:
+        row = frappe.db.sql("""
+            SELECT table_rows FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, (f"tab{doctype}",))
+    
+    # Postgres reports -1 for tables never analyzed
+    if not row or row[0][0] is None or row[0][0] < 0:
+        return None
+    return int(row[0][0])
@@ -0,0 +1,191 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: naming.py
+"""
+import frappe
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from frappe import _
+from frappe.model.naming import determine_consecutive_week_number
+"""Bulk Naming
+
+Assigns names to many new rows at once, reserving whole blocks of
+autoincrement IDs and naming series numbers in one query per block instead
+of one round trip per document.
+"""
+
+
+# {param} placeholders of "format:" autonames
+BRACED_PARAMS = re.compile(r"(\{[^{}]+\})")
+
+
+def assign_names(doctype: str, autoname: Optional[str], rows: List[Dict], now: datetime) -> None:
+    """Set ``name`` on new rows following the DocType's naming rule.
+    
+    Supports autoincrement, hash, field:, format: and naming series
+    (``naming_series:`` or dotted patterns like ``LOG-.YYYY.-.#####``).
+    Rows that already have a name keep it, except for autoincrement.
+    
+    Args:
+        doctype: DocType name
+        autoname: Meta autoname
+        rows: Row dictionaries, updated in place
+        now: Timestamp used for date parts
+    """
+    autoname = (autoname or "").strip()
+    rule = autoname.lower()
+    
+    if rule == "autoincrement":
+        for row, name in zip(rows, reserve_sequence_values(doctype, len(rows))):
+            row["name"] = name
+        return
+    
+    pending = [row for row in rows if not row.get("name")]
+    if not pending:
+        return
+    
+    if not autoname or rule == "hash":
+        for row in pending:
+            row["name"] = frappe.generate_hash(length=10)
+    elif rule.startswith("field:"):
+        fieldname = autoname[len("field:"):].strip()
+        for row in pending:
+            row["name"] = row.get(fieldname)
+            if not row["name"]:
+                raise frappe.ValidationError(_(f"{fieldname} is required to name {doctype}"))
+    elif rule.startswith("format:"):
+        _assign_series(pending, lambda row: _format_parts(autoname[len("format:"):], row, now))
+    elif rule.startswith("naming_series:") or "#" in autoname:
+        def parts(row):
+            pattern = row.get("naming_series") if rule.startswith("naming_series:") else autoname
+            if not pattern:
+                raise frappe.ValidationError(_(f"Naming Series is required to name {doctype}"))
+            return _series_parts(pattern, row, now)
+        _assign_series(pending, parts)
+    else:
+        raise frappe.ValidationError(_(f"Bulk naming is not supported for autoname '{autoname}', pass names explicitly"))
+
+
+def reserve_sequence_values(doctype: str, count: int) -> List[int]:
+    """Take ``count`` values from an autoincrement DocType's sequence in one query.
+    
+    Args:
+        doctype: Autoincrement DocType
+        count: Number of IDs
+    
+    Returns:
+        Reserved IDs, ascending
+    """
+    if count <= 0:
+        return []
+    
+    sequence = f"{frappe.scrub(doctype)}_id_seq"
+    if frappe.db.db_type == "postgres":
+        rows = frappe.db.sql(f"SELECT nextval('\"{sequence}\"') FROM generate_series(1, %s)", (count,))
+    else:
+        # MariaDB Sequence engine: seq_1_to_N is a virtual table of N rows
+        rows = frappe.db.sql(f"SELECT NEXTVAL(`{sequence}`) FROM seq_1_to_{int(count)}")
+    return sorted(row[0] for row in rows)
+
+
+def reserve_series(key: str, count: int) -> int:
+    """Reserve a block of numbers from a naming series.
+    
+    Locks the tabSeries row the same way frappe.model.naming.getseries
+    does, but advances it by ``count`` at once.
+    
+    Args:
+        key: Series key (the name prefix before the number)
+        count: Numbers to reserve
+    
+    Returns:
+        First reserved number
+    """
+    current = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name`=%s FOR UPDATE", (key,))
+    
+    if current and current[0][0] is not None:
+        frappe.db.sql("UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name`=%s", (count, key))
+        return int(current[0][0]) + 1
+    
+    frappe.db.sql("INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)", (key, count))
+    return 1
+
+
+def _assign_series(rows: List[Dict], get_parts) -> None:
+    """Name rows from (prefix, digits, suffix) parts, one reservation per prefix."""
+    groups: Dict[str, List[Tuple[Dict, int, str]]] = {}
+    for row in rows:
+        prefix, digits, suffix = get_parts(row)
+        groups.setdefault(prefix, []).append((row, digits, suffix))
+    
+    for prefix, members in groups.items():
+        number = reserve_series(prefix, len(members))
+        for row, digits, suffix in members:
+            row["name"] = f"{prefix}{number:0{digits}d}{suffix}"
+            number += 1
+
+
+def _format_parts(pattern: str, row: Dict, now: datetime) -> Tuple[str, int, str]:
+    """Split a format: autoname around its {###} block, resolving other params."""
+    prefix, suffix, digits = "", "", None
+    for token in BRACED_PARAMS.split(pattern):
+        if token.startswith("{") and token.endswith("}"):
+            param = token[1:-1]
+            if param.startswith("#") and digits is None:
+                digits = len(param)
+                continue
+            token = _param_value(param, row, now)
+        if digits is None:
+            prefix += token
+        else:
+            suffix += token
+    
+    if digits is None:
+        raise frappe.ValidationError(_(f"Autoname 'format:{pattern}' has no number block"))
+    return prefix, digits, suffix
+
+
+def _series_parts(pattern: str, row: Dict, now: datetime) -> Tuple[str, int, str]:
+    """Split a dotted naming series (e.g. LOG-.YYYY.-.#####) around its number."""
+    prefix, suffix, digits = "", "", None
+    for part in pattern.split("."):
+        if part.startswith("#") and digits is None:
+            digits = len(part)
+            continue
+        if part.startswith("{") and part.endswith("}"):
+            value = _param_value(part[1:-1], row, now)
+        else:
+            value = _param_value(part, row, now, literal=True)
+        if digits is None:
+            prefix += value
+        else:
+            suffix += value
+    
+    # Like frappe, a series without a number block gets one appended
+    return prefix, digits or 5, suffix
+
+
+def _param_value(param: str, row: Dict, now: datetime, literal: bool = False) -> str:
+    """Resolve a date part or field value."""
+    if param == "YY":
+        return now.strftime("%y")
+    if param == "YYYY":
+        return now.strftime("%Y")
+    if param == "MM":
+        return now.strftime("%m")
+    if param == "DD":
+        return now.strftime("%d")
+    if param == "WW":
+        return determine_consecutive_week_number(now)
+    if literal:
+        return param
+    value = row.get(param)
+    return "" if value is None else str(value)
@@ -9,7 +9,6 @@ SPDX-FileContributor: Raasid (AI Companion)
 
 Service module: __init__.py
 """
-    from cap.services.auth_service import AuthService
 from cap.services.base_service import BaseService
 """Service Layer - Business Logic
 
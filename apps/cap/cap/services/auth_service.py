@@ -13,8 +13,9 @@ import frappe
 from frappe import _
 from typing import Dict, Optional, List
 from cap.services.base_service import BaseService
+from cap.cache.cache_manager import MISSING
+import secrets
 from datetime import datetime, timedelta
-        import secrets
 """Authentication and Authorization Service
 
 Handles all authentication and authorization logic.
@@ -132,9 +133,9 @@ class AuthService(BaseService):
         """
         cache_key = f"permission:{user}:{doctype}:{operation}:{doc_name or 'all'}"
         
-        # Try cache first
-        cached_result = self.get_cached(cache_key)
-        if cached_result is not None:
+        # Try cache first; a cached False is a hit
+        cached_result = self.get_cached(cache_key, default=MISSING)
+        if cached_result is not MISSING:
             return cached_result
         
         # Check permission
@@ -146,10 +147,44 @@ class AuthService(BaseService):
         )
         
         # Cache result for 5 minutes
-        self.set_cached(cache_key, has_permission, ttl=300)
+        self.set_cached(cache_key, has_permission, ttl=300, tags=[f"user:{user}"])
         
         return has_permission
     
+    def check_permissions(self, user: str, checks: List[Dict]) -> Dict[str, bool]:
+        """Check several permissions with one cache round trip.
+        
+        Args:
+            user: Username
+            checks: List of dicts with 'doctype', 'operation' and optional 'doc_name'
+            
+        Returns:
+            Dictionary mapping permission cache keys to results
+        """
+        keys = {
+            f"permission:{user}:{c['doctype']}:{c['operation']}:{c.get('doc_name') or 'all'}": c
+            for c in checks
+        }
+        
+        results = self.cache.get_many(list(keys))
+        
+        computed = {}
+        for cache_key, check in keys.items():
+            if cache_key in results:
+                continue
+            computed[cache_key] = frappe.has_permission(
+                check["doctype"],
+                ptype=check["operation"],
+                user=user,
+                doc=check.get("doc_name")
+            )
+        
+        if computed:
+            self.cache.set_many(computed, ttl=300, tags=[f"user:{user}"])
+            results.update(computed)
+        
+        return results
+    
     def get_user_roles(self, user: str) -> List[str]:
         """Get user roles.
         
@@ -161,12 +196,12 @@ class AuthService(BaseService):
         """
         cache_key = f"user:roles:{user}"
         
-        cached_roles = self.get_cached(cache_key)
-        if cached_roles:
+        cached_roles = self.get_cached(cache_key, default=MISSING)
+        if cached_roles is not MISSING:
             return cached_roles
         
         roles = frappe.get_roles(user)
-        self.set_cached(cache_key, roles, ttl=600)  # 10 minutes
+        self.set_cached(cache_key, roles, ttl=600, tags=[f"user:{user}"])  # 10 minutes
         
         return roles
     
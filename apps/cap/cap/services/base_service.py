@@ -15,7 +15,7 @@ import frappe
 from typing import Any, Dict, Optional
 from cap.observability.logger import get_logger
 from cap.observability.metrics import MetricsCollector
-from cap.cache.cache_manager import CacheManager
+from cap.cache.cache_manager import CacheManager, MISSING
 
 
 class BaseService:
@@ -37,33 +37,43 @@ class BaseService:
         """Log a service operation."""
         self.logger.info(f"Operation: {operation}", extra=kwargs)
         
-    def record_metric(self, metric_name: str, value: float, **tags):
-        """Record a metric."""
-        self.metrics.record(metric_name, value, **tags)
+    def record_metric(self, metric_name: str, value: float, metric_type: Optional[str] = None, **tags):
+        """Record a metric (a counter unless metric_type is given)."""
+        if metric_type:
+            self.metrics.record(metric_name, value, metric_type=metric_type, **tags)
+        else:
+            self.metrics.record(metric_name, value, **tags)
         
-    def get_cached(self, key: str, ttl: int = 300) -> Optional[Any]:
+    def get_cached(self, key: str, ttl: int = 300, default: Any = None) -> Optional[Any]:
         """Get cached value.
         
         Args:
             key: Cache key
             ttl: Time to live in seconds (default: 5 minutes)
+            default: Returned when the key is absent; pass MISSING to tell a
+                cached negative result (None) apart from a miss
             
         Returns:
-            Cached value or None
+            Cached value or default
         """
+        if default is not None:
+            return self.cache.get(key, default)
         return self.cache.get(key)
         
-    def set_cached(self, key: str, value: Any, ttl: int = 300) -> bool:
+    def set_cached(self, key: str, value: Any, ttl: int = 300, tags: Optional[list] = None) -> bool:
         """Set cached value.
         
         Args:
             key: Cache key
             value: Value to cache
             ttl: Time to live in seconds (default: 5 minutes)
+            tags: Optional invalidation tags (e.g., ['tenant:acme'])
             
         Returns:
             True if successful
         """
+        if tags:
+            return self.cache.set(key, value, ttl=ttl, tags=tags)
         return self.cache.set(key, value, ttl=ttl)
         
     def invalidate_cache(self, pattern: str) -> int:
@@ -77,6 +87,17 @@ class BaseService:
         """
         return self.cache.delete_pattern(pattern)
         
+    def invalidate_tags(self, *tags: str) -> int:
+        """Invalidate every cached key registered under the given tags.
+        
+        Args:
+            *tags: Tag names (e.g., 'tenant:acme')
+            
+        Returns:
+            Number of keys deleted
+        """
+        return self.cache.invalidate_tags(*tags)
+        
     def execute_with_metrics(self, operation_name: str, func, *args, **kwargs):
         """Execute a function with automatic metrics collection.
         
@@ -89,15 +110,16 @@ class BaseService:
             Function result
         """
         import time
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             result = func(*args, **kwargs)
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             
             self.record_metric(
                 f"{operation_name}.duration",
                 duration,
+                metric_type="timer",
                 status="success"
             )
             self.record_metric(f"{operation_name}.count", 1, status="success")
@@ -105,11 +127,12 @@ class BaseService:
             return result
             
         except Exception as e:
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             
             self.record_metric(
                 f"{operation_name}.duration",
                 duration,
+                metric_type="timer",
                 status="error"
             )
             self.record_metric(f"{operation_name}.count", 1, status="error")
@@ -10,11 +10,13 @@ SPDX-FileContributor: Raasid (AI Companion)
 Service module: tenant_service.py
 """
 import frappe
+import re
 from frappe import _
 from typing import Dict, List, Optional
 from cap.services.base_service import BaseService
+from cap.cache.cache_manager import MISSING
+from cap.cache.cache_decorators import cached_call
 from datetime import datetime
-        import re
 """Tenant Management Service
 
 Handles all tenant-related business logic.
@@ -82,7 +84,8 @@ class TenantService(BaseService):
             self._setup_tenant_permissions(tenant.name)
             
             # Cache tenant data
-            self.set_cached(f"tenant:{tenant.name}", tenant.as_dict(), ttl=3600)
+            self.set_cached(f"tenant:{tenant.name}", tenant.as_dict(), ttl=3600,
+                            tags=[f"tenant:{tenant.name}"])
             
             self.log_operation(
                 "tenant_created",
@@ -110,20 +113,21 @@ class TenantService(BaseService):
         """
         # Try cache first
         cache_key = f"tenant:{tenant_name}"
-        cached_tenant = self.get_cached(cache_key)
+        cached_tenant = self.get_cached(cache_key, default=MISSING)
         
-        if cached_tenant:
+        if cached_tenant is not MISSING:
             return cached_tenant
         
-        # Get from database
+        # Get from database; remember unknown tenants briefly
         if not frappe.db.exists("Tenant", tenant_name):
+            self.cache.set_negative(cache_key, tags=[f"tenant:{tenant_name}"])
             return None
         
         tenant = frappe.get_doc("Tenant", tenant_name)
         tenant_dict = tenant.as_dict()
         
         # Cache for 1 hour
-        self.set_cached(cache_key, tenant_dict, ttl=3600)
+        self.set_cached(cache_key, tenant_dict, ttl=3600, tags=[f"tenant:{tenant_name}"])
         
         return tenant_dict
     
@@ -146,8 +150,8 @@ class TenantService(BaseService):
             
             tenant.save()
             
-            # Invalidate cache
-            self.invalidate_cache(f"tenant:{tenant_name}")
+            # Invalidate every cached entry tagged with this tenant
+            self.invalidate_tags(f"tenant:{tenant_name}")
             
             self.log_operation(
                 "tenant_updated",
@@ -170,9 +174,9 @@ class TenantService(BaseService):
             List of users
         """
         cache_key = f"tenant:users:{tenant_name}"
-        cached_users = self.get_cached(cache_key)
+        cached_users = self.get_cached(cache_key, default=MISSING)
         
-        if cached_users:
+        if cached_users is not MISSING:
             return cached_users
         
         users = frappe.get_all(
@@ -182,7 +186,7 @@ class TenantService(BaseService):
         )
         
         # Cache for 10 minutes
-        self.set_cached(cache_key, users, ttl=600)
+        self.set_cached(cache_key, users, ttl=600, tags=[f"tenant:{tenant_name}"])
         
         return users
     
@@ -233,24 +237,27 @@ class TenantService(BaseService):
         Returns:
             Statistics dictionary
         """
-        cache_key = f"tenant:stats:{tenant_name}"
-        cached_stats = self.get_cached(cache_key)
-        
-        if cached_stats:
-            return cached_stats
-        
-        stats = {
-            "total_users": frappe.db.count("User", {"tenant": tenant_name, "enabled": 1}),
-            "total_documents": self._count_tenant_documents(tenant_name),
-            "storage_used": self._calculate_storage_used(tenant_name),
-            "active_sessions": self._count_active_sessions(tenant_name),
-            "last_activity": self._get_last_activity(tenant_name)
-        }
-        
-        # Cache for 5 minutes
-        self.set_cached(cache_key, stats, ttl=300)
+        def _compute_stats():
+            return {
+                "total_users": frappe.db.count("User", {"tenant": tenant_name, "enabled": 1}),
+                "total_documents": self._count_tenant_documents(tenant_name),
+                "storage_used": self._calculate_storage_used(tenant_name),
+                "active_sessions": self._count_active_sessions(tenant_name),
+                "last_activity": self._get_last_activity(tenant_name)
+            }
         
-        return stats
+        # Cache for 5 minutes; one worker recomputes on expiry while the
+        # others keep serving the previous value for up to a minute
+        return cached_call(
+            self.cache,
+            f"tenant:stats:{tenant_name}",
+            _compute_stats,
+            ttl=300,
+            tags=[f"tenant:{tenant_name}"],
+            single_flight=True,
+            stale_ttl=60,
+            early_refresh_beta=1.0
+        )
     
     # Private helper methods
     
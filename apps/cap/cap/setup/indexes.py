@@ -0,0 +1,189 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+CAP module: indexes.py
+"""
+import frappe
+import json
+import re
+from typing import Dict, List, Tuple
+from frappe.utils import now_datetime
+"""Composite Indexes
+
+Secondary indexes matching the platform's query shapes: nearly every list
+is filtered by tenant (permission_query_conditions) and sorted by time or
+filtered by status. Created by the add_tenant_indexes patch and after
+every migrate, and checked with ``bench --site <site> cap-verify-indexes``.
+"""
+
+
+# DocType -> composite indexes, leading column first
+INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    "Ledger Event": [("tenant", "timestamp"), ("subject_doctype", "subject_name"),
+                     ("tenant", "merkle_root", "sequence")],
+    "Audit Log": [("tenant", "timestamp"), ("tenant", "status", "modified")],
+    "Message": [("chat_session", "creation")],
+    "Chat Session": [("tenant", "status", "modified"), ("status", "modified")],
+    "Violation": [("tenant", "status", "modified")],
+    "Evidence": [("tenant", "status", "modified")],
+    "Policy": [("tenant", "status", "modified")],
+    "Compliance Event": [("tenant", "status", "modified")],
+    "Evidence Chain": [("tenant", "creation")],
+    "User": [("tenant", "enabled")]
+}
+
+# DocType -> unique composite constraints
+UNIQUE_INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    # One event per chain position; a forked chain fails to insert
+    "Ledger Event": [("tenant", "sequence")]
+}
+
+# Known query shapes: (label, DocType, WHERE / ORDER BY clause, sample values)
+QUERY_SHAPES = [
+    ("Ledger Event by tenant, newest first", "Ledger Event",
+     "`tenant`=%(tenant)s ORDER BY `timestamp` DESC LIMIT 20", {}),
+    ("Ledger Event chain of a tenant", "Ledger Event",
+     "`tenant`=%(tenant)s AND `sequence`>%(sequence)s ORDER BY `sequence` LIMIT 1000", {}),
+    ("Un-anchored Ledger Events of a tenant", "Ledger Event",
+     "`tenant`=%(tenant)s AND `merkle_root` IS NULL AND `sequence`>%(sequence)s ORDER BY `sequence` LIMIT 1024", {}),
+    ("Ledger Event history of a document", "Ledger Event",
+     "`subject_doctype`=%(doctype)s AND `subject_name`=%(name)s ORDER BY `timestamp`", {}),
+    ("Audit Log by tenant and time range", "Audit Log",
+     "`tenant`=%(tenant)s AND `timestamp`>=%(since)s ORDER BY `timestamp` DESC LIMIT 20", {}),
+    ("Audit Log by tenant and status", "Audit Log",
+     "`tenant`=%(tenant)s AND `status`=%(status)s ORDER BY `modified` DESC LIMIT 20", {}),
+    ("Messages of a chat session", "Message",
+     "`chat_session`=%(name)s ORDER BY `creation`", {}),
+    ("Chat Sessions by tenant and status", "Chat Session",
+     "`tenant`=%(tenant)s AND `status`=%(status)s ORDER BY `modified` DESC LIMIT 20", {}),
+    ("Idle Chat Session cleanup", "Chat Session",
+     "`status`=%(status)s AND `modified`<%(since)s ORDER BY `name` LIMIT 500", {"status": "Active"}),
+    ("Violations by tenant and status", "Violation",
+     "`tenant`=%(tenant)s AND `status`=%(status)s ORDER BY `modified` DESC LIMIT 20", {}),
+    ("Evidence by tenant and status", "Evidence",
+     "`tenant`=%(tenant)s AND `status`=%(status)s ORDER BY `modified` DESC LIMIT 20", {}),
+    ("Policies by tenant and status", "Policy",
+     "`tenant`=%(tenant)s AND `status`=%(status)s ORDER BY `modified` DESC LIMIT 20", {}),
+    ("Compliance Events by tenant and status", "Compliance Event",
+     "`tenant`=%(tenant)s AND `status`=%(status)s ORDER BY `modified` DESC LIMIT 20", {}),
+    ("Evidence Chains by tenant", "Evidence Chain",
+     "`tenant`=%(tenant)s ORDER BY `creation` DESC LIMIT 20", {}),
+    ("Users of a tenant", "User",
+     "`tenant`=%(tenant)s AND `enabled`=%(enabled)s", {})
+]
+
+# Placeholder values used when explaining the query shapes
+SAMPLE_VALUES = {
+    "tenant": "__cap_explain__",
+    "doctype": "Policy",
+    "name": "__cap_explain__",
+    "status": "Open",
+    "enabled": 1,
+    "sequence": 0
+}
+
+
+def index_name(columns: Tuple[str, ...]) -> str:
+    """Index name for a column tuple, within MariaDB's 64 character limit."""
+    return f"cap_{'_'.join(columns)}_index"[:64]
+
+
+def ensure_indexes() -> List[str]:
+    """Create every missing index in INDEXES and UNIQUE_INDEXES.
+    
+    Indexes whose table or columns don't exist on this site (e.g. no tenant
+    custom field on User) are skipped.
+    
+    Returns:
+        "DocType: index" labels of the indexes checked or created
+    """
+    created = []
+    for doctype, indexes in INDEXES.items():
+        if not frappe.db.table_exists(doctype):
+            continue
+        for columns in indexes:
+            if not all(frappe.db.has_column(doctype, column) for column in columns):
+                continue
+            # add_index is a no-op when an index with this name exists
+            frappe.db.add_index(doctype, list(columns), index_name(columns))
+            created.append(f"{doctype}: {index_name(columns)}")
+    
+    for doctype, indexes in UNIQUE_INDEXES.items():
+        if not frappe.db.table_exists(doctype):
+            continue
+        for columns in indexes:
+            if all(frappe.db.has_column(doctype, column) for column in columns):
+                frappe.db.add_unique(doctype, list(columns), index_name(columns))
+                created.append(f"{doctype}: {index_name(columns)}")
+    return created
+
+
+def verify_indexes() -> List[Dict]:
+    """EXPLAIN every known query shape and report full scans.
+    
+    Full scans are priced out so the verdict doesn't depend on table size:
+    on Postgres sequential scans are disabled for the check, and on MariaDB
+    the query forces the table's secondary indexes. A full scan in the plan
+    then means no usable index exists, not that the optimizer preferred a
+    scan of a small table.
+    
+    Returns:
+        One result dict per checked shape: label, doctype, ok, plan
+    """
+    values = dict(SAMPLE_VALUES, since=now_datetime())
+    results = []
+    
+    if frappe.db.db_type == "postgres":
+        frappe.db.sql("SET LOCAL enable_seqscan = off")
+    
+    for label, doctype, clause, overrides in QUERY_SHAPES:
+        # Shapes on tables or columns this site doesn't have are skipped, as in ensure_indexes()
+        columns = set(re.findall(r"`(\w+)`", clause))
+        if not frappe.db.table_exists(doctype) or \
+                not all(frappe.db.has_column(doctype, column) for column in columns):
+            continue
+        try:
+            if frappe.db.db_type == "postgres":
+                query = f"SELECT `name` FROM `tab{doctype}` WHERE {clause}"
+                plan = frappe.db.sql(f"EXPLAIN (FORMAT JSON) {query}", dict(values, **overrides))[0][0]
+                ok = not _postgres_full_scans(plan if isinstance(plan, list) else json.loads(plan))
+            else:
+                forced = ", ".join(f"`{name}`" for name in _mariadb_secondary_indexes(doctype))
+                hint = f" FORCE INDEX ({forced})" if forced else ""
+                query = f"SELECT `name` FROM `tab{doctype}`{hint} WHERE {clause}"
+                plan = frappe.db.sql(f"EXPLAIN {query}", dict(values, **overrides), as_dict=True)
+                ok = not _mariadb_full_scans(plan)
+        except Exception as e:
+            plan, ok = str(e), False
+        results.append({"label": label, "doctype": doctype, "ok": ok, "plan": plan})
+    
+    return results
+
+
+def _mariadb_secondary_indexes(doctype: str) -> List[str]:
+    """Names of a table's indexes other than the primary key."""
+    rows = frappe.db.sql(f"SHOW INDEX FROM `tab{doctype}`", as_dict=True)
+    return list(dict.fromkeys(row["Key_name"] for row in rows if row["Key_name"] != "PRIMARY"))
+
+
+def _mariadb_full_scans(plan: List[Dict]) -> List[str]:
+    """Tables read with a full table scan (type ALL) or full index scan (type index)."""
+    return [row.get("table") for row in plan if (row.get("type") or "").lower() in ("all", "index")]
+
+
+def _postgres_full_scans(plan: List[Dict]) -> List[str]:
+    """Relations read with a Seq Scan anywhere in a JSON plan."""
+    scans = []
+    nodes = [entry["Plan"] for entry in plan]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan":
+            scans.append(node.get("Relation Name"))
+        nodes.extend(node.get("Plans", []))
+    return scans
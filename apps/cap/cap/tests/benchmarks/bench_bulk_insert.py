@@ -0,0 +1,93 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: bench_bulk_insert.py
+"""
+import frappe
+import time
+import uuid
+from typing import Dict, List, Sequence
+from unittest.mock import patch
+from frappe.utils import now_datetime
+from cap.repositories import base_repository
+from cap.repositories.base_repository import BaseRepository
+"""Bulk Insert Benchmark
+
+Compares BaseRepository.bulk_insert() per-document inserts ("before")
+with the multi-row fast path on Audit Log rows. The per-document rate is
+measured on a sample and extrapolated to the full row count. Everything
+is rolled back, so it can run against a development site. Audit Log isn't
+allowed on the fast path outside the benchmark (its after_insert hook
+evaluates alert rules); only the measurement lifts that check.
+
+    bench --site <site> execute cap.tests.benchmarks.bench_bulk_insert.run
+"""
+
+
+
+def make_rows(count: int) -> List[Dict]:
+    """Audit Log rows with all required fields filled."""
+    timestamp = now_datetime()
+    return [{
+        "log_id": f"BENCH-{uuid.uuid4().hex}",
+        "log_type": "System Event",
+        "timestamp": timestamp,
+        "severity": "Info",
+        "status": "Success",
+        "event_category": "Import",
+        "event_action": "bench_bulk_insert",
+        "event_description": f"Benchmark row {i}"
+    } for i in range(count)]
+
+
+def measure(repo: BaseRepository, rows: List[Dict], fast: bool) -> float:
+    """Seconds taken to insert rows, rolled back afterwards."""
+    start = time.perf_counter()
+    try:
+        with patch.object(base_repository, "FAST_INSERT_DOCTYPES", {repo.doctype}):
+            repo.bulk_insert(rows, fast=fast)
+        return time.perf_counter() - start
+    finally:
+        frappe.db.rollback()
+
+
+def run(doctype: str = "Audit Log", rows: Sequence[int] = (10000, 100000),
+        legacy_sample: int = 2000) -> List[Dict]:
+    """Run the benchmark and print a table.
+    
+    Args:
+        doctype: DocType to insert into; its required fields must match make_rows()
+        rows: Row counts to measure
+        legacy_sample: Rows inserted per-document to estimate the legacy rate
+    
+    Returns:
+        List of result rows
+    """
+    repo = BaseRepository(doctype)
+    
+    legacy_rate = legacy_sample / measure(repo, make_rows(legacy_sample), fast=False)
+    
+    results = []
+    for count in rows:
+        fast = measure(repo, make_rows(count), fast=True)
+        results.append({
+            "rows": count,
+            "legacy_s": round(count / legacy_rate, 2),
+            "fast_s": round(fast, 2),
+            "speedup": round(count / legacy_rate / fast, 1)
+        })
+    
+    print(f"{'rows':>8} {'per-doc s (est.)':>18} {'fast s':>10} {'speedup':>9}")
+    for row in results:
+        print(f"{row['rows']:>8} {row['legacy_s']:>18} {row['fast_s']:>10} {row['speedup']:>8}x")
+    return results
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,83 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: bench_cache_keys.py
+"""
+import hashlib
+import json
+import time
+from typing import Dict, List
+from cap.cache.cache_decorators import _generate_cache_key, cached
+from cap.cache.cache_manager import CacheManager
+"""Cache Key Benchmark
+
+Measures the per-hit overhead of @cached key generation against the
+previous two-json.dumps-plus-MD5 scheme.
+
+    python -m cap.tests.benchmarks.bench_cache_keys
+"""
+
+
+
+def legacy_key(func, args: tuple, kwargs: dict, prefix=None) -> str:
+    """Previous key scheme: JSON-encode args and kwargs, MD5, 8 hex chars."""
+    func_name = f"{func.__module__}.{func.__name__}"
+    args_str = json.dumps(args, sort_keys=True, default=str)
+    kwargs_str = json.dumps(kwargs, sort_keys=True, default=str)
+    content_hash = hashlib.md5(f"{args_str}:{kwargs_str}".encode()).hexdigest()[:8]
+    return f"{prefix or 'cache'}:{func_name}:{content_hash}"
+
+
+def get_policy(tenant, policy_name, include_rules=True):
+    return {"tenant": tenant, "policy": policy_name}
+
+
+def measure(func, iterations: int) -> float:
+    """Average microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations: int = 20000) -> List[Dict]:
+    """Run the benchmark and print a table.
+
+    Args:
+        iterations: Iterations per measurement
+
+    Returns:
+        List of result rows
+    """
+    scalar = (("TEN-0001", "POL-0001"), {"include_rules": True})
+    structured = (("TEN-0001", {"status": "Active", "type": ["Compliance", "Privacy"]}), {})
+
+    cache = CacheManager(use_redis=False)
+    hashed = cached(ttl=300, cache_manager=cache)(get_policy)
+    keyed = cached(ttl=300, cache_manager=cache, key=lambda tenant, policy_name, **kw: policy_name)(get_policy)
+    hashed("TEN-0001", "POL-0001", include_rules=True)
+    keyed("TEN-0001", "POL-0001", include_rules=True)
+
+    cases = [
+        ("key, scalar args (before)", lambda: legacy_key(get_policy, *scalar)),
+        ("key, scalar args (after)", lambda: _generate_cache_key(get_policy, *scalar)),
+        ("key, dict args (before)", lambda: legacy_key(get_policy, *structured)),
+        ("key, dict args (after)", lambda: _generate_cache_key(get_policy, *structured)),
+        ("@cached hit, hashed args", lambda: hashed("TEN-0001", "POL-0001", include_rules=True)),
+        ("@cached hit, key= callable", lambda: keyed("TEN-0001", "POL-0001", include_rules=True))
+    ]
+
+    rows = [{"case": name, "us": round(measure(func, iterations), 3)} for name, func in cases]
+    for row in rows:
+        print(f"{row['case']:<32} {row['us']:>8} us")
+    return rows
+
+
+if __name__ == "__main__":
+    run()
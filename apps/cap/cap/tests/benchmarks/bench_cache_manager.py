@@ -0,0 +1,77 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: bench_cache_manager.py
+"""
+import time
+from typing import Callable, Dict, List
+from cap.cache.cache_manager import CacheManager, get_cache_manager
+"""Cache Manager Construction Benchmark
+
+Measures the per-request cost of obtaining a cache manager. "before"
+reproduces the previous behaviour of building a fresh Redis client and
+pinging it on every construction; it needs a Redis server on localhost.
+
+    bench --site <site> execute cap.tests.benchmarks.bench_cache_manager.run
+    python -m cap.tests.benchmarks.bench_cache_manager
+"""
+
+
+
+def legacy_construct() -> None:
+    """Previous CacheManager.__init__ Redis path: new client plus PING."""
+    import redis
+    client = redis.Redis(host="localhost", port=6379, db=0, decode_responses=True)
+    client.ping()
+    client.close()
+
+
+def measure(func: Callable[[], object], iterations: int) -> float:
+    """Average microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations: int = 2000) -> List[Dict]:
+    """Run the benchmark and print a table.
+
+    Args:
+        iterations: Iterations per measurement
+
+    Returns:
+        List of result rows
+    """
+    cases = [
+        ("CacheManager()", CacheManager),
+        ("get_cache_manager()", get_cache_manager),
+        ("CacheManager() + get", lambda: CacheManager().get("cap:bench:missing")),
+        ("get_cache_manager() + get", lambda: get_cache_manager().get("cap:bench:missing"))
+    ]
+
+    rows = []
+    try:
+        legacy_construct()
+        rows.append({"case": "before: redis.Redis() + PING",
+                     "us": round(measure(legacy_construct, min(iterations, 500)), 2)})
+    except Exception as e:
+        print(f"Skipping 'before' case, Redis not reachable on localhost: {e}")
+
+    for name, func in cases:
+        func()
+        rows.append({"case": f"after: {name}", "us": round(measure(func, iterations), 2)})
+
+    for row in rows:
+        print(f"{row['case']:<40} {row['us']:>10} us")
+    return rows
+
+
+if __name__ == "__main__":
+    run()
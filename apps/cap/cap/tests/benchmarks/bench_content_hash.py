@@ -0,0 +1,80 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: bench_content_hash.py
+"""
+import hashlib
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from cap.custody.content import hash_file
+"""Content Hashing Benchmark
+
+Hashes a temporary file by reading it whole ("before") and with the
+chunked hasher, with and without the pre-hash, reporting throughput and
+the peak Python memory allocated while hashing.
+
+    bench --site <site> execute cap.tests.benchmarks.bench_content_hash.run
+    python -m cap.tests.benchmarks.bench_content_hash
+"""
+
+
+
+def hash_whole(path: str) -> str:
+    """Read the whole file into memory, then hash it."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def measure(label: str, hasher: Callable[[str], object], path: str, size: int) -> Dict:
+    """Time one hashing strategy and record its peak allocation."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    hasher(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"case": label, "mb_per_s": round(size / elapsed / 2 ** 20), "peak_mb": round(peak / 2 ** 20, 1)}
+
+
+def run(size_mb: int = 256) -> List[Dict]:
+    """Run the benchmark and print a table.
+    
+    Args:
+        size_mb: Size of the test file in MiB
+    
+    Returns:
+        List of result rows
+    """
+    size = size_mb * 2 ** 20
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        block = os.urandom(2 ** 20)
+        for _ in range(size_mb):
+            f.write(block)
+        path = f.name
+    
+    try:
+        rows = [
+            measure("before: read whole file", hash_whole, path, size),
+            measure("after: chunked sha256", hash_file, path, size),
+            measure("after: chunked sha256 + pre-hash", lambda p: hash_file(p, prehash=True), path, size),
+        ]
+    finally:
+        os.remove(path)
+    
+    print(f"{'case':<36} {'MiB/s':>8} {'peak MiB':>10}")
+    for row in rows:
+        print(f"{row['case']:<36} {row['mb_per_s']:>8} {row['peak_mb']:>10}")
+    return rows
+
+
+if __name__ == "__main__":
+    run()
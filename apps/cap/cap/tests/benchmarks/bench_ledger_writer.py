@@ -0,0 +1,80 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: bench_ledger_writer.py
+"""
+import frappe
+import time
+from typing import Dict, List, Sequence
+from cap.ledger.writer import append_event, flush_pending
+"""Ledger Writer Benchmark
+
+Events per second appended to hash chains when every event is flushed on
+its own (lock head, hash, insert: the "before" pattern) versus group
+commit of a whole burst. Needs existing Tenant names; all writes are
+rolled back.
+
+    bench --site <site> execute cap.tests.benchmarks.bench_ledger_writer.run --kwargs "{'tenants': ['TEN-0001']}"
+"""
+
+
+
+def make_event(tenant: str, n: int) -> Dict:
+    """A small policy event."""
+    return {
+        "tenant": tenant,
+        "event_type": "policy_updated",
+        "subject_doctype": "Policy",
+        "subject_name": f"BENCH-{n}",
+        "event_data": {"changed_fields": ["status"], "n": n}
+    }
+
+
+def measure(tenants: Sequence[str], events: int, per_event: bool) -> float:
+    """Events per second for one burst spread over the tenants."""
+    start = time.perf_counter()
+    try:
+        for n in range(events):
+            append_event(make_event(tenants[n % len(tenants)], n))
+            if per_event:
+                flush_pending()
+        flush_pending()
+        return events / (time.perf_counter() - start)
+    finally:
+        frappe.db.rollback()
+
+
+def run(tenants: Sequence[str] = (), events: Sequence[int] = (1000, 10000)) -> List[Dict]:
+    """Run the benchmark and print a table.
+    
+    Args:
+        tenants: Tenant names to spread events over (defaults to the first 4)
+        events: Burst sizes
+    
+    Returns:
+        List of result rows
+    """
+    tenants = list(tenants) or frappe.get_all("Tenant", pluck="name", limit=4)
+    
+    rows = []
+    for count in events:
+        rows.append({
+            "events": count,
+            "per_event_eps": round(measure(tenants, count, per_event=True)),
+            "group_commit_eps": round(measure(tenants, count, per_event=False))
+        })
+    
+    print(f"{'events':>8} {'per-event ev/s':>16} {'group commit ev/s':>19}")
+    for row in rows:
+        print(f"{row['events']:>8} {row['per_event_eps']:>16} {row['group_commit_eps']:>19}")
+    return rows
+
+
+if __name__ == "__main__":
+    run()
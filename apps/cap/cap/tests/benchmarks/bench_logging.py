@@ -0,0 +1,115 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: bench_logging.py
+"""
+import logging
+import os
+import time
+from typing import Dict, List
+from cap.observability import logger as logmod
+from cap.observability.logger import DropOldestQueueHandler, DropReportingListener, StructuredFormatter
+"""Structured Logging Benchmark
+
+Measures audit-style records per second seen by the logging thread with
+the synchronous StreamHandler ("before") and the queue-backed pipeline,
+with the json and orjson encoders. Output goes to /dev/null, and to a
+stream that stalls on every write to simulate stdout backpressure.
+
+    bench --site <site> execute cap.tests.benchmarks.bench_logging.run
+    python -m cap.tests.benchmarks.bench_logging
+"""
+
+
+
+class StalledStream:
+    """Stream whose writes block briefly, like a full stdout pipe."""
+    
+    def __init__(self, delay: float = 0.0002):
+        self.delay = delay
+    
+    def write(self, text: str) -> None:
+        time.sleep(self.delay)
+    
+    def flush(self) -> None:
+        pass
+
+
+def make_logger(handler: logging.Handler) -> logging.Logger:
+    """Isolated logger writing only to one handler."""
+    logger = logging.Logger("cap.bench.logging")
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger
+
+
+def log_burst(logger: logging.Logger, records: int) -> None:
+    """Emit audit-style records with extra fields."""
+    for i in range(records):
+        logger.info("Policy %s evaluated", "POL-0001",
+                    extra={"extra_data": {"tenant": "acme", "decision": "allow", "seq": i}})
+
+
+def bench_sync(stream, label: str, encoder: str, records: int) -> Dict:
+    """Synchronous StreamHandler: format and write on the logging thread."""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(StructuredFormatter(encoder))
+    start = time.perf_counter()
+    log_burst(make_logger(handler), records)
+    elapsed = time.perf_counter() - start
+    return {"case": f"before: sync, {label} ({encoder})",
+            "caller_rps": round(records / elapsed), "total_rps": round(records / elapsed)}
+
+
+def bench_queued(stream, label: str, encoder: str, records: int) -> Dict:
+    """Queue handler: enqueue on the logging thread, write from the listener."""
+    output = logging.StreamHandler(stream)
+    output.setFormatter(StructuredFormatter(encoder))
+    handler = DropOldestQueueHandler(maxsize=records + 1)
+    listener = DropReportingListener(handler, output)
+    listener.start()
+    
+    start = time.perf_counter()
+    log_burst(make_logger(handler), records)
+    caller = time.perf_counter() - start
+    listener.stop()
+    total = time.perf_counter() - start
+    return {"case": f"after: queued, {label} ({encoder})",
+            "caller_rps": round(records / caller), "total_rps": round(records / total)}
+
+
+def run(records: int = 50000) -> List[Dict]:
+    """Run the benchmark and print a table.
+    
+    Args:
+        records: Records per measurement
+    
+    Returns:
+        List of result rows
+    """
+    encoders = ["json"] + (["orjson"] if logmod.orjson is not None else [])
+    
+    rows = []
+    with open(os.devnull, "w") as devnull:
+        for bench in (bench_sync, bench_queued):
+            for encoder in encoders:
+                rows.append(bench(devnull, "devnull", encoder, records))
+    
+    stalled_records = max(records // 10, 1)
+    for bench in (bench_sync, bench_queued):
+        rows.append(bench(StalledStream(), "stalled", "json", stalled_records))
+    
+    print(f"{'case':<42} {'caller rec/s':>14} {'end-to-end rec/s':>18}")
+    for row in rows:
+        print(f"{row['case']:<42} {row['caller_rps']:>14} {row['total_rps']:>18}")
+    return rows
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,155 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: bench_serializers.py
+"""
+import datetime
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional
+from cap.cache import serializers
+"""Cache Serializer Benchmark
+
+Compares encode/decode time and payload size of the cache serializers on
+Tenant and Policy documents.
+
+Run against real documents on a site:
+    bench --site <site> execute cap.tests.benchmarks.bench_serializers.run \\
+        --kwargs "{'tenant': 'TEN-0001', 'policy': 'POL-0001'}"
+
+Run standalone on representative documents:
+    python -m cap.tests.benchmarks.bench_serializers
+"""
+
+
+
+def sample_tenant() -> Dict:
+    """Tenant.as_dict()-shaped document."""
+    now = datetime.datetime(2025, 3, 4, 10, 30, 15, 123456)
+    return {
+        "name": "TEN-0001", "doctype": "Tenant", "owner": "admin@acme.example",
+        "creation": now, "modified": now, "modified_by": "admin@acme.example", "docstatus": 0,
+        "tenant_name": "Acme Civic Trust", "tenant_slug": "acme", "domain": "acme.example",
+        "status": "Active", "max_users": 250, "storage_limit_gb": 100.0,
+        "primary_contact": "Jane Doe", "contact_email": "jane@acme.example",
+        "billing_contact": "Accounts", "billing_email": "billing@acme.example",
+        "plan_type": "Enterprise", "subscription_start": datetime.date(2025, 1, 1),
+        "subscription_end": datetime.date(2026, 1, 1), "billing_cycle": "Annual",
+        "compliance_framework": "GDPR", "data_retention_days": 2555, "audit_enabled": 1,
+        "auto_archiving_enabled": 1, "two_factor_required": 1,
+        "ip_whitelist": "10.0.0.0/8\n192.168.0.0/16", "session_timeout": 3600,
+        "password_policy": "Strong", "tenant_id": "acme",
+        "features": [
+            {"name": f"TF-{i:04d}", "feature": f"feature_{i}", "enabled": i % 2,
+             "creation": now, "modified": now, "idx": i}
+            for i in range(12)
+        ],
+        "monthly_stats": [
+            {"name": f"TMS-{i:04d}", "month": datetime.date(2025, i, 1), "users": 200 + i,
+             "storage_used_gb": Decimal(f"{40 + i}.25"), "idx": i}
+            for i in range(1, 13)
+        ]
+    }
+
+
+def sample_policy() -> Dict:
+    """Policy.as_dict()-shaped document."""
+    now = datetime.datetime(2025, 3, 4, 10, 30, 15, 123456)
+    return {
+        "name": "POL-0001", "doctype": "Policy", "owner": "admin@acme.example",
+        "creation": now, "modified": now, "docstatus": 0, "policy_id": "POL-0001",
+        "policy_name": "Personal Data Handling", "policy_type": "Compliance",
+        "tenant": "TEN-0001", "status": "Active", "version": "3.2",
+        "description": "<p>" + "Personal data must be minimised and protected. " * 40 + "</p>",
+        "short_description": "Controls handling of personal data in AI conversations.",
+        "tags": "gdpr,pii,privacy", "category": "Privacy", "enforcement_level": "Strict",
+        "violation_action": "Block", "severity": "High", "applies_to": "All Users",
+        "scope_type": "Tenant", "target_entities": "\n".join(f"entity_{i}" for i in range(50)),
+        "effective_from": now, "effective_until": None, "is_active": 1,
+        "compliance_framework": "GDPR", "regulatory_references": "GDPR Art. 5, 25, 32",
+        "audit_frequency": "Quarterly", "requires_approval": 1,
+        "config_json": '{"redact": true, "patterns": ["email", "phone", "iban"]}',
+        "threshold_settings": '{"max_matches": 3}', "approval_date": now, "last_reviewed": now,
+        "total_violations": 1342, "total_applications": 98211, "success_rate": 98.6,
+        "policy_rules": [
+            {"name": f"PR-{i:04d}", "rule_name": f"rule_{i}", "pattern": r"\b\d{3}-\d{2}-\d{4}\b",
+             "action": "Redact", "priority": i, "creation": now, "idx": i}
+            for i in range(20)
+        ]
+    }
+
+
+def load_documents(tenant: Optional[str] = None, policy: Optional[str] = None) -> Dict[str, Dict]:
+    """Load real documents when names are given, samples otherwise."""
+    docs = {}
+    if tenant or policy:
+        import frappe
+        if tenant:
+            docs["Tenant"] = frappe.get_doc("Tenant", tenant).as_dict()
+        if policy:
+            docs["Policy"] = frappe.get_doc("Policy", policy).as_dict()
+    docs.setdefault("Tenant", sample_tenant())
+    docs.setdefault("Policy", sample_policy())
+    return docs
+
+
+def bench(value: Dict, serializer: str, iterations: int) -> Dict:
+    """Time dumps/loads of one value with one serializer."""
+    payload = serializers.dumps(value, serializer=serializer)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        serializers.dumps(value, serializer=serializer)
+    encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        serializers.loads(payload)
+    decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    return {
+        "serializer": serializer,
+        "bytes": len(payload),
+        "encode_us": round(encode_us, 2),
+        "decode_us": round(decode_us, 2),
+        "compressed": payload[2:3] != serializers.CODEC_NONE
+    }
+
+
+def run(tenant: Optional[str] = None, policy: Optional[str] = None, iterations: int = 2000) -> List[Dict]:
+    """Run the benchmark and print a table.
+
+    Args:
+        tenant: Tenant name to load (default: sample document)
+        policy: Policy name to load (default: sample document)
+        iterations: Iterations per measurement
+
+    Returns:
+        List of result rows
+    """
+    names = ["json", "pickle"]
+    if serializers.msgpack is not None:
+        names.insert(1, "msgpack")
+
+    rows = []
+    for doctype, value in load_documents(tenant, policy).items():
+        for name in names:
+            row = bench(value, name, iterations)
+            row["doctype"] = doctype
+            rows.append(row)
+
+    print(f"{'doctype':<8} {'serializer':<10} {'bytes':>7} {'encode us':>10} {'decode us':>10}  compressed")
+    for row in rows:
+        print(f"{row['doctype']:<8} {row['serializer']:<10} {row['bytes']:>7} "
+              f"{row['encode_us']:>10} {row['decode_us']:>10}  {row['compressed']}")
+    return rows
+
+
+if __name__ == "__main__":
+    run()
@@ -12,7 +12,7 @@ Test module: conftest.py
 import pytest
 import frappe
 from unittest.mock import Mock, MagicMock
-    from cap.cache import CacheManager
+from cap.cache import CacheManager
 """Pytest Configuration and Fixtures
 
 Shared test fixtures and configuration.
@@ -0,0 +1,51 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: ledger.py
+"""
+from datetime import datetime
+from typing import List, Optional
+import frappe
+from cap.ledger.merkle import build_levels, inclusion_proof, leaf_hash
+from cap.ledger.writer import GENESIS_HASH, compute_hash
+"""Ledger Test Data
+
+Builds Ledger Event chains as the writer and anchoring job store them.
+"""
+
+
+
+def make_chain(count: int, tenant: str = "T1", anchor: Optional[str] = "ANC-1") -> List[frappe._dict]:
+    """Chained Ledger Events as stored rows.
+    
+    Args:
+        count: Number of events, sequenced from 1
+        tenant: Tenant the chain belongs to
+        anchor: Ledger Anchor every event is stamped with, under one Merkle
+            root; None leaves the events un-anchored
+    
+    Returns:
+        Rows with the hashed fields, hashes and anchoring fields
+    """
+    rows, previous = [], GENESIS_HASH
+    for sequence in range(1, count + 1):
+        row = frappe._dict(name=sequence, tenant=tenant, sequence=sequence, event_type="policy_created",
+                           subject_doctype="Policy", subject_name=f"POL-{sequence}", actor_user="a@x",
+                           event_data='{"n":%d}' % sequence, timestamp=datetime(2025, 1, 1, 0, 0, sequence % 60),
+                           previous_hash=previous, ledger_anchor=None, merkle_root=None, merkle_proof=None)
+        row.current_hash = previous = compute_hash(previous, row)
+        rows.append(row)
+    
+    if anchor and rows:
+        levels = build_levels([leaf_hash(bytes.fromhex(row.current_hash)) for row in rows])
+        for index, row in enumerate(rows):
+            row.ledger_anchor = anchor
+            row.merkle_root = levels[-1][0].hex()
+            row.merkle_proof = inclusion_proof(levels, index)
+    return rows
@@ -0,0 +1,105 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_anchor.py
+"""
+import hashlib
+import pytest
+from unittest.mock import Mock, patch
+import frappe
+from cap.ledger import anchor
+from cap.ledger.merkle import leaf_hash, root_from_proof
+from cap.repositories.base_repository import BaseRepository
+"""Unit Tests for Merkle-batched Anchoring"""
+
+
+
+def written_proofs(db):
+    """Proofs and stamps passed to frappe.db.sql, keyed the way the events would store them.
+    
+    Returns:
+        ({event name: chunk proof}, [(merkle_root, top path, first, last) per stamped range])
+    """
+    proofs, stamps = {}, []
+    for call in db.sql.call_args_list:
+        values = call.args[1]
+        if isinstance(values, list):
+            pairs = values[:-1]
+            proofs.update(zip(pairs[::2], pairs[1::2]))
+        else:
+            stamps.append((values[0], values[5], values[7], values[8]))
+    return proofs, stamps
+
+
+@pytest.fixture
+def events():
+    rows = [frappe._dict(name=100 + i, sequence=i + 1, current_hash=hashlib.sha256(str(i).encode()).hexdigest())
+            for i in range(11)]
+    db = Mock()
+    with patch.object(frappe, "db", db, create=True), \
+            patch.object(BaseRepository, "iter_all", Mock(side_effect=lambda **kwargs: iter(rows))), \
+            patch.object(frappe, "get_doc", Mock(return_value=Mock(insert=Mock(return_value=Mock(name="ANC-1")))),
+                         create=True):
+        yield rows, db
+
+
+class TestAnchoring:
+    """Test suite for anchor_tenant_events and the SQLite notary."""
+    
+    def test_one_root_with_a_full_proof_per_event(self, events, tmp_path):
+        """Test chunked proofs plus the top path lead every event to the anchored root."""
+        rows, db = events
+        notary = anchor.SQLiteNotary(str(tmp_path / "notary.sqlite3"))
+        
+        anchor.anchor_tenant_events("T1", notary, chunk_size=4)
+        
+        proofs, stamps = written_proofs(db)
+        roots = {root for root, _, _, _ in stamps}
+        assert len(roots) == 1
+        for row in rows:
+            [path] = [path for _, path, first, last in stamps if first <= row.sequence <= last]
+            assert root_from_proof(leaf_hash(bytes.fromhex(row.current_hash)), proofs[row.name] + path).hex() \
+                in roots
+        assert notary.lookup(roots.pop())["block_hash"] == "1"
+        assert db.commit.call_count == 4
+    
+    def test_anchored_tenant_is_left_alone(self, events):
+        """Test a run with nothing new writes no anchor and no event."""
+        rows, db = events
+        backend = Mock()
+        BaseRepository.iter_all.side_effect = lambda **kwargs: iter([])
+        
+        assert anchor.anchor_tenant_events("T1", backend, chunk_size=4) is None
+        
+        backend.anchor.assert_not_called()
+        frappe.get_doc.assert_not_called()
+        db.sql.assert_not_called()
+    
+    def test_max_events_leaves_the_rest_for_later(self, events, tmp_path):
+        """Test a capped run anchors a prefix of the chain."""
+        rows, db = events
+        
+        anchor.anchor_tenant_events("T1", anchor.SQLiteNotary(str(tmp_path / "n.sqlite3")), max_events=5, chunk_size=4)
+        
+        proofs, stamps = written_proofs(db)
+        assert sorted(proofs) == [row.name for row in rows[:5]]
+        assert [(first, last) for _, _, first, last in stamps] == [(1, 4), (5, 5)]
+    
+    def test_notary_entries_are_hash_chained(self, tmp_path):
+        """Test each notary entry links to the previous one."""
+        notary = anchor.SQLiteNotary(str(tmp_path / "n.sqlite3"))
+        first = notary.anchor("T1", "a" * 64, {})
+        second = notary.anchor("T2", "b" * 64, {})
+        
+        conn = notary._connect()
+        previous = conn.execute("SELECT previous_hash FROM anchors WHERE id = 2").fetchone()[0]
+        conn.close()
+        assert previous == first["transaction_hash"]
+        assert second["block_hash"] == "2"
+        assert notary.lookup("c" * 64) is None
@@ -0,0 +1,324 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_base_repository.py
+"""
+import json
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import frappe
+from cap.repositories import base_repository, naming
+from cap.repositories.base_repository import BaseRepository
+"""Unit Tests for BaseRepository"""
+
+
+
+class FakeTable:
+    """In-memory rows standing in for frappe.get_all on several doctypes."""
+    
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = []
+    
+    def get_all(self, doctype, filters=None, fields=None, as_list=False, order_by=None, **kwargs):
+        self.queries.append(doctype)
+        rows = [row for row in self.tables[doctype] if self._matches(row, filters or {})]
+        if fields and fields != ["*"]:
+            rows = [frappe._dict({f: row.get(f) for f in fields}) for row in rows]
+        else:
+            rows = [frappe._dict(row) for row in rows]
+        if as_list:
+            return [tuple(row.values()) for row in rows]
+        return rows
+    
+    @staticmethod
+    def _matches(row, filters):
+        for field, condition in filters.items():
+            if isinstance(condition, list):
+                if row.get(field) not in condition[1]:
+                    return False
+            elif row.get(field) != condition:
+                return False
+        return True
+
+
+@pytest.fixture
+def violations():
+    """Violation rows with one child table."""
+    table = FakeTable({
+        "Violation": [{"name": f"V-{i}", "severity": "High" if i % 2 else "Low", "status": "Open"}
+                      for i in range(5)],
+        "Violation Note": [
+            {"name": "N-1", "parent": "V-1", "parenttype": "Violation", "parentfield": "notes", "idx": 1},
+            {"name": "N-2", "parent": "V-1", "parenttype": "Violation", "parentfield": "notes", "idx": 2}
+        ]
+    })
+    meta = Mock()
+    meta.get_table_fields.return_value = [SimpleNamespace(fieldname="notes", options="Violation Note")]
+    with patch.object(frappe, "get_all", table.get_all, create=True), \
+            patch.object(frappe, "get_meta", Mock(return_value=meta), create=True):
+        yield table
+
+
+class TestBatchFetch:
+    """Test suite for find_many and get_values_bulk."""
+    
+    def test_find_many_uses_one_query_per_chunk(self, violations):
+        """Test documents are fetched with chunked IN queries in caller order."""
+        with patch.object(base_repository, "FETCH_CHUNK_SIZE", 2):
+            rows = BaseRepository("Violation").find_many(["V-3", "V-0", "missing", "V-4"], fields=["severity"])
+        
+        assert [row.name for row in rows] == ["V-3", "V-0", "V-4"]
+        assert rows[0].severity == "High"
+        assert violations.queries == ["Violation", "Violation"]
+    
+    def test_find_many_loads_children_in_batch(self, violations):
+        """Test child rows are attached with one query per child table."""
+        rows = BaseRepository("Violation").find_many(["V-0", "V-1"], with_children=True)
+        
+        assert [child.name for child in rows[1].notes] == ["N-1", "N-2"]
+        assert rows[0].notes == []
+        assert violations.queries == ["Violation", "Violation Note"]
+    
+    def test_get_values_bulk(self, violations):
+        """Test plain tuples and dicts keyed by name."""
+        repo = BaseRepository("Violation")
+        
+        assert repo.get_values_bulk(["V-1", "V-2"], ["severity", "status"]) == {
+            "V-1": ("High", "Open"), "V-2": ("Low", "Open")
+        }
+        assert repo.get_values_bulk(["V-1"], ["severity"], as_dict=True) == {"V-1": {"severity": "High"}}
+
+
+@pytest.fixture
+def audit_meta():
+    """Meta of a small format:-named DocType."""
+    fields = [
+        SimpleNamespace(fieldname="log_type", fieldtype="Select", options="User Action\nAPI Call", reqd=1),
+        SimpleNamespace(fieldname="event_data", fieldtype="JSON", options=None, reqd=0),
+        SimpleNamespace(fieldname="retry_count", fieldtype="Int", options=None, reqd=0)
+    ]
+    meta = Mock(autoname="format:AUDIT-{YYYY}-{#####}", fields=fields)
+    meta.get_valid_columns.return_value = ["name", "owner", "creation", "modified", "modified_by",
+                                           "docstatus", "idx", "log_type", "event_data", "retry_count"]
+    meta.get_table_fields.return_value = []
+    return meta
+
+
+class TestFastBulkInsert:
+    """Test suite for bulk_insert(fast=True)."""
+    
+    @pytest.fixture
+    def db(self, audit_meta):
+        db = Mock(db_type="mariadb")
+        new_doc = Mock()
+        new_doc.return_value.as_dict.return_value = {"log_type": "User Action", "retry_count": None}
+        with patch.object(frappe, "db", db, create=True), \
+                patch.object(frappe, "get_meta", Mock(return_value=audit_meta), create=True), \
+                patch.object(frappe, "new_doc", new_doc, create=True), \
+                patch.object(frappe, "get_hooks", Mock(return_value={}), create=True), \
+                patch.object(frappe, "as_json", lambda value: json.dumps(value), create=True), \
+                patch.object(base_repository, "now_datetime", return_value=datetime(2025, 5, 1)), \
+                patch.object(base_repository, "FAST_INSERT_DOCTYPES", {"Audit Log", "Ledger Event"}):
+            yield db
+    
+    def test_rows_are_named_from_one_series_reservation_per_chunk(self, db):
+        """Test format: names come from a reserved block and rows go in chunked INSERTs."""
+        # Each chunk locks the series at its current value, then advances it
+        db.sql.side_effect = [[(41,)], None, [(44,)], None]
+        
+        names = BaseRepository("Audit Log").bulk_insert(
+            [{"event_data": {"n": i}} for i in range(5)], fast=True, chunk_size=3
+        )
+        
+        assert names == [f"AUDIT-2025-{n:05d}" for n in range(42, 47)]
+        assert [db.sql.call_args_list[i].args[1] for i in (1, 3)] == [(3, "AUDIT-2025-"), (2, "AUDIT-2025-")]
+        assert [len(call.args[2]) for call in db.bulk_insert.call_args_list] == [3, 2]
+        
+        doctype, fields, values = db.bulk_insert.call_args_list[0].args
+        row = dict(zip(fields, values[0]))
+        assert row["log_type"] == "User Action"
+        assert row["retry_count"] == 0
+        assert row["event_data"] == '{"n": 0}'
+    
+    def test_week_number_matches_frappe_at_year_end(self):
+        """Test WW follows Frappe's consecutive week numbers, not raw ISO weeks."""
+        # ISO week 1 of 2025 starts on Monday 30 December 2024
+        assert naming._param_value("WW", {}, datetime(2024, 12, 30)) == "53"
+    
+    def test_invalid_select_value_is_rejected(self, db):
+        """Test declared-cheap validation runs per row."""
+        with pytest.raises(frappe.ValidationError):
+            BaseRepository("Audit Log").bulk_insert([{"log_type": "Bogus"}], fast=True)
+        db.bulk_insert.assert_not_called()
+    
+    def test_doctype_with_insert_hooks_is_refused(self, db):
+        """Test DocTypes outside the allow-list need batch subscribers."""
+        with pytest.raises(frappe.ValidationError):
+            BaseRepository("Evidence").bulk_insert([{}], fast=True)
+        db.bulk_insert.assert_not_called()
+    
+    def test_subscribers_get_one_call_per_chunk(self, db):
+        """Test cap_bulk_after_insert subscribers receive batches."""
+        db.sql.return_value = [(0,)]
+        subscriber = Mock()
+        with patch.object(frappe, "get_hooks", Mock(return_value={"Audit Log": ["cap.test.sub"]})), \
+                patch.object(frappe, "get_attr", Mock(return_value=subscriber), create=True):
+            BaseRepository("Audit Log").bulk_insert([{}] * 4, fast=True, chunk_size=2)
+        
+        assert subscriber.call_count == 2
+        assert len(subscriber.call_args[0][1]) == 2
+    
+    def test_autoincrement_ids_reserved_in_one_query(self, db, audit_meta):
+        """Test autoincrement names come from one sequence query."""
+        audit_meta.autoname = "autoincrement"
+        db.sql.return_value = [(102,), (101,), (103,)]
+        
+        names = BaseRepository("Ledger Event").bulk_insert([{}] * 3, fast=True)
+        
+        assert names == [101, 102, 103]
+        db.sql.assert_called_once()
+
+
+class KeysetTable:
+    """frappe.get_all stand-in supporting list filters, or_filters, order_by and limit."""
+    
+    OPS = {
+        "=": lambda a, b: a == b,
+        "<": lambda a, b: a < b,
+        ">": lambda a, b: a > b,
+        ">=": lambda a, b: a >= b
+    }
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+    
+    def get_all(self, doctype, filters=None, or_filters=None, fields=None, order_by=None, limit=None):
+        self.queries.append(filters)
+        rows = [row for row in self.rows
+                if all(self.OPS[op](row[field], value) for field, op, value in filters)
+                and (not or_filters or any(self.OPS[op](row[field], value) for field, op, value in or_filters))]
+        keys = [part.split()[0] for part in order_by.split(",")]
+        rows.sort(key=lambda row: tuple(row[key] for key in keys))
+        return [frappe._dict({f: row[f] for f in fields}) for row in rows[:limit]]
+
+
+class TestIterAll:
+    """Test suite for keyset-paginated iter_all."""
+    
+    @pytest.fixture
+    def meta(self):
+        meta = Mock(autoname="hash")
+        with patch.object(frappe, "get_meta", Mock(return_value=meta), create=True):
+            yield meta
+    
+    def test_pages_on_modified_and_name_with_ties(self, meta):
+        """Test rows sharing a modified timestamp are neither skipped nor repeated."""
+        rows = [{"name": f"S-{i:02d}", "modified": datetime(2025, 1, 1, i // 4), "status": "Active"}
+                for i in range(10)]
+        table = KeysetTable(rows)
+        
+        with patch.object(frappe, "get_all", table.get_all, create=True):
+            result = list(BaseRepository("Chat Session").iter_all(
+                filters={"status": "Active"}, fields=["status"], batch_size=3
+            ))
+        
+        assert [row.name for row in result] == [row["name"] for row in rows]
+        assert set(result[0]) == {"status", "name", "modified"}
+        assert len(table.queries) == 4
+        assert ["modified", ">=", datetime(2025, 1, 1, 0)] in table.queries[1]
+    
+    def test_rows_inserted_during_scan_do_not_shift_pages(self, meta):
+        """Test an insert behind the cursor is not re-read and nothing is skipped."""
+        rows = [{"name": f"S-{i}", "modified": datetime(2025, 1, 1, i)} for i in range(1, 7)]
+        table = KeysetTable(rows)
+        
+        seen = []
+        with patch.object(frappe, "get_all", table.get_all, create=True):
+            for row in BaseRepository("Chat Session").iter_all(fields=["name"], batch_size=2):
+                seen.append(row.name)
+                if row.name == "S-2":
+                    rows.append({"name": "S-0", "modified": datetime(2025, 1, 1, 0)})
+        
+        assert seen == ["S-1", "S-2", "S-3", "S-4", "S-5", "S-6"]
+    
+    def test_autoincrement_orders_by_name(self, meta):
+        """Test autoincrement DocTypes page on the integer id alone."""
+        meta.autoname = "autoincrement"
+        table = KeysetTable([{"name": i} for i in range(5, 0, -1)])
+        
+        with patch.object(frappe, "get_all", table.get_all, create=True):
+            result = [row.name for row in BaseRepository("Ledger Event").iter_all(fields=["name"], batch_size=2)]
+        
+        assert result == [1, 2, 3, 4, 5]
+        assert table.queries[-1] == [["name", ">", 4]]
+
+
+class TestSetBasedWrites:
+    """Test suite for update_where and delete_where."""
+    
+    @pytest.fixture
+    def users(self):
+        rows = [{"name": f"u{i}@x", "tenant": "T1" if i < 5 else "T2", "enabled": 1} for i in range(7)]
+        queries = []
+        
+        def get_all(doctype, filters=None, pluck=None, order_by=None, limit=None):
+            queries.append(filters)
+            ops = {"=": lambda a, b: a == b, ">": lambda a, b: a > b}
+            names = sorted(row["name"] for row in rows
+                           if all(ops[op](row[field], value) for field, op, value in filters))
+            return names[:limit]
+        
+        meta = Mock()
+        meta.get_valid_columns.return_value = ["name", "modified", "modified_by", "enabled", "tenant"]
+        meta.get_table_fields.return_value = [SimpleNamespace(fieldname="roles", options="Has Role")]
+        with patch.object(frappe, "get_all", get_all, create=True), \
+                patch.object(frappe, "get_meta", Mock(return_value=meta), create=True), \
+                patch.object(frappe, "db", Mock(), create=True), \
+                patch.object(BaseRepository, "_record_bulk_audit") as audit:
+            yield SimpleNamespace(rows=rows, queries=queries, audit=audit)
+    
+    def test_update_where_writes_chunks_within_tenant(self, users):
+        """Test one UPDATE per chunk, scoped by tenant, with one audit entry."""
+        count = BaseRepository("User").update_where({"enabled": 1}, {"enabled": 0},
+                                                    chunk_size=2, tenant="T1", commit=True)
+        
+        assert count == 5
+        calls = frappe.db.set_value.call_args_list
+        assert [call[0][1]["name"][1] for call in calls] == [
+            ["u0@x", "u1@x"], ["u2@x", "u3@x"], ["u4@x"]
+        ]
+        assert calls[0][0][2] == {"enabled": 0}
+        assert frappe.db.commit.call_count == 3
+        assert ["tenant", "=", "T1"] in users.queries[0]
+        assert ["name", ">", "u1@x"] in users.queries[1]
+        users.audit.assert_called_once_with("bulk_update", 5, {"enabled": 1}, "T1", {"enabled": 0})
+    
+    def test_update_where_rejects_unknown_fields(self, users):
+        """Test values are checked against the table's columns."""
+        with pytest.raises(frappe.ValidationError):
+            BaseRepository("User").update_where({}, {"password": "x"})
+        frappe.db.set_value.assert_not_called()
+    
+    def test_delete_where_removes_children_first(self, users):
+        """Test child rows and parents are deleted per chunk."""
+        count = BaseRepository("User").delete_where({"tenant": "T2"})
+        
+        assert count == 2
+        assert [call[0][0] for call in frappe.db.delete.call_args_list] == ["Has Role", "User"]
+        assert frappe.db.delete.call_args_list[0][0][1]["parenttype"] == "User"
+        users.audit.assert_called_once()
+    
+    def test_nothing_matched_writes_no_audit(self, users):
+        """Test an empty match issues no writes and no audit entry."""
+        assert BaseRepository("User").update_where({"tenant": "T9"}, {"enabled": 0}) == 0
+        users.audit.assert_not_called()
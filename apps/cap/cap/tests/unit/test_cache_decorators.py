@@ -0,0 +1,204 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_cache_decorators.py
+"""
+import pytest
+from unittest.mock import Mock, patch
+from cap.cache.cache_decorators import cached, cached_call, get_stampede_stats, _generate_cache_key
+"""Unit Tests for Cache Decorators"""
+
+
+
+class DictCache:
+    """Minimal in-memory stand-in for CacheManager."""
+
+    def __init__(self):
+        self.data = {}
+        self.locks = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value, ttl=300, tags=None, negative_ttl=None):
+        self.data[key] = value
+        return True
+
+    def acquire_lock(self, name, timeout_ms=10000):
+        if name in self.locks:
+            return None
+        self.locks[name] = "token"
+        return "token"
+
+    def release_lock(self, name, token):
+        return self.locks.pop(name, None) is not None
+
+
+class DictCacheView(DictCache):
+    """Shares storage with another DictCache but ignores its locks."""
+
+    def __init__(self, cache):
+        super().__init__()
+        self.data = cache.data
+
+
+class TestCachedDecorator:
+    """Test suite for @cached and cached_call."""
+
+    def test_cached_returns_stored_value(self):
+        """Test the wrapped function runs once per key."""
+        cache = DictCache()
+        func = Mock(return_value={"users": 3})
+
+        @cached(ttl=60, cache_manager=cache)
+        def get_stats(tenant):
+            return func(tenant)
+
+        assert get_stats("acme") == {"users": 3}
+        assert get_stats("acme") == {"users": 3}
+        func.assert_called_once_with("acme")
+
+    def test_single_flight_serves_stale_while_locked(self):
+        """Test contended workers serve the stale value instead of recomputing."""
+        cache = DictCache()
+        compute = Mock(return_value="fresh")
+
+        with patch("cap.cache.cache_decorators.time.time", return_value=1000.0):
+            cached_call(cache, "tenant:stats:acme", lambda: "old", ttl=10, stale_ttl=60)
+
+        # Another worker holds the recomputation lock
+        cache.acquire_lock("tenant:stats:acme")
+        before = get_stampede_stats()["stale_served"]
+
+        with patch("cap.cache.cache_decorators.time.time", return_value=1020.0):
+            value = cached_call(cache, "tenant:stats:acme", compute, ttl=10, stale_ttl=60)
+
+        assert value == "old"
+        compute.assert_not_called()
+        assert get_stampede_stats()["stale_served"] == before + 1
+
+    def test_single_flight_recomputes_expired_value(self):
+        """Test the lock holder recomputes an expired value."""
+        cache = DictCache()
+
+        with patch("cap.cache.cache_decorators.time.time", return_value=1000.0):
+            cached_call(cache, "key", lambda: "old", ttl=10, stale_ttl=60)
+
+        with patch("cap.cache.cache_decorators.time.time", return_value=1020.0):
+            value = cached_call(cache, "key", lambda: "new", ttl=10, stale_ttl=60)
+
+        assert value == "new"
+        assert cache.locks == {}
+
+    def test_contended_miss_waits_for_result(self):
+        """Test a worker without a stale value waits for the lock holder."""
+        cache = DictCache()
+        cache.acquire_lock("key")
+        compute = Mock(return_value="computed")
+
+        def publish_result(_):
+            cached_call(DictCacheView(cache), "key", lambda: "from holder", ttl=60)
+
+        with patch("cap.cache.cache_decorators.time.sleep", side_effect=publish_result):
+            value = cached_call(cache, "key", compute, ttl=60)
+
+        assert value == "from holder"
+        compute.assert_not_called()
+
+    def test_early_refresh(self):
+        """Test XFetch refreshes a value that is about to expire."""
+        cache = DictCache()
+
+        with patch("cap.cache.cache_decorators.time.time", return_value=1000.0):
+            cached_call(cache, "key", lambda: "old", ttl=10, single_flight=False)
+        cache.data["key"]["delta"] = 5.0
+
+        with patch("cap.cache.cache_decorators.time.time", return_value=1009.0), \
+                patch("cap.cache.cache_decorators.random.random", return_value=0.9):
+            value = cached_call(cache, "key", lambda: "new", ttl=10,
+                                single_flight=False, early_refresh_beta=1.0)
+
+        assert value == "new"
+
+    def test_none_result_is_cached(self):
+        """Test a None result is cached instead of recomputed on every call."""
+        cache = DictCache()
+        func = Mock(return_value=None)
+
+        @cached(ttl=60, cache_manager=cache)
+        def find_tenant(name):
+            return func(name)
+
+        assert find_tenant("ghost") is None
+        assert find_tenant("ghost") is None
+        func.assert_called_once_with("ghost")
+
+
+def _sample(*args, **kwargs):
+    return None
+
+
+class TestCacheKeys:
+    """Test suite for cache key generation."""
+
+    def test_key_layout(self):
+        """Test keys carry prefix, tenant namespace and a 64-bit digest."""
+        key = _generate_cache_key(_sample, ("acme",), {}, "policy")
+        prefix, namespace, func_name, digest = key.split(":")
+
+        assert prefix == "policy"
+        assert namespace == "-"
+        assert func_name.endswith("._sample")
+        assert len(digest) == 16
+
+    def test_argument_types_do_not_collide(self):
+        """Test values that stringify alike produce different keys."""
+        keys = {
+            _generate_cache_key(_sample, args, kwargs)
+            for args, kwargs in [
+                ((1,), {}), (("1",), {}), ((1.0,), {}), ((True,), {}), ((None,), {}),
+                (("None",), {}), (([1],), {}), (("[1]",), {}), (("a", "b"), {}),
+                (("a\x1fb",), {}), ((), {"x": 1}), ((), {"x": "1"})
+            ]
+        }
+        assert len(keys) == 12
+
+    def test_kwargs_order_is_irrelevant(self):
+        """Test keyword argument order does not change the key."""
+        assert _generate_cache_key(_sample, (), {"a": 1, "b": {"c": 2}}) == \
+            _generate_cache_key(_sample, (), {"b": {"c": 2}, "a": 1})
+
+    def test_tenant_namespace(self):
+        """Test the same call is cached separately per tenant."""
+        with patch("cap.cache.cache_decorators.frappe.local") as local:
+            local.tenant_id = "acme"
+            acme = _generate_cache_key(_sample, ("x",), {})
+            shared = _generate_cache_key(_sample, ("x",), {}, tenant_scoped=False)
+            local.tenant_id = "beta"
+            beta = _generate_cache_key(_sample, ("x",), {})
+
+        assert acme != beta
+        assert ":acme:" in acme and ":beta:" in beta
+        assert ":-:" in shared
+
+    def test_explicit_key_callable(self):
+        """Test key= replaces argument hashing."""
+        cache = DictCache()
+        func = Mock(return_value="stats")
+
+        @cached(ttl=60, key_prefix="stats", cache_manager=cache, key=lambda service, tenant: tenant)
+        def get_stats(service, tenant):
+            return func(tenant)
+
+        get_stats(object(), "acme")
+        get_stats(object(), "acme")
+
+        func.assert_called_once_with("acme")
+        [key] = cache.data
+        assert key.startswith("stats:-:") and key.endswith(".get_stats:acme")
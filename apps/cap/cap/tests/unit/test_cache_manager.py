@@ -10,6 +10,9 @@ SPDX-FileContributor: Raasid (AI Companion)
 Test module: test_cache_manager.py
 """
 import pytest
+import threading
+from unittest.mock import MagicMock, Mock, patch
+import frappe
 from cap.cache import CacheManager
 """Unit Tests for Cache Manager"""
 
@@ -120,3 +123,198 @@ class TestCacheManager:
         assert cache.get("key1") == "value1"
         assert cache.get("key2") == "value2"
         assert cache.get("key3") == "value3"
+    
+    def test_local_tier_serves_repeat_reads(self):
+        """Test repeat reads are served from the local (L1) tier."""
+        cache = CacheManager(use_redis=False)
+        cache.set("hot_key", {"name": "tenant_alpha"})
+        
+        before = cache.get_stats()["local"]["hits"]
+        assert cache.get("hot_key") == {"name": "tenant_alpha"}
+        assert cache.get_stats()["local"]["hits"] == before + 1
+    
+    def test_delete_drops_local_entry(self):
+        """Test delete removes the key from the local tier too."""
+        cache = CacheManager(use_redis=False)
+        cache.set("hot_key", "value")
+        cache.get("hot_key")
+        
+        cache.delete("hot_key")
+        assert cache.get("hot_key") is None
+    
+    def test_get_many_single_round_trip(self):
+        """Test get_many issues one MGET against Redis."""
+        cache = CacheManager(use_redis=False, use_local=False)
+        cache.use_redis = True
+        cache.redis_client = MagicMock()
+        cache.redis_client.mget.return_value = ['"value1"', None, '0']
+        
+        results = cache.get_many(["key1", "key2", "key3"])
+        
+        assert results == {"key1": "value1", "key3": 0}
+        cache.redis_client.mget.assert_called_once_with(["key1", "key2", "key3"])
+        cache.redis_client.get.assert_not_called()
+    
+    def test_set_many_reports_partial_failure(self):
+        """Test set_many pipelines writes and reports failed keys."""
+        cache = CacheManager(use_redis=False, use_local=False)
+        cache.use_redis = True
+        cache.redis_client = MagicMock()
+        pipe = cache.redis_client.pipeline.return_value
+        pipe.execute.return_value = [True, ConnectionError("boom")]
+        
+        failed = cache.set_many({"key1": "value1", "key2": "value2"}, ttl=60, return_failed=True)
+        
+        assert failed == ["key2"]
+        assert pipe.setex.call_count == 2
+        pipe.execute.assert_called_once()
+    
+    def test_delete_pattern(self):
+        """Test pattern deletion on the Frappe cache fallback."""
+        cache = CacheManager(use_redis=False)
+        cache.set("user:1", "a")
+        cache.set("user:2", "b")
+        cache.set("tenant:1", "c")
+        
+        assert cache.delete_pattern("user:*") == 2
+        assert cache.get("user:1") is None
+        assert cache.get("tenant:1") == "c"
+    
+    def test_delete_pattern_never_uses_keys(self):
+        """Test pattern deletion scans incrementally instead of KEYS."""
+        cache = CacheManager(use_redis=False, use_local=False)
+        cache.use_redis = True
+        cache.redis_client = MagicMock()
+        cache.redis_client.scan_iter.return_value = iter(["user:1", "user:2", "user:3"])
+        cache.redis_client.unlink.side_effect = lambda *keys: len(keys)
+        
+        assert cache.delete_pattern("user:*", batch_size=2) == 3
+        cache.redis_client.keys.assert_not_called()
+        assert cache.redis_client.unlink.call_count == 2
+    
+    def test_delete_pattern_drops_local_entries_after_redis(self):
+        """Test L1 is cleared and the invalidation broadcast only after the Redis keys are gone."""
+        cache = CacheManager(use_redis=False)
+        cache.use_redis = True
+        cache.redis_client = MagicMock()
+        cache.redis_client.scan_iter.return_value = iter(["user:1"])
+        cache.redis_client.unlink.side_effect = lambda *keys: calls.append("unlink") or len(keys)
+        calls = []
+        
+        with patch.object(cache.local, "delete_pattern", side_effect=lambda pattern: calls.append("local")), \
+                patch.object(cache, "_publish", side_effect=lambda **kwargs: calls.append("publish")):
+            cache.delete_pattern("user:*")
+        
+        assert calls == ["unlink", "local", "publish"]
+    
+    def test_invalidate_tags(self):
+        """Test tag invalidation removes only the tagged keys."""
+        cache = CacheManager(use_redis=False)
+        cache.set("tenant:acme", {"name": "acme"}, tags=["tenant:acme"])
+        cache.set("tenant:stats:acme", {"users": 3}, tags=["tenant:acme"])
+        cache.set("tenant:beta", {"name": "beta"}, tags=["tenant:beta"])
+        
+        assert cache.invalidate_tags("tenant:acme") == 2
+        assert cache.get("tenant:acme") is None
+        assert cache.get("tenant:stats:acme") is None
+        assert cache.get("tenant:beta") == {"name": "beta"}
+    
+    def test_set_many_tags(self):
+        """Test keys written by set_many are removed by their tag."""
+        cache = CacheManager(use_redis=False)
+        cache.set_many({"permission:jane:Policy:read:all": True, "permission:jane:Policy:write:all": False},
+                       tags=["user:jane"])
+        cache.set("permission:joe:Policy:read:all", True, tags=["user:joe"])
+        
+        assert cache.invalidate_tags("user:jane") == 2
+        assert cache.get("permission:jane:Policy:read:all") is None
+        assert cache.get("permission:joe:Policy:read:all") is True
+    
+    def test_falsy_values_are_cached(self):
+        """Test falsy values are returned as hits."""
+        cache = CacheManager(use_redis=False, use_local=False)
+        
+        for key, value in {"zero": 0, "empty": [], "false": False, "blank": ""}.items():
+            cache.set(key, value)
+            assert cache.get(key, default="miss") == value
+    
+    def test_negative_result_is_distinct_from_miss(self):
+        """Test a cached None is told apart from an absent key."""
+        from cap.cache import MISSING
+        
+        cache = CacheManager(use_redis=False)
+        cache.set_negative("tenant:ghost")
+        
+        assert cache.get("tenant:ghost", MISSING) is None
+        assert cache.get("tenant:unknown", MISSING) is MISSING
+        assert cache.get_many(["tenant:ghost"]) == {"tenant:ghost": None}
+    
+    def test_construction_does_not_connect(self):
+        """Test creating a manager performs no Redis I/O."""
+        with patch("cap.cache.cache_manager._create_redis_client") as create:
+            CacheManager()
+            CacheManager(use_local=False)
+        
+        create.assert_not_called()
+    
+    def test_unreachable_redis_is_retried_lazily(self):
+        """Test a failed connection is not retried on every call."""
+        from cap.cache import cache_manager
+        
+        client = MagicMock()
+        client.ping.side_effect = ConnectionError("refused")
+        
+        with patch.dict(cache_manager._redis_state, pid=None), \
+                patch("cap.cache.cache_manager._create_redis_client", return_value=client):
+            assert cache_manager.get_redis_client() is None
+            assert cache_manager.get_redis_client() is None
+        
+        client.ping.assert_called_once()
+    
+    def test_pool_is_recreated_after_fork(self):
+        """Test a client inherited from the parent process is not reused."""
+        from cap.cache import cache_manager
+        
+        inherited, fresh = MagicMock(), MagicMock()
+        
+        with patch.dict(cache_manager._redis_state, pid=-1, client=inherited, healthy=True), \
+                patch("cap.cache.cache_manager._create_redis_client", return_value=fresh):
+            assert cache_manager.get_redis_client() is fresh
+    
+    def test_forked_worker_starts_its_own_listener(self):
+        """Test an L1 read starts a listener when the running one belongs to the parent process."""
+        from cap.cache import invalidation
+        
+        parent = Mock(pid=-1)
+        parent.is_alive.return_value = True
+        with patch.object(invalidation, "_listener", parent), \
+                patch.object(invalidation, "InvalidationListener") as listener:
+            cache = CacheManager(use_redis=False)
+            listener.reset_mock()
+            invalidation._listener = parent
+            cache.get("missing")
+        
+        listener.return_value.start.assert_called_once()
+    
+    def test_listener_client_needs_no_site_context(self):
+        """Test the invalidation listener's client factory works in a thread without site config."""
+        from cap.cache import cache_manager
+        
+        class Unbound:
+            def get(self, key, default=None):
+                raise RuntimeError("no site context")
+        
+        client, results = MagicMock(), []
+        with patch.object(cache_manager, "ensure_listener") as ensure_listener, \
+                patch.object(cache_manager, "_redis_importable", True):
+            CacheManager()
+        factory = ensure_listener.call_args[0][0]
+        
+        with patch.object(frappe, "conf", Unbound()), \
+                patch.dict(cache_manager._redis_state, pid=None), \
+                patch("cap.cache.cache_manager._create_redis_client", return_value=client):
+            thread = threading.Thread(target=lambda: results.append(factory()))
+            thread.start()
+            thread.join()
+        
+        assert results == [client]
@@ -0,0 +1,224 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_content_hashing.py
+"""
+import hashlib
+import io
+import os
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import frappe
+from cap.custody import content
+"""Unit Tests for Evidence Content Hashing"""
+
+
+
+@pytest.fixture
+def site(tmp_path):
+    db = Mock()
+    # No Content Blob registered and no other File sharing the content yet
+    db.get_value.return_value = None
+    
+    def get_files_path(*path, is_private=False):
+        return str(tmp_path.joinpath("private" if is_private else "public", "files", *path))
+    
+    def write(file_url, data):
+        path = content.file_path(file_url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+    
+    with patch.object(frappe, "db", db, create=True), \
+            patch.object(frappe, "get_doc", Mock(), create=True), \
+            patch.object(frappe, "conf", frappe._dict(cap_inline_hash_limit=64), create=True), \
+            patch.object(frappe, "log_error", Mock(), create=True), \
+            patch.object(content, "get_files_path", get_files_path), \
+            patch.object(content, "enqueue") as enqueue:
+        yield SimpleNamespace(db=db, write=write, enqueue=enqueue)
+
+
+def registered(digest):
+    """get_value side effect for content already stored as a Content Blob."""
+    return lambda doctype, *args, **kwargs: digest["sha256"] if doctype == "Content Blob" else "m" * 32
+
+
+def make_evidence(rows, tenant="T1", text="observed", before=None):
+    """Evidence stand-in with attachment rows."""
+    doc = frappe._dict(name="EV-1", tenant=tenant, content=text,
+                       attachments=[frappe._dict(row, name=f"ROW-{i}") for i, row in enumerate(rows)])
+    doc.get_doc_before_save = lambda: before
+    return doc
+
+
+class TestHashStream:
+    """Test suite for chunked hashing."""
+    
+    def test_matches_whole_digest(self):
+        """Test chunk boundaries don't change the digest."""
+        data = os.urandom(1000)
+        
+        digest = content.hash_stream(io.BytesIO(data), chunk_size=7)
+        
+        assert digest == {"sha256": hashlib.sha256(data).hexdigest(), "size": 1000, "prehash": None}
+    
+    def test_prehash_in_same_pass(self):
+        """Test the pre-hash covers the same bytes."""
+        data = os.urandom(300)
+        expected = content.new_prehash()
+        expected.update(data)
+        
+        digest = content.hash_stream(io.BytesIO(data), prehash=True, chunk_size=64)
+        
+        assert digest["prehash"] == expected.hexdigest()
+    
+    def test_hash_file(self, tmp_path):
+        """Test files are hashed from disk."""
+        path = tmp_path / "blob.bin"
+        path.write_bytes(b"x" * 5000)
+        
+        assert content.hash_file(str(path))["sha256"] == hashlib.sha256(b"x" * 5000).hexdigest()
+    
+    def test_evidence_hash_per_tenant(self):
+        """Test identical content gives each tenant a different evidence hash."""
+        attachments = ["a" * 64]
+        
+        assert content.evidence_content_hash("T1", None, attachments) != \
+            content.evidence_content_hash("T2", None, attachments)
+
+
+class TestStoreBlob:
+    """Test suite for content-addressed storage."""
+    
+    def test_first_copy_stored_at_blob_path(self, site):
+        """Test new content is stored under its SHA-256 and registered, keeping the uploaded path."""
+        uploaded = site.write("/private/files/a.pdf", b"report")
+        digest = content.hash_file(uploaded)
+        url = f"/private/files/blobs/{digest['sha256']}"
+        
+        assert content.store_blob(digest, "/private/files/a.pdf") == url
+        assert frappe.get_doc.call_args.args[0]["file_url"] == url
+        site.db.set_value.assert_called_once_with("File", {"file_url": "/private/files/a.pdf"}, {"file_url": url},
+                                                  update_modified=False)
+        assert os.path.samefile(uploaded, content.file_path(url))
+    
+    def test_duplicate_gets_the_same_neutral_url(self, site):
+        """Test another tenant's identical upload can't tell the content was stored before."""
+        site.write("/private/files/a.pdf", b"report")
+        duplicate = site.write("/private/files/b.pdf", b"report")
+        digest = content.hash_file(duplicate)
+        first = content.store_blob(digest, "/private/files/a.pdf")
+        site.db.get_value.side_effect = registered(digest)
+        
+        assert content.store_blob(digest, "/private/files/b.pdf") == first
+        
+        site.db.set_value.assert_called_with("File", {"file_url": "/private/files/b.pdf"},
+                                             {"file_url": first, "content_hash": "m" * 32}, update_modified=False)
+        frappe.get_doc.assert_called_once()
+        assert "a.pdf" not in first
+        # Other references to the old URL keep working, on the shared bytes
+        assert os.path.samefile(duplicate, content.file_path(first))
+    
+    def test_public_files_not_shared(self, site):
+        """Test public files keep their own copy and URL."""
+        site.write("/files/b.pdf", b"report")
+        digest = content.hash_file(content.file_path("/files/b.pdf"))
+        
+        assert content.store_blob(digest, "/files/b.pdf") == "/files/b.pdf"
+        frappe.get_doc.assert_not_called()
+        site.db.set_value.assert_not_called()
+    
+    def test_missing_stored_copy_replaced(self, site):
+        """Test a blob whose file is gone is stored again from the new copy."""
+        digest = content.hash_file(site.write("/private/files/b.pdf", b"report"))
+        url = f"/private/files/blobs/{digest['sha256']}"
+        site.db.get_value.side_effect = registered(digest)
+        
+        assert content.store_blob(digest, "/private/files/b.pdf") == url
+        assert os.path.exists(content.file_path(url))
+        frappe.get_doc.assert_not_called()
+
+
+class TestEvidenceHooks:
+    """Test suite for the Evidence save hook and background job."""
+    
+    def test_small_attachment_hashed_inline(self, site):
+        """Test attachments under the limit are hashed during save."""
+        site.write("/private/files/a.txt", b"small")
+        doc = make_evidence([{"file_url": "/private/files/a.txt"}])
+        
+        content.set_content_hash(doc)
+        
+        row = doc.attachments[0]
+        assert row.content_hash == hashlib.sha256(b"small").hexdigest()
+        assert doc.content_hash == content.evidence_content_hash(
+            "T1", hashlib.sha256(b"observed").hexdigest(), [row.content_hash]
+        )
+        assert doc.content_size == len(b"observed") + 5
+        site.enqueue.assert_not_called()
+    
+    def test_large_attachment_deferred(self, site):
+        """Test attachments over the limit are left to the background job."""
+        site.write("/private/files/big.bin", b"x" * 65)
+        doc = make_evidence([{"file_url": "/private/files/big.bin"}])
+        
+        content.set_content_hash(doc)
+        
+        assert doc.content_hash is None and doc.attachments[0].content_hash is None
+        assert site.enqueue.call_args[1]["evidence"] == "EV-1"
+    
+    def test_pending_edit_keeps_previous_hash(self, site):
+        """Test an Evidence keeps its last complete hash while a new attachment is hashed."""
+        site.write("/private/files/big.bin", b"x" * 65)
+        before = make_evidence([])
+        before.content_hash, before.content_size = "c" * 64, 8
+        doc = make_evidence([{"file_url": "/private/files/big.bin"}], before=before)
+        
+        content.set_content_hash(doc)
+        
+        assert (doc.content_hash, doc.content_size) == ("c" * 64, 8)
+        assert doc.attachments[0].content_hash is None
+    
+    def test_missing_file_does_not_block_save(self, site):
+        """Test an attachment whose file is gone is logged and left unhashed."""
+        doc = make_evidence([{"file_url": "/private/files/gone.pdf"}])
+        
+        content.set_content_hash(doc)
+        
+        assert doc.attachments[0].content_hash is None
+        frappe.log_error.assert_called_once()
+    
+    def test_unchanged_attachment_not_rehashed(self, site):
+        """Test rows hashed on an earlier save are not read again."""
+        row = {"file_url": "/private/files/a.txt", "content_hash": "c" * 64, "file_size": 5}
+        before = make_evidence([row])
+        
+        with patch.object(content, "hash_file") as hash_file:
+            content.set_content_hash(make_evidence([row], before=before))
+        
+        hash_file.assert_not_called()
+    
+    def test_background_job(self, site):
+        """Test the job hashes pending rows and stores the evidence hash."""
+        site.write("/private/files/big.bin", b"x" * 65)
+        doc = make_evidence([{"file_url": "/private/files/big.bin"}])
+        
+        get_doc = frappe.get_doc
+        with patch.object(frappe, "get_doc", lambda *args: doc if args[0] == "Evidence" else get_doc(*args)), \
+                patch.object(frappe, "get_all", Mock(return_value=["CH-1", "CH-1"]), create=True), \
+                patch.object(content, "link_chain") as link_chain:
+            content.hash_evidence_content("EV-1")
+        
+        values = {call.args[:2]: call.args[2] for call in site.db.set_value.call_args_list
+                  if call.args[0] in ("Evidence", "Evidence Attachment")}
+        assert values[("Evidence Attachment", "ROW-0")]["content_hash"] == hashlib.sha256(b"x" * 65).hexdigest()
+        assert values[("Evidence", "EV-1")]["content_size"] == len(b"observed") + 65
+        link_chain.assert_called_once_with("CH-1")
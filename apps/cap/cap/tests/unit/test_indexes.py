@@ -0,0 +1,68 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_indexes.py
+"""
+import pytest
+from unittest.mock import Mock, patch
+import frappe
+from cap.setup import indexes
+"""Unit Tests for Composite Index Setup"""
+
+
+
+@pytest.fixture
+def db():
+    db = Mock(db_type="mariadb")
+    db.table_exists.return_value = True
+    db.has_column.side_effect = lambda doctype, column: not (doctype == "User" and column == "tenant")
+    with patch.object(frappe, "db", db, create=True):
+        yield db
+
+
+class TestIndexes:
+    """Test suite for ensure_indexes and verify_indexes."""
+    
+    def test_ensure_creates_named_indexes_and_skips_missing_columns(self, db):
+        """Test each index is added once by name; absent columns are skipped."""
+        created = indexes.ensure_indexes()
+        
+        db.add_index.assert_any_call("Ledger Event", ["tenant", "timestamp"], "cap_tenant_timestamp_index")
+        assert "Message: cap_chat_session_creation_index" in created
+        assert not any(label.startswith("User:") for label in created)
+    
+    def test_verify_flags_full_scans(self, db):
+        """Test shapes whose plan is type ALL are reported."""
+        explained = []
+        
+        def explain(query, values=None, as_dict=False):
+            if query.startswith("SHOW INDEX"):
+                if "`tabViolation`" in query:
+                    return [{"Key_name": "PRIMARY"}]
+                return [{"Key_name": "PRIMARY"}, {"Key_name": "cap_index"}, {"Key_name": "cap_index"}]
+            explained.append(query)
+            scan = "ALL" if "`tabViolation`" in query else "ref"
+            return [{"table": "t", "type": scan, "key": None if scan == "ALL" else "cap_index"}]
+        db.sql.side_effect = explain
+        
+        results = indexes.verify_indexes()
+        
+        assert [result["doctype"] for result in results if not result["ok"]] == ["Violation"]
+        assert "User" not in {result["doctype"] for result in results}
+        assert "`tabPolicy` FORCE INDEX (`cap_index`) WHERE" in next(q for q in explained if "`tabPolicy`" in q)
+        assert "FORCE INDEX" not in next(q for q in explained if "`tabViolation`" in q)
+    
+    def test_postgres_seq_scan_detection(self):
+        """Test Seq Scans nested anywhere in a JSON plan are found."""
+        plan = [{"Plan": {"Node Type": "Limit", "Plans": [
+            {"Node Type": "Sort", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "tabPolicy"}]}
+        ]}}]
+        
+        assert indexes._postgres_full_scans(plan) == ["tabPolicy"]
+        assert indexes._postgres_full_scans([{"Plan": {"Node Type": "Index Scan"}}]) == []
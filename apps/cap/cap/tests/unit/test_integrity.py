@@ -0,0 +1,349 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_integrity.py
+"""
+import json
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import frappe
+from cap.compliance import engine, integrity
+from cap.repositories.base_repository import BaseRepository
+from cap.tests.fixtures.ledger import make_chain
+"""Unit Tests for the Integrity Scanner"""
+
+
+
+def make_items(count, chain="CH-1"):
+    """Chained Evidence Chain Items and their Evidence content hashes."""
+    items, contents, previous = [], {}, None
+    for sequence in range(1, count + 1):
+        contents[f"EV-{sequence}"] = f"{sequence:064x}"
+        item = frappe._dict(name=f"ITEM-{sequence}", parent=chain, sequence_number=sequence,
+                            evidence=f"EV-{sequence}", hash_before=previous)
+        item.hash_current = previous = integrity.chain_item_hash(
+            previous, dict(item, content_hash=contents[item.evidence])
+        )
+        items.append(item)
+    return items, contents
+
+
+def item_flags(db):
+    """integrity_check flags written per Evidence Chain Item."""
+    return {item: call.args[3] for call in db.set_value.call_args_list
+            if call.args[0] == "Evidence Chain Item" for item in call.args[1]["name"][1]}
+
+
+@pytest.fixture
+def store():
+    ledger = make_chain(9)
+    items, contents = make_items(7)
+    store = SimpleNamespace(ledger=ledger, items=items, contents=contents, checkpoints={}, scans={}, db=Mock(),
+                            chain=frappe._dict(master_hash=None, alert_on_integrity_failure=1))
+    head = frappe._dict(last_sequence=len(ledger), last_hash=ledger[-1].current_hash)
+    
+    def get_value(doctype, name, fields=None, as_dict=False):
+        if doctype == "Integrity Scan Checkpoint":
+            return frappe._dict(store.checkpoints[name]) if name in store.checkpoints else None
+        if doctype == "Integrity Scan":
+            return next((key for key, scan in store.scans.items() if scan["status"] == "Running"), None)
+        if doctype == "Ledger Chain Head":
+            return head
+        return store.chain
+    
+    def set_value(doctype, name, values, value=None, update_modified=True):
+        if doctype == "Integrity Scan":
+            store.scans[name].update(values)
+        elif doctype == "Integrity Scan Checkpoint":
+            store.checkpoints[name].update(values)
+    
+    def get_doc(doc):
+        record = frappe._dict(doc)
+        if doc["doctype"] == "Integrity Scan":
+            record.name = f"SCAN-{len(store.scans) + 1}"
+            record.insert = lambda **kwargs: store.scans.setdefault(record.name, record)
+        else:
+            record.insert = lambda **kwargs: store.checkpoints.setdefault(doc["shard"], dict(doc, name=doc["shard"]))
+        return record
+    
+    def get_all(doctype, filters=None, fields=None, as_list=False):
+        return [(name, store.contents.get(name)) for name in filters[0][2]]
+    
+    def iter_all(doctype, filters):
+        if doctype == "Ledger Chain Head":
+            return iter([{"name": "T1", "tenant": "T1"}])
+        if doctype == "Evidence Chain":
+            return iter([{"name": "CH-1"}])
+        rows = store.ledger if doctype == "Ledger Event" else store.items
+        key = "sequence" if doctype == "Ledger Event" else "sequence_number"
+        after = next((value for field, op, value in filters if field == key), 0)
+        return iter([frappe._dict(row) for row in rows if row[key] > after])
+    
+    store.db.get_value.side_effect = get_value
+    store.db.set_value.side_effect = set_value
+    store.db.exists.side_effect = lambda doctype, filters: any(row.sequence == filters["sequence"] for row in ledger)
+    # No earlier sweep finished; per-sweep totals are summed by the database
+    store.db.sql.return_value = [(None, 0, 0)]
+    store.iter_all = iter_all
+    
+    with patch.object(frappe, "db", store.db, create=True), \
+            patch.object(frappe, "get_doc", get_doc, create=True), \
+            patch.object(frappe, "get_all", get_all, create=True), \
+            patch.object(frappe, "log_error", Mock(), create=True), \
+            patch.object(frappe, "publish_realtime", Mock(), create=True), \
+            patch.object(frappe, "conf", frappe._dict(), create=True), \
+            patch.object(BaseRepository, "iter_all",
+                         lambda self, filters=None, **kwargs: store.iter_all(self.doctype, filters or [])), \
+            patch.object(integrity, "SCAN_BATCH_SIZE", 3):
+        yield store
+
+
+class TestChainItems:
+    """Test suite for Evidence Chain Item verification."""
+    
+    def test_valid_items(self):
+        """Test an untouched chain has no failures."""
+        items, contents = make_items(5)
+        rows = [dict(item, content_hash=contents[item.evidence]) for item in items]
+        
+        assert integrity.verify_chain_items(None, rows) == (5, [])
+    
+    def test_changed_evidence_content(self):
+        """Test evidence edited after it was chained fails its item only."""
+        items, contents = make_items(5)
+        rows = [dict(item, content_hash=contents[item.evidence]) for item in items]
+        rows[2]["content_hash"] = "f" * 64
+        
+        checked, failures = integrity.verify_chain_items(None, rows)
+        
+        assert [failure["item"] for failure in failures] == ["ITEM-3"]
+    
+    def test_removed_item_breaks_link(self):
+        """Test a deleted item shows up as a broken hash_before link."""
+        items, contents = make_items(5)
+        rows = [dict(item, content_hash=contents[item.evidence]) for item in items]
+        del rows[1]
+        
+        checked, failures = integrity.verify_chain_items(None, rows)
+        
+        assert failures[0]["item"] == "ITEM-3"
+        assert "hash_before does not match the preceding item" in failures[0]["problems"]
+    
+    
+    def test_unlinked_items_skipped(self):
+        """Test items never linked are neither checked nor failed."""
+        items, contents = make_items(5)
+        rows = [dict(item, content_hash=contents[item.evidence]) for item in items]
+        rows.insert(0, dict(name="ITEM-0", sequence_number=0, evidence="EV-0", hash_before=None, hash_current=None,
+                            content_hash=None))
+        
+        assert integrity.verify_chain_items(None, rows) == (5, [])
+
+
+class TestLinkChainItems:
+    """Test suite for linking Evidence Chain Items."""
+    
+    @staticmethod
+    def make_chain(contents):
+        items = [frappe._dict(name=f"ITEM-{i}", sequence_number=None, evidence=evidence, hash_before=None,
+                              hash_current=None) for i, evidence in enumerate(contents, 1)]
+        return frappe._dict(name="CH-1", master_hash=None, evidence_table=items)
+    
+    @staticmethod
+    def get_all(contents):
+        return lambda doctype, filters=None, fields=None, as_list=False: [
+            (name, contents.get(name)) for name in filters[0][2]
+        ]
+    
+    def test_new_items_pass_the_scan(self):
+        """Test linked items verify and master_hash follows the last one."""
+        contents = {"EV-1": "a" * 64, "EV-2": "b" * 64, "EV-3": "c" * 64}
+        doc = self.make_chain(contents)
+        
+        with patch.object(frappe, "get_all", self.get_all(contents), create=True):
+            integrity.link_chain_items(doc)
+        
+        rows = [dict(item, content_hash=contents[item.evidence]) for item in doc.evidence_table]
+        assert [row["sequence_number"] for row in rows] == [1, 2, 3]
+        assert integrity.verify_chain_items(None, rows) == (3, [])
+        assert doc.master_hash == rows[-1]["hash_current"]
+    
+    def test_items_are_linked_in_sequence_order(self):
+        """Test rows reordered in the table still link in the order the scanner verifies them."""
+        contents = {"EV-1": "a" * 64, "EV-2": "b" * 64, "EV-3": "c" * 64}
+        doc = self.make_chain(contents)
+        for item, sequence in zip(doc.evidence_table, (2, 1, None)):
+            item.sequence_number = sequence
+        
+        with patch.object(frappe, "get_all", self.get_all(contents), create=True):
+            integrity.link_chain_items(doc)
+        
+        rows = sorted((dict(item, content_hash=contents[item.evidence]) for item in doc.evidence_table),
+                      key=lambda row: row["sequence_number"])
+        assert [row["evidence"] for row in rows] == ["EV-2", "EV-1", "EV-3"]
+        assert integrity.verify_chain_items(None, rows) == (3, [])
+        assert doc.master_hash == rows[-1]["hash_current"]
+    
+    def test_linked_items_keep_their_hashes(self):
+        """Test re-saving a chain doesn't re-link an item whose evidence changed."""
+        contents = {"EV-1": "a" * 64, "EV-2": "b" * 64}
+        doc = self.make_chain(contents)
+        with patch.object(frappe, "get_all", self.get_all(contents), create=True):
+            integrity.link_chain_items(doc)
+            contents["EV-1"] = "f" * 64
+            integrity.link_chain_items(doc)
+        
+        rows = [dict(item, content_hash=contents[item.evidence]) for item in doc.evidence_table]
+        assert [failure["item"] for failure in integrity.verify_chain_items(None, rows)[1]] == ["ITEM-1"]
+    
+    def test_stops_at_unhashed_evidence(self):
+        """Test items wait behind one whose Evidence isn't hashed yet."""
+        contents = {"EV-1": "a" * 64, "EV-2": None, "EV-3": "c" * 64}
+        doc = self.make_chain(contents)
+        
+        with patch.object(frappe, "get_all", self.get_all(contents), create=True):
+            integrity.link_chain_items(doc)
+            
+            assert [bool(item.hash_current) for item in doc.evidence_table] == [True, False, False]
+            
+            contents["EV-2"] = "b" * 64
+            integrity.link_chain_items(doc)
+        
+        rows = [dict(item, content_hash=contents[item.evidence]) for item in doc.evidence_table]
+        assert integrity.verify_chain_items(None, rows) == (3, [])
+
+
+class TestScanShard:
+    """Test suite for checkpointed shard scans."""
+    
+    def test_ledger_shard(self, store):
+        """Test a ledger chain is verified to its head and checkpointed."""
+        assert integrity.scan_shard("SCAN-1", integrity.LEDGER_SHARD, "T1")
+        
+        checkpoint = store.checkpoints["Ledger:T1"]
+        assert checkpoint["status"] == "Completed"
+        assert (checkpoint["position"], checkpoint["checked"], checkpoint["failed"]) == (9, 9, 0)
+        assert checkpoint["last_hash"] == store.ledger[-1].current_hash
+    
+    def test_ledger_tampering_reported(self, store):
+        """Test an edited event and a removed tail are both reported."""
+        store.ledger[4].event_data = '{"edited":1}'
+        store.ledger.pop()
+        
+        integrity.scan_shard("SCAN-1", integrity.LEDGER_SHARD, "T1")
+        
+        failures = json.loads(store.checkpoints["Ledger:T1"]["failures"])
+        assert [failure["sequence"] for failure in failures] == [5, 8]
+        assert failures[1]["problems"] == ["chain ends at 8 but its head is at 9"]
+    
+    def test_killed_scan_resumes(self, store):
+        """Test a shard interrupted mid-chain continues from its checkpoint."""
+        real_iter_all = store.iter_all
+        calls = []
+        
+        def dying_iter_all(doctype, filters):
+            calls.append(filters)
+            rows = real_iter_all(doctype, filters)
+            if len(calls) == 1:
+                def die():
+                    yield from [next(rows) for _ in range(4)]
+                    raise RuntimeError("worker killed")
+                return die()
+            return rows
+        
+        store.iter_all = dying_iter_all
+        assert not integrity.scan_shard("SCAN-1", integrity.LEDGER_SHARD, "T1")
+        assert store.checkpoints["Ledger:T1"]["position"] == 3
+        
+        assert integrity.scan_shard("SCAN-1", integrity.LEDGER_SHARD, "T1")
+        
+        assert calls[1][-1] == ["sequence", ">", 3]
+        assert store.checkpoints["Ledger:T1"]["checked"] == 9
+        assert store.checkpoints["Ledger:T1"]["failed"] == 0
+    
+    def test_checkpoint_from_earlier_scan_resets(self, store):
+        """Test a new sweep rescans a chain completed by the previous one."""
+        integrity.scan_shard("SCAN-1", integrity.LEDGER_SHARD, "T1")
+        
+        integrity.scan_shard("SCAN-2", integrity.LEDGER_SHARD, "T1")
+        
+        checkpoint = store.checkpoints["Ledger:T1"]
+        assert (checkpoint["integrity_scan"], checkpoint["checked"]) == ("SCAN-2", 9)
+    
+    def test_evidence_chain_shard(self, store):
+        """Test chain status, score and item flags are written."""
+        store.contents["EV-2"] = "e" * 64
+        
+        integrity.scan_shard("SCAN-1", integrity.CHAIN_SHARD, "CH-1")
+        
+        status, score, failed = store.db.sql.call_args.args[1][:3]
+        assert (status, score, failed) == ("Compromised", round(600 / 7, 2), 1)
+        assert item_flags(store.db)["ITEM-2"] == 0 and item_flags(store.db)["ITEM-3"] == 1
+        frappe.publish_realtime.assert_called_once()
+    
+    def test_intact_chain(self, store):
+        """Test an untouched chain matching its master_hash is Intact."""
+        store.chain.master_hash = store.items[-1].hash_current
+        
+        integrity.scan_shard("SCAN-1", integrity.CHAIN_SHARD, "CH-1")
+        
+        assert store.db.sql.call_args.args[1][:3] == ("Intact", 100.0, 0)
+        frappe.publish_realtime.assert_not_called()
+    
+    
+    def test_unlinked_chain_is_unknown(self, store):
+        """Test a chain stored before items were linked isn't marked Compromised."""
+        for item in store.items:
+            item.hash_before = item.hash_current = None
+        
+        integrity.scan_shard("SCAN-1", integrity.CHAIN_SHARD, "CH-1")
+        
+        assert store.db.sql.call_args.args[1][:3] == ("Unknown", 100.0, 0)
+        assert item_flags(store.db) == {}
+
+
+class TestRunIntegrityScan:
+    """Test suite for sweeps."""
+    
+    def test_sweep_completes(self, store):
+        """Test every shard is scanned and totals recorded."""
+        scan = integrity.run_integrity_scan(workers=1)
+        
+        assert store.scans[scan]["status"] == "Completed"
+        assert {name: checkpoint["checked"] for name, checkpoint in store.checkpoints.items()} == \
+            {"Ledger:T1": 9, "Evidence Chain:CH-1": 7}
+        assert store.db.sql.call_args.args[1] == (scan,)
+    
+    def test_not_due(self, store):
+        """Test no sweep starts within the interval after the last one."""
+        store.db.sql.return_value = [(datetime.now(),)]
+        
+        assert integrity.run_integrity_scan(workers=1) is None
+    
+    def test_resumes_running_sweep(self, store):
+        """Test completed shards of an interrupted sweep are not rescanned."""
+        store.scans["SCAN-7"] = {"status": "Running"}
+        integrity.scan_shard("SCAN-7", integrity.LEDGER_SHARD, "T1")
+        store.ledger[0].event_data = '{"edited":1}'
+        
+        assert integrity.run_integrity_scan(workers=1) == "SCAN-7"
+        
+        assert store.checkpoints["Ledger:T1"]["failed"] == 0
+        assert store.scans["SCAN-7"]["status"] == "Completed"
+    
+    def test_scheduled_scan_is_deduplicated(self):
+        """Test the scheduler enqueues the sweep under one job id, skipped while it is pending."""
+        with patch.object(engine, "enqueue") as enqueue:
+            engine.run_scheduled_scans()
+        
+        kwargs = enqueue.call_args.kwargs
+        assert kwargs["job_id"] == "cap_integrity_scan"
+        assert kwargs["deduplicate"] is True
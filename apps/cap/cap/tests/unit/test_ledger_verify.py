@@ -0,0 +1,132 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_ledger_verify.py
+"""
+import pytest
+from unittest.mock import Mock, patch
+import frappe
+from cap.ledger import verify
+from cap.repositories.base_repository import BaseRepository
+from cap.tests.fixtures.ledger import make_chain
+"""Unit Tests for Ledger Verification"""
+
+
+
+@pytest.fixture
+def chain():
+    rows = make_chain(9)
+    by_name = {row.name: row for row in rows}
+    
+    def get_value(doctype, name, fields=None, as_dict=False):
+        if doctype == "Ledger Anchor":
+            return frappe._dict(name="ANC-1", merkle_root=rows[0].merkle_root)
+        if isinstance(name, dict):
+            return next((row.current_hash for row in rows if row.sequence == name["sequence"]), None)
+        return by_name.get(name)
+    
+    db = Mock()
+    db.get_value.side_effect = get_value
+    db.sql.return_value = [(1, len(rows))]
+    with patch.object(frappe, "db", db, create=True), \
+            patch.object(frappe, "has_permission", Mock(return_value=True), create=True), \
+            patch.object(BaseRepository, "iter_all", lambda self, **kwargs: iter(rows)):
+        yield rows
+
+
+class TestVerifyEvent:
+    """Test suite for single-event verification."""
+    
+    def test_valid_event(self, chain):
+        """Test hash, proof and anchor all check out."""
+        result = verify.verify_event(5)
+        
+        assert result["valid"] and result["hash_valid"] and result["proof_valid"] and result["anchored"]
+    
+    def test_tampered_event_data(self, chain):
+        """Test edited contents fail the hash check but not the proof."""
+        chain[4].event_data = '{"n":500}'
+        
+        result = verify.verify_event(5)
+        
+        assert not result["valid"]
+        assert result["hash_valid"] is False
+        assert result["proof_valid"] is True
+
+
+class TestVerifyRange:
+    """Test suite for streamed, parallel chain verification."""
+    
+    def test_intact_chain(self, chain):
+        """Test a clean chain verifies in the request."""
+        with patch.object(verify, "VERIFY_BATCH_SIZE", 2):
+            result = verify.verify_range("T1")
+        
+        assert result == {"tenant": "T1", "checked": 9, "failed": 0, "valid": True, "failures": []}
+    
+    def test_intact_chain_in_parallel_batches(self, chain):
+        """Test a queued range verifies across pool workers and reaches its user."""
+        with patch.object(verify, "VERIFY_BATCH_SIZE", 2), \
+                patch.object(frappe, "conf", frappe._dict(cap_verify_workers=2), create=True), \
+                patch.object(frappe, "publish_realtime", Mock(), create=True):
+            verify.run_verify_range("T1", 1, 9, workers=2, user="a@x")
+            
+            result = frappe.publish_realtime.call_args
+        
+        assert result[0] == ("ledger_verify_completed",
+                             {"tenant": "T1", "checked": 9, "failed": 0, "valid": True, "failures": []})
+        assert result[1]["user"] == "a@x"
+    
+    def test_broken_link_and_gap_are_reported(self, chain):
+        """Test a rewritten event and a deleted one are found."""
+        chain[2].current_hash = "f" * 64
+        del chain[6]
+        
+        with patch.object(verify, "VERIFY_BATCH_SIZE", 3):
+            result = verify.verify_range("T1")
+        
+        problems = {failure["sequence"]: failure["problems"] for failure in result["failures"]}
+        assert problems[3] == ["current_hash does not match the event contents",
+                               "Merkle proof does not lead to merkle_root"]
+        assert problems[4] == ["previous_hash does not match the preceding event"]
+        assert problems[8][0] == "sequence gap: expected 7"
+        assert result["checked"] == 8 and not result["valid"]
+    
+    def test_other_tenant_denied(self, chain):
+        """Test a user without access to the tenant can't verify its chain."""
+        def has_permission(doctype, ptype="read", doc=None, throw=False):
+            if doctype == "Tenant":
+                raise frappe.PermissionError
+            return True
+        
+        with patch.object(frappe, "has_permission", has_permission), \
+                pytest.raises(frappe.PermissionError):
+            verify.verify_range("T2")
+        
+        frappe.db.sql.assert_not_called()
+    
+    def test_large_range_is_queued(self, chain):
+        """Test a range over the inline limit goes to the long queue with capped workers."""
+        with patch.object(verify, "VERIFY_INLINE_EVENTS", 5), \
+                patch.object(frappe, "conf", frappe._dict(cap_verify_workers=3), create=True), \
+                patch.object(frappe, "session", frappe._dict(user="a@x"), create=True), \
+                patch.object(verify, "enqueue") as enqueue:
+            result = verify.verify_range("T1", workers=64)
+        
+        assert result == {"tenant": "T1", "queued": True, "first_sequence": 1, "last_sequence": 9}
+        assert enqueue.call_args[1]["queue"] == "long"
+        assert enqueue.call_args[1]["workers"] == 3
+    
+    def test_worker_count_is_capped(self):
+        """Test client-supplied pool sizes never exceed the configured limit."""
+        with patch.object(frappe, "conf", frappe._dict(cap_verify_workers=4), create=True):
+            assert verify._worker_count(1000) == 4
+            assert verify._worker_count(2) == 2
+            assert verify._worker_count(None) == 4
+            assert verify._worker_count(-5) == 1
@@ -0,0 +1,139 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_ledger_writer.py
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import Mock, patch
+import frappe
+from cap.ledger import writer
+from cap.repositories.base_repository import BaseRepository
+"""Unit Tests for the Ledger Writer"""
+
+
+
+class Callbacks:
+    """frappe.db.before_commit / after_rollback stand-in."""
+    
+    def __init__(self):
+        self.callbacks = []
+    
+    def add(self, callback):
+        self.callbacks.append(callback)
+    
+    def run(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+@pytest.fixture
+def db():
+    heads, events = {}, []
+    db = Mock(before_commit=Callbacks(), after_rollback=Callbacks(), heads=heads, events=events)
+    
+    def commit():
+        db.before_commit.run()
+        db.after_rollback.callbacks = []
+    
+    def rollback(save_point=None):
+        if not save_point:
+            db.before_commit.callbacks = []
+            db.after_rollback.run()
+    
+    db.commit.side_effect = commit
+    db.rollback.side_effect = rollback
+    # With the head lock patched, advancing the head is the only statement left
+    db.sql.side_effect = lambda query, values: heads.update({values[3]: (values[0], values[1])})
+    
+    frappe.local.cap_ledger_pending = None
+    with patch.object(frappe, "db", db, create=True), \
+            patch.object(writer, "_lock_chain_head", lambda tenant: heads.get(tenant, (0, writer.GENESIS_HASH))), \
+            patch.object(BaseRepository, "bulk_insert", lambda repo, rows, **kwargs: events.extend(rows)):
+        yield db
+
+
+def event(tenant, n):
+    return {"tenant": tenant, "event_type": "policy_created", "subject_doctype": "Policy",
+            "subject_name": f"POL-{n}", "event_data": {"n": n}, "timestamp": datetime(2025, 1, 1, 0, 0, n)}
+
+
+class TestLedgerWriter:
+    """Test suite for per-tenant chained group commit."""
+    
+    def test_commit_writes_per_tenant_chains(self, db):
+        """Test buffered events are sequenced and hash-linked per tenant on commit."""
+        for n, tenant in enumerate(["B", "A", "B", "A", "B"]):
+            writer.append_event(event(tenant, n))
+        assert db.events == []
+        
+        db.commit()
+        
+        assert [(e["tenant"], e["sequence"]) for e in db.events] == [
+            ("A", 1), ("A", 2), ("B", 1), ("B", 2), ("B", 3)
+        ]
+        chain_b = [e for e in db.events if e["tenant"] == "B"]
+        assert chain_b[0]["previous_hash"] == writer.GENESIS_HASH
+        for previous, current in zip(chain_b, chain_b[1:]):
+            assert current["previous_hash"] == previous["current_hash"]
+            assert current["current_hash"] == writer.compute_hash(previous["current_hash"], current)
+        assert db.heads["B"] == (3, chain_b[-1]["current_hash"])
+    
+    def test_next_transaction_continues_from_head(self, db):
+        """Test a later flush links to the committed head."""
+        writer.append_event(event("A", 1))
+        db.commit()
+        head = db.heads["A"]
+        
+        writer.append_event(event("A", 2))
+        db.commit()
+        
+        assert db.events[-1]["sequence"] == 2
+        assert db.events[-1]["previous_hash"] == head[1]
+    
+    def test_rollback_discards_pending_events(self, db):
+        """Test events of a rolled back transaction are never written."""
+        writer.append_event(event("A", 1))
+        db.rollback()
+        db.commit()
+        
+        assert db.events == []
+        assert "A" not in db.heads
+    
+    def test_savepoint_rollback_drops_events_queued_since(self, db):
+        """Test only the events queued before the savepoint are written."""
+        writer.append_event(event("A", 1))
+        writer.savepoint("step")
+        writer.append_event(event("A", 2))
+        writer.rollback_to_savepoint("step")
+        writer.append_event(event("A", 3))
+        db.commit()
+        
+        assert [e["subject_name"] for e in db.events] == ["POL-1", "POL-3"]
+        assert db.heads["A"][0] == 2
+    
+    def test_first_append_creates_the_head(self):
+        """Test a tenant's head row is created at genesis, then locked."""
+        db = Mock(db_type="mariadb")
+        db.sql.side_effect = [[], [], [(0, writer.GENESIS_HASH)]]
+        
+        with patch.object(frappe, "db", db, create=True):
+            assert writer._lock_chain_head("A") == (0, writer.GENESIS_HASH)
+        
+        assert db.sql.call_args_list[1].args[1][:3] == ("A", "A", writer.GENESIS_HASH)
+        assert db.sql.call_args_list[2] == db.sql.call_args_list[0]
+    
+    def test_hash_is_independent_of_representation(self):
+        """Test key order and timestamp type don't change the hash."""
+        stored = dict(event("A", 1), sequence=1, event_data='{"n":1}')
+        as_string = dict(stored, timestamp="2025-01-01 00:00:01")
+        
+        assert writer.compute_hash(writer.GENESIS_HASH, stored) == writer.compute_hash(writer.GENESIS_HASH, as_string)
+        assert writer.compute_hash(writer.GENESIS_HASH, stored) != writer.compute_hash("f" * 64, stored)
@@ -0,0 +1,109 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_local_cache.py
+"""
+import pytest
+from unittest.mock import patch
+from cap.cache.local_cache import LocalCache
+"""Unit Tests for the Local (L1) Cache"""
+
+
+
+class TestLocalCache:
+    """Test suite for LocalCache."""
+
+    def test_set_and_get(self):
+        """Test basic set and get operations."""
+        cache = LocalCache()
+
+        assert cache.set("key", {"a": 1}) is True
+
+        found, value = cache.get("key")
+        assert found is True
+        assert value == {"a": 1}
+
+    def test_returns_copies(self):
+        """Test cached values cannot be mutated through a returned reference."""
+        cache = LocalCache()
+        cache.set("key", {"items": [1]})
+
+        _, value = cache.get("key")
+        value["items"].append(2)
+
+        _, value = cache.get("key")
+        assert value == {"items": [1]}
+
+    def test_falsy_values_are_hits(self):
+        """Test falsy values are distinguishable from misses."""
+        cache = LocalCache()
+        cache.set("zero", 0)
+
+        assert cache.get("zero") == (True, 0)
+        assert cache.get("missing") == (False, None)
+
+    def test_entry_budget_evicts_lru(self):
+        """Test least recently used entries are evicted first."""
+        cache = LocalCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        # Touch 'a' so 'b' becomes least recently used
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a")[0] is True
+        assert cache.get("b")[0] is False
+        assert cache.get("c")[0] is True
+        assert cache.stats()["evictions"] == 1
+
+    def test_byte_budget(self):
+        """Test the byte budget bounds total payload size."""
+        cache = LocalCache(max_bytes=1024)
+
+        for i in range(20):
+            cache.set(f"key{i}", "x" * 200)
+
+        assert cache.stats()["bytes"] <= 1024
+        assert cache.set("huge", "x" * 4096) is False
+
+    def test_ttl_expiry(self):
+        """Test entries expire after their TTL."""
+        cache = LocalCache(default_ttl=30)
+
+        with patch("cap.cache.local_cache.time.monotonic", return_value=100.0):
+            cache.set("key", "value", ttl=10)
+
+        with patch("cap.cache.local_cache.time.monotonic", return_value=105.0):
+            assert cache.get("key") == (True, "value")
+
+        with patch("cap.cache.local_cache.time.monotonic", return_value=111.0):
+            assert cache.get("key") == (False, None)
+
+    def test_delete_pattern(self):
+        """Test glob pattern invalidation."""
+        cache = LocalCache()
+        cache.set("site|user:roles:a", ["x"])
+        cache.set("site|user:roles:b", ["y"])
+        cache.set("site|tenant:acme", {})
+
+        assert cache.delete_pattern("site|user:*") == 2
+        assert cache.get("site|tenant:acme")[0] is True
+
+    def test_hit_miss_counters(self):
+        """Test hit and miss counters."""
+        cache = LocalCache()
+        cache.set("key", "value")
+
+        cache.get("key")
+        cache.get("other")
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
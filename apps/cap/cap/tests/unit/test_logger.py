@@ -0,0 +1,137 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_logger.py
+"""
+import io
+import json
+import logging
+import pytest
+import frappe
+from cap.observability import logger as logmod
+from cap.observability.logger import DropOldestQueueHandler, DropReportingListener, StructuredFormatter
+"""Unit Tests for Structured Logging"""
+
+
+
+def make_record(msg, *args, exc_info=None):
+    """Build a log record as a logger would."""
+    return logging.LogRecord("cap.test", logging.INFO, __file__, 1, msg, args, exc_info)
+
+
+class TestQueuedLogging:
+    """Test suite for the queue-backed handler pipeline."""
+    
+    def test_full_queue_drops_oldest(self):
+        """Test overflow discards the oldest record and counts it."""
+        handler = DropOldestQueueHandler(maxsize=2)
+        for i in range(5):
+            handler.handle(make_record("record %d", i))
+        
+        assert handler.dropped == 3
+        assert [handler.queue.get_nowait().msg for _ in range(2)] == ["record 3", "record 4"]
+    
+    def test_listener_writes_formatted_records_and_drop_notice(self):
+        """Test the listener formats queued records and reports drops."""
+        stream = io.StringIO()
+        output = logging.StreamHandler(stream)
+        output.setFormatter(StructuredFormatter("json"))
+        handler = DropOldestQueueHandler(maxsize=1)
+        listener = DropReportingListener(handler, output)
+        
+        handler.handle(make_record("lost"))
+        handler.handle(make_record("kept %s", "value"))
+        listener.start()
+        listener.stop()
+        
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert lines[0]["message"] == "Log queue full, dropped 1 records"
+        assert lines[1]["message"] == "kept value"
+        assert lines[1].get("site") == getattr(frappe.local, "site", None)
+    
+    def test_exception_is_rendered_before_queueing(self):
+        """Test exceptions survive the hand-off to the listener thread."""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            import sys
+            record = make_record("failed", exc_info=sys.exc_info())
+        
+        queued = DropOldestQueueHandler().prepare(record)
+        
+        assert queued.exc_info is None
+        assert "ValueError: boom" in json.loads(StructuredFormatter("json").format(queued))["exception"]
+    
+    @pytest.mark.skipif(logmod.orjson is None, reason="orjson not installed")
+    def test_orjson_encoder_matches_json(self):
+        """Test both encoders produce the same document."""
+        record = make_record("hello")
+        record.extra_data = {"tenant": "acme", 1: "non-string key"}
+        
+        assert json.loads(StructuredFormatter("orjson").format(record)) == \
+            json.loads(StructuredFormatter("json").format(record))
+
+
+class TestLogContext:
+    """Test suite for request-scoped log context."""
+    
+    @pytest.fixture
+    def captured(self):
+        """Logger writing extra_data of each record to a list."""
+        records = []
+        handler = logging.Handler()
+        handler.emit = lambda record: records.append(getattr(record, "extra_data", {}))
+        logger = logmod.StructuredLogger("cap.test.context")
+        logger.addHandler(handler)
+        logger.propagate = False
+        yield logger, records
+        logmod.clear_context()
+    
+    def test_with_context_does_not_mutate_shared_logger(self, captured):
+        """Test with_context returns an adapter instead of growing the logger."""
+        logger, records = captured
+        
+        logger.with_context(tenant="acme").info("first")
+        logger.info("second")
+        
+        assert records == [{"tenant": "acme"}, {}]
+    
+    def test_bound_context_is_scoped(self, captured):
+        """Test log_context fields apply only inside the block."""
+        logger, records = captured
+        
+        with logmod.log_context(request_id="r1"):
+            logger.info("inside", extra={"step": 1})
+        logger.info("outside")
+        
+        assert records == [{"request_id": "r1", "step": 1}, {}]
+    
+    def test_context_is_isolated_per_thread(self, captured):
+        """Test context bound in one thread is invisible to another."""
+        import threading
+        logger, records = captured
+        logmod.bind_context(request_id="main")
+        
+        thread = threading.Thread(target=lambda: logger.info("worker"))
+        thread.start()
+        thread.join()
+        
+        assert records == [{}]
+    
+    def test_setup_runs_once(self):
+        """Test get_logger does not rebuild the root handlers."""
+        logmod.get_logger("cap.test.a")
+        handler, listener = logmod._queue_handler, logmod._listener
+        
+        logmod.get_logger("cap.test.b")
+        logmod.setup_logging()
+        
+        assert logmod._queue_handler is handler
+        assert logmod._listener is listener
+        assert [h for h in logging.getLogger().handlers if isinstance(h, DropOldestQueueHandler)] == [handler]
@@ -0,0 +1,55 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_merkle.py
+"""
+import hashlib
+import pytest
+from cap.ledger.merkle import build_levels, inclusion_proof, leaf_hash, node_hash, root_from_proof
+"""Unit Tests for Merkle Trees"""
+
+
+
+def rfc6962_root(leaves):
+    """Reference MTH: split at the largest power of two below n."""
+    if len(leaves) == 1:
+        return leaves[0]
+    split = 1
+    while split * 2 < len(leaves):
+        split *= 2
+    return node_hash(rfc6962_root(leaves[:split]), rfc6962_root(leaves[split:]))
+
+
+class TestMerkle:
+    """Test suite for tree building and inclusion proofs."""
+    
+    def test_root_matches_rfc6962_for_any_size(self):
+        """Test level-by-level building equals the recursive definition."""
+        for n in range(1, 40):
+            leaves = [leaf_hash(hashlib.sha256(str(i).encode()).digest()) for i in range(n)]
+            assert build_levels(leaves)[-1][0] == rfc6962_root(leaves)
+    
+    def test_every_proof_leads_to_the_root(self):
+        """Test proofs of all leaves, including promoted odd ones."""
+        for n in (1, 2, 5, 13, 32):
+            leaves = [leaf_hash(bytes([i])) for i in range(n)]
+            levels = build_levels(leaves)
+            for index, leaf in enumerate(leaves):
+                assert root_from_proof(leaf, inclusion_proof(levels, index)) == levels[-1][0]
+    
+    def test_tampered_leaf_or_proof_fails(self):
+        """Test changing the leaf or a sibling changes the recomputed root."""
+        leaves = [leaf_hash(bytes([i])) for i in range(6)]
+        levels = build_levels(leaves)
+        proof = inclusion_proof(levels, 4)
+        
+        assert root_from_proof(leaf_hash(b"x"), proof) != levels[-1][0]
+        assert root_from_proof(leaves[4], proof.replace(proof[1], "f" if proof[1] != "f" else "e", 1)) != levels[-1][0]
+        with pytest.raises(ValueError):
+            root_from_proof(leaves[4], "X00;")
@@ -0,0 +1,269 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_metrics.py
+"""
+import json
+import pytest
+from unittest.mock import Mock, patch
+from cap.analytics import metrics as analytics
+from cap.observability import metrics
+from cap.observability.metrics import MetricsAggregator, MetricsCollector, publish_to_redis, render_openmetrics
+"""Unit Tests for Metrics Collection"""
+
+
+
+@pytest.fixture
+def aggregator():
+    """Aggregator whose background thread never flushes during a test."""
+    aggregator = MetricsAggregator(flush_interval=3600)
+    aggregator._sinks = []
+    yield aggregator
+    aggregator._stopped.set()
+
+
+class HashClient:
+    """Minimal Redis stand-in holding hashes, lists and sets."""
+    
+    def __init__(self):
+        self.hashes = {}
+        self.lists = {}
+        self.sets = {}
+    
+    def pipeline(self, transaction=True):
+        return HashPipeline(self)
+    
+    def execute_command(self, command, key, field=None, value=None):
+        if command == "RPUSH":
+            self.lists.setdefault(key, []).append(field)
+            return
+        if command == "EXPIRE":
+            return
+        if command in ("SADD", "SREM", "SMEMBERS"):
+            members = self.sets.setdefault(key, set())
+            if command == "SADD":
+                members.add(field)
+            elif command == "SREM":
+                members.discard(field)
+            return set(members)
+        fields = self.hashes.setdefault(key, {})
+        if command == "HINCRBYFLOAT":
+            fields[field] = fields.get(field, 0.0) + value
+        elif command == "HSET":
+            fields[field] = value
+        elif command == "HGETALL":
+            return dict(fields)
+
+
+class HashPipeline:
+    """Pipeline stand-in running its queued commands on execute()."""
+    
+    def __init__(self, client):
+        self.client, self.commands = client, []
+    
+    def execute_command(self, *args):
+        self.commands.append(args)
+    
+    def execute(self):
+        return [self.client.execute_command(*args) for args in self.commands]
+
+
+class SketchClient:
+    """Redis stand-in holding the hourly sketch lists and claim leases."""
+    
+    def __init__(self, lists, leases=()):
+        self.lists = dict(lists)
+        self.leases = set(leases)
+    
+    def scan_iter(self, match, count=None):
+        return [key for key in list(self.lists) + list(self.leases) if key.startswith(match.rstrip("*"))]
+    
+    def execute_command(self, command, *args):
+        if command == "SET":
+            self.leases.add(args[0])
+        elif command == "EXISTS":
+            return int(args[0] in self.leases)
+        elif command == "RENAMENX":
+            if args[0] not in self.lists:
+                raise Exception("ERR no such key")
+            if args[1] in self.lists:
+                return 0
+            self.lists[args[1]] = self.lists.pop(args[0])
+            return 1
+        elif command == "LRANGE":
+            return self.lists[args[0]]
+        elif command == "DEL":
+            for key in args:
+                self.lists.pop(key, None)
+                self.leases.discard(key)
+
+
+class TestMetricsAggregator:
+    """Test suite for MetricsAggregator."""
+    
+    def test_counters_are_summed_per_tagset(self, aggregator):
+        """Test counters aggregate per (name, tags)."""
+        aggregator.add("counter", "cap.tenant.create.count", 1, {"status": "success"})
+        aggregator.add("counter", "cap.tenant.create.count", 1, {"status": "success"})
+        aggregator.add("counter", "cap.tenant.create.count", 1, {"status": "error"})
+        
+        batch = aggregator.collect()
+        
+        counters = {row[1]["status"]: row[2] for row in batch["counters"]}
+        assert counters == {"success": 2, "error": 1}
+    
+    def test_timers_keep_count_sum_min_max(self, aggregator):
+        """Test timers are summarized rather than buffered."""
+        for value in (0.2, 0.1, 0.4):
+            aggregator.add("timer", "cap.auth.authenticate.duration", value)
+        
+        [[name, tags, series]] = aggregator.collect()["histograms"]
+        
+        assert series[0] == 3
+        assert series[1] == pytest.approx(0.7)
+        assert series[2:4] == [0.1, 0.4]
+    
+    def test_gauges_keep_last_value(self, aggregator):
+        """Test gauges report the most recent value."""
+        aggregator.add("gauge", "cap.sessions.active", 5)
+        aggregator.add("gauge", "cap.sessions.active", 3)
+        
+        assert aggregator.collect()["gauges"] == [["cap.sessions.active", {}, 3]]
+    
+    def test_flush_sends_one_batch_and_resets(self, aggregator):
+        """Test flush hands one batch to each sink and starts a new window."""
+        sink = Mock()
+        aggregator.add_sink(sink)
+        aggregator.add("counter", "cap.requests", 1)
+        aggregator.add("counter", "cap.requests", 1)
+        
+        aggregator.flush()
+        aggregator.flush()
+        
+        sink.assert_called_once()
+        assert sink.call_args[0][0]["counters"] == [["cap.requests", {}, 2]]
+    
+    def test_collectors_share_the_aggregator(self):
+        """Test every collector records into the process-wide aggregator."""
+        assert MetricsCollector()._aggregator is MetricsCollector(prefix="other")._aggregator
+
+
+
+class TestOpenMetricsExport:
+    """Test suite for fleet-wide aggregation and OpenMetrics rendering."""
+    
+    def test_workers_accumulate_into_one_series(self, aggregator):
+        """Test batches from several workers add up in the shared hash."""
+        client = HashClient()
+        
+        with patch.object(metrics.frappe, "cache", return_value=client):
+            for _ in range(2):
+                aggregator.add("counter", "cap.tenant.create.count", 1, {"site": "a.local", "status": "success"})
+                aggregator.add("timer", "cap.tenant.create.duration", 0.03, {"site": "a.local"})
+                aggregator.add("timer", "cap.tenant.create.duration", 0.7, {"site": "a.local"})
+                publish_to_redis(aggregator.collect())
+        
+        text = render_openmetrics(client.execute_command("HGETALL", metrics.REDIS_METRICS_KEY), site="a.local")
+        
+        assert '# TYPE cap_tenant_create_count counter' in text
+        assert 'cap_tenant_create_count_total{site="a.local",status="success"} 2' in text
+        assert 'cap_tenant_create_duration_bucket{site="a.local",le="0.05"} 2' in text
+        assert 'cap_tenant_create_duration_bucket{site="a.local",le="1.0"} 4' in text
+        assert 'cap_tenant_create_duration_bucket{site="a.local",le="+Inf"} 4' in text
+        assert 'cap_tenant_create_duration_count{site="a.local"} 4' in text
+        assert text.endswith("# EOF\n")
+    
+    def test_other_sites_are_excluded(self):
+        """Test a scrape only sees the current site's series."""
+        raw = {
+            metrics._field("gauge", "cap.sessions.active", {"site": "a.local"}): "3",
+            metrics._field("gauge", "cap.sessions.active", {"site": "b.local"}): "9"
+        }
+        
+        text = render_openmetrics(raw, site="a.local")
+        
+        assert 'cap_sessions_active{site="a.local"} 3' in text
+        assert "b.local" not in text
+    
+    def test_gauges_are_kept_per_process_and_summed(self, aggregator):
+        """Test two workers' gauges don't overwrite each other."""
+        client = HashClient()
+        
+        with patch.object(metrics.frappe, "cache", return_value=client):
+            for pid, active in ((101, 3), (102, 4)):
+                aggregator.add("gauge", "cap.sessions.active", active, {"site": "a.local"})
+                publish_to_redis(dict(aggregator.collect(), pid=pid))
+        
+        raw = client.execute_command("HGETALL", metrics.REDIS_METRICS_KEY)
+        raw.update(metrics.live_gauges(client))
+        
+        assert 'cap_sessions_active{site="a.local"} 7' in render_openmetrics(raw, site="a.local")
+    
+    def test_expired_process_gauges_are_dropped(self):
+        """Test a process whose gauge hash expired leaves the index."""
+        client = HashClient()
+        client.execute_command("SADD", metrics.GAUGE_INDEX_KEY, "cap:metrics:v1:gauges:host:9")
+        
+        assert metrics.live_gauges(client) == {}
+        assert client.sets[metrics.GAUGE_INDEX_KEY] == set()
+    
+    def test_failing_batch_is_dropped_after_max_attempts(self, aggregator):
+        """Test a batch Redis keeps rejecting doesn't block later ones forever."""
+        client = Mock()
+        client.pipeline.return_value.execute.side_effect = ValueError("rejected")
+        aggregator.add("counter", "cap.requests", 1)
+        batch = aggregator.collect()
+        
+        with patch.object(metrics.frappe, "cache", return_value=client), \
+                patch.object(metrics, "_unpublished", metrics.deque(maxlen=60)):
+            for _ in range(metrics.MAX_PUBLISH_ATTEMPTS):
+                with pytest.raises(ValueError):
+                    publish_to_redis(batch)
+            
+            # The first batch was dropped on its last attempt; later ones weren't tried yet
+            assert [attempts for attempts, _ in metrics._unpublished] == [0] * (metrics.MAX_PUBLISH_ATTEMPTS - 1)
+    
+    def test_sketches_are_appended_per_site_and_hour(self, aggregator):
+        """Test timer sketches are pushed to the site's hourly list."""
+        client = HashClient()
+        aggregator.add("timer", "cap.tenant.create.duration", 0.03, {"site": "a.local"})
+        batch = aggregator.collect()
+        
+        with patch.object(metrics.frappe, "cache", return_value=client):
+            publish_to_redis(batch)
+        
+        key = metrics.sketch_key("a.local", metrics.sketch_hour(batch["end"]))
+        assert len(client.lists[key]) == 1
+        assert '"cap.tenant.create.duration"' in client.lists[key][0]
+
+
+class TestPersistMetricSketches:
+    """Test suite for claiming the hourly sketch lists."""
+    
+    def test_only_unleased_lists_are_merged(self):
+        """Test open and abandoned lists are merged while leased claims are left alone."""
+        prefix = metrics.sketch_key("test_site", "")
+        entry = json.dumps(["cap.tenant.create.duration", {}, metrics.DDSketch().to_dict()])
+        client = SketchClient(
+            {
+                prefix + "2025010100": [entry],
+                prefix + "2025010101:claimed:dead": [entry],
+                prefix + "2025010102:claimed:busy": [entry]
+            },
+            leases={prefix + "2025010102:claimed:busy:lease"}
+        )
+        
+        with patch.object(analytics.frappe, "cache", return_value=client), \
+                patch.object(analytics.frappe, "db", Mock(), create=True), \
+                patch.object(analytics, "_save_sketch") as save:
+            assert analytics.persist_metric_sketches() == 2
+        
+        assert save.call_count == 2
+        assert list(client.lists) == [prefix + "2025010102:claimed:busy"]
+        assert client.leases == {prefix + "2025010102:claimed:busy:lease"}
@@ -0,0 +1,88 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_serializers.py
+"""
+import pytest
+import datetime
+from decimal import Decimal
+from unittest.mock import patch
+from cap.cache import serializers
+"""Unit Tests for Cache Serializers"""
+
+
+
+TENANT = {
+    "name": "TEN-0001",
+    "tenant_name": "Acme",
+    "subscription_start": datetime.date(2025, 1, 1),
+    "modified": datetime.datetime(2025, 3, 4, 10, 30, 15, 123456),
+    "storage_limit_gb": Decimal("12.50"),
+    "features": [{"feature": "audit", "enabled": 1}]
+}
+
+
+class TestSerializers:
+    """Test suite for cache serializers."""
+
+    def test_pickle_round_trip(self):
+        """Test pickle preserves dates and Decimals."""
+        payload = serializers.dumps(TENANT, serializer="pickle")
+
+        assert payload[:3] == b"\x00pn"
+        assert serializers.loads(payload) == TENANT
+
+    def test_msgpack_round_trip(self):
+        """Test msgpack extension types round-trip."""
+        pytest.importorskip("msgpack")
+
+        payload = serializers.dumps(TENANT, serializer="msgpack")
+
+        assert payload[:2] == b"\x00m"
+        assert serializers.loads(payload) == TENANT
+
+    def test_json_stringifies_dates(self):
+        """Test the JSON serializer does not fail on dates."""
+        value = serializers.loads(serializers.dumps(TENANT, serializer="json"))
+
+        assert value["modified"] == "2025-03-04 10:30:15.123456"
+        assert value["storage_limit_gb"] == "12.50"
+
+    def test_legacy_json_payloads(self):
+        """Test values written before the header was introduced still decode."""
+        assert serializers.loads(b'{"a": 1}') == {"a": 1}
+        assert serializers.loads('"value"') == "value"
+
+    def test_large_values_are_compressed(self):
+        """Test payloads above the threshold are compressed."""
+        value = {"description": "x" * 10000}
+
+        with patch.object(serializers.frappe, "conf", {"cap_cache_compress_threshold": 1024}):
+            payload = serializers.dumps(value, serializer="pickle")
+
+        assert payload[2:3] in (serializers.CODEC_ZLIB, serializers.CODEC_ZSTD)
+        assert len(payload) < 1000
+        assert serializers.loads(payload) == value
+
+    def test_per_prefix_serializer(self):
+        """Test the longest matching key prefix picks the serializer."""
+        conf = {
+            "cap_cache_serializer": "pickle",
+            "cap_cache_serializers": {"integration:": "json", "integration:raw:": "pickle"}
+        }
+
+        with patch.object(serializers.frappe, "conf", conf):
+            assert serializers.serializer_for_key("integration:hook").name == "json"
+            assert serializers.serializer_for_key("integration:raw:1").name == "pickle"
+            assert serializers.serializer_for_key("tenant:acme").name == "pickle"
+
+    def test_integers_stay_incrementable(self):
+        """Test integers are stored as plain text for INCRBY."""
+        assert serializers.dumps(42) == b"42"
+        assert serializers.loads(b"42") == 42
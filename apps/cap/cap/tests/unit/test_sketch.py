@@ -0,0 +1,85 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_sketch.py
+"""
+import json
+import random
+import pytest
+from cap.observability.sketch import DDSketch
+"""Unit Tests for Quantile Sketches"""
+
+
+
+def exact_quantile(values, q):
+    """Reference quantile using the sketch's rank definition."""
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class TestDDSketch:
+    """Test suite for DDSketch."""
+    
+    def test_quantiles_within_relative_accuracy(self):
+        """Test quantiles of a long-tailed distribution stay within 1%."""
+        rng = random.Random(7)
+        values = [rng.lognormvariate(-3, 1.2) for _ in range(20000)]
+        sketch = DDSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+        
+        for q in (0.5, 0.9, 0.99, 0.999):
+            expected = exact_quantile(values, q)
+            assert sketch.quantile(q) == pytest.approx(expected, rel=0.01)
+    
+    def test_merge_matches_single_sketch(self):
+        """Test merging per-worker sketches equals sketching all values at once."""
+        rng = random.Random(11)
+        values = [rng.expovariate(20) for _ in range(3000)]
+        combined, first, second = DDSketch(), DDSketch(), DDSketch()
+        for i, value in enumerate(values):
+            combined.add(value)
+            (first if i % 2 else second).add(value)
+        
+        first.merge(second)
+        
+        assert first.count == combined.count
+        assert first.bins == combined.bins
+        assert first.quantile(0.99) == combined.quantile(0.99)
+    
+    def test_round_trip_through_json(self):
+        """Test to_dict/from_dict preserves the sketch."""
+        sketch = DDSketch()
+        for value in (0.0, 0.002, 0.5, 3.0, -1.0):
+            sketch.add(value)
+        
+        restored = DDSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+        
+        assert restored.count == 5
+        assert restored.min == -1.0
+        assert restored.quantile(0.5) == sketch.quantile(0.5)
+    
+    def test_bins_are_bounded(self):
+        """Test collapsing keeps the sketch within max_bins."""
+        sketch = DDSketch(max_bins=64)
+        for exponent in range(-200, 200):
+            sketch.add(1.1 ** exponent)
+        
+        assert len(sketch.bins) <= 64
+        assert sketch.quantile(1.0) == sketch.max
+    
+    def test_empty_sketch(self):
+        """Test an empty sketch reports no quantiles."""
+        assert DDSketch().quantile(0.99) is None
+        assert DDSketch().mean is None
+    
+    def test_merge_rejects_different_accuracy(self):
+        """Test sketches with different accuracy cannot be merged."""
+        with pytest.raises(ValueError):
+            DDSketch(0.01).merge(DDSketch(0.02))
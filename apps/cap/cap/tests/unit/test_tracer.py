@@ -0,0 +1,124 @@
+"""
+Project: QuietWire CAP (Civic AI Canon Platform) V 1.0.0
+Website: https://quietwire.ai
+Authors: Ashraf Saleh Alhajj; Raasid (AI Companion)
+SPDX-License-Identifier: Apache-2.0
+SPDX-FileCopyrightText: 2025 QuietWire
+SPDX-FileContributor: Ashraf Saleh Alhajj
+SPDX-FileContributor: Raasid (AI Companion)
+
+Test module: test_tracer.py
+"""
+import pytest
+from unittest.mock import Mock, patch
+from cap.observability import tracer as tracing
+from cap.observability.tracer import SpanExporter, Tracer, format_traceparent, parse_traceparent
+"""Unit Tests for Distributed Tracing"""
+
+
+
+@pytest.fixture
+def exporter():
+    """Replace the process-wide exporter with one that never exports on its own."""
+    exporter = SpanExporter(buffer_size=8, batch_size=100, flush_interval=3600)
+    exporter._sinks = []
+    exporter._configured = True
+    with patch.object(tracing, "_exporter", exporter):
+        yield exporter
+    exporter._stopped.set()
+    exporter._wakeup.set()
+
+
+class TestTraceContext:
+    """Test suite for W3C traceparent propagation."""
+    
+    def test_traceparent_round_trip(self):
+        """Test formatting and parsing are inverse."""
+        header = format_traceparent(0x4BF92F3577B34DA6A3CE929D0E0E4736, 0x00F067AA0BA902B7, True)
+        
+        assert header == "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        assert parse_traceparent(header) == (0x4BF92F3577B34DA6A3CE929D0E0E4736, 0x00F067AA0BA902B7, True)
+    
+    @pytest.mark.parametrize("header", [None, "", "garbage", "00-" + "0" * 32 + "-00f067aa0ba902b7-01"])
+    def test_invalid_traceparent_starts_new_trace(self, header):
+        """Test invalid headers are ignored."""
+        assert parse_traceparent(header) is None
+        assert Tracer.from_traceparent(header).parent_span_id is None
+    
+    def test_child_spans_link_to_parent(self, exporter):
+        """Test nested spans record their parent and remote parent IDs."""
+        tracer = Tracer.from_traceparent("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")
+        
+        with tracer.span("request") as root:
+            with tracer.span("query") as child:
+                assert tracer.traceparent().split("-")[2] == f"{child.span_id:016x}"
+        
+        spans = {span["name"]: span for span in tracer.export()["spans"]}
+        assert spans["request"]["parent_id"] == "00f067aa0ba902b7"
+        assert spans["query"]["parent_id"] == f"{root.span_id:016x}"
+        assert spans["query"]["trace_id"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    
+    def test_job_continues_enqueuing_trace(self, exporter):
+        """Test run_traced() runs the job as a child of the enqueuing span."""
+        job = Mock(return_value="done")
+        header = format_traceparent(0xABC, 0xDEF, True)
+        
+        with patch.object(tracing.frappe, "get_attr", return_value=job, create=True):
+            assert tracing.run_traced("cap.jobs.work", traceparent=header, item=1) == "done"
+        
+        job.assert_called_once_with(item=1)
+        span = exporter._buffer[0]
+        assert span["trace_id"] == f"{0xABC:032x}"
+        assert span["parent_id"] == f"{0xDEF:016x}"
+        assert span["kind"] == "consumer"
+
+
+class TestSampling:
+    """Test suite for head and tail sampling."""
+    
+    def test_unsampled_ok_trace_is_dropped(self, exporter):
+        """Test head-unsampled fast traces are not exported."""
+        tracer = Tracer(sampled=False)
+        with tracer.span("request"):
+            pass
+        
+        assert len(exporter._buffer) == 0
+    
+    def test_unsampled_error_trace_is_kept(self, exporter):
+        """Test traces with a failed span are always exported."""
+        tracer = Tracer(sampled=False)
+        with pytest.raises(ValueError):
+            with tracer.span("request"):
+                with tracer.span("query"):
+                    raise ValueError("boom")
+        
+        assert [span["name"] for span in exporter._buffer] == ["query", "request"]
+        assert exporter._buffer[0]["status"] == "error"
+    
+    def test_ring_buffer_drops_oldest(self, exporter):
+        """Test the exporter buffer is bounded and counts drops."""
+        tracer = Tracer(sampled=True)
+        for i in range(10):
+            with tracer.span(f"op{i}"):
+                pass
+        
+        assert len(exporter._buffer) == 8
+        assert exporter._buffer[0]["name"] == "op2"
+        assert exporter.dropped == 2
+    
+    def test_flush_exports_otlp_batches(self, exporter):
+        """Test buffered spans are exported as OTLP/JSON."""
+        sink = Mock()
+        exporter.add_sink(sink)
+        tracer = Tracer(sampled=True)
+        with tracer.span("request", tenant="acme"):
+            pass
+        
+        exporter.flush()
+        
+        payload = sink.call_args[0][0]
+        span = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        assert span["traceId"] == f"{tracer.trace_id:032x}"
+        assert span["status"] == {"code": 1}
+        assert {"key": "tenant", "value": {"stringValue": "acme"}} in span["attributes"]
+        assert len(exporter._buffer) == 0